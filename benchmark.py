@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import open3d as o3d
+import pandas as pd
+
+from src.logic.dataclean import PIPELINE_STAGES, VALID_METHODS, dataclean, estimate_dimensions
+from src.logic.ply_export import read_ply_points
+from src.utils.evaluation import DIMENSIONS, compute_metrics, sorted_dimension_errors
+
+REFERENCE_CSV = Path("Measurements_clean - Sheet1.csv")
+
+# Default regression thresholds of --baseline: relative slowdown of a timing,
+# and absolute MAE increase in centimeters
+TIME_TOLERANCE = 0.10
+MAE_TOLERANCE_CM = 0.1
+
+# Timings shorter than this are too noisy to flag
+MIN_COMPARED_SECONDS = 0.05
+
+
+def benchmark_file(path: str, methods, repeat: int, dataclean_kwargs):
+    """
+    Run the pipeline on one scan (in a fresh worker process, so peak RSS is
+    per file) and time every estimator on the cleaned cloud.
+
+    Returns:
+        per-file record of the report
+    """
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = dataclean(
+                path,
+                visualize_flag=False,
+                method=list(methods),
+                output_dir=tmp,
+                profile=True,
+                export={"precision": "float64"},
+                output_policy="write",
+                **dataclean_kwargs
+            )
+            runs.append((time.perf_counter() - start, result))
+        cleaned = read_ply_points(Path(tmp) / result["cleaned_file"])
+
+    # Estimators on the cleaned cloud, each on its own (no shared hull; MINBOX
+    # falls back to the z axis as up, which costs the same)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(cleaned)
+    estimator_seconds = {}
+    for m in methods:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            estimate_dimensions(pcd, m)
+            timings.append(time.perf_counter() - start)
+        estimator_seconds[m] = round(statistics.median(timings), 6)
+
+    seconds = [s for s, _ in runs]
+    stages = {}
+    for stage in PIPELINE_STAGES:
+        times = [r["seconds"] for _, res in runs for r in res["profile"] if r["stage"] == stage]
+        if times:
+            stages[stage] = round(statistics.median(times), 4)
+    rss = [r["peak_rss_mb"] for r in result["profile"] if r["peak_rss_mb"] is not None]
+
+    return {
+        "file": Path(path).name,
+        "points_in": result["input_point_count"],
+        "points_out": result["point_count"],
+        "seconds": round(statistics.median(seconds), 4),
+        "seconds_all": [round(s, 4) for s in seconds],
+        "peak_rss_mb": max(rss) if rss else None,
+        "stages": stages,
+        "methods": {
+            m: {**{k: result["methods"][m][k] for k in ("width", "length", "height")},
+                "estimator_seconds": estimator_seconds[m]}
+            for m in methods
+        },
+    }
+
+
+def accuracy(files, methods, reference_csv: Path):
+    """MAE / RMSE / bias (cm) of each method against the reference, sorted-dimension matching."""
+    reference = pd.read_csv(reference_csv)
+    reference.columns = reference.columns.str.strip()
+    reference = reference.set_index("number")
+
+    scores = {}
+    for m in methods:
+        pred, true = [], []
+        for record in files:
+            stem = Path(record["file"]).stem
+            if not stem.isdigit() or int(stem) not in reference.index:
+                continue
+            dims = record["methods"][m]
+            pred.append([dims["height"] * 100, dims["width"] * 100, dims["length"] * 100])
+            true.append(reference.loc[int(stem), list(DIMENSIONS)].to_numpy(dtype=float))
+        if not pred:
+            continue
+        mae, rmse, bias, std = compute_metrics(*sorted_dimension_errors(np.array(pred), np.array(true)))
+        scores[m] = {"n": len(pred), "mae_cm": round(float(mae), 4), "rmse_cm": round(float(rmse), 4),
+                     "bias_cm": round(float(bias), 4), "std_cm": round(float(std), 4)}
+    return scores
+
+
+def summarize(files, methods):
+    total = sum(f["seconds"] for f in files)
+    points = sum(f["points_in"] for f in files)
+    rss = [f["peak_rss_mb"] for f in files if f["peak_rss_mb"] is not None]
+    return {
+        "files": len(files),
+        "seconds_total": round(total, 4),
+        "seconds_per_file": round(total / len(files), 4),
+        "points_per_second": round(points / total, 1) if total else None,
+        "peak_rss_mb": max(rss) if rss else None,
+        "stages": {
+            stage: round(sum(f["stages"].get(stage, 0) for f in files), 4)
+            for stage in PIPELINE_STAGES
+        },
+        "estimator_seconds": {
+            m: round(sum(f["methods"][m]["estimator_seconds"] for f in files), 6) for m in methods
+        },
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "open3d": o3d.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_reports(report, baseline, time_tolerance=TIME_TOLERANCE, mae_tolerance=MAE_TOLERANCE_CM):
+    """
+    Print the changes against a baseline report.
+
+    Returns:
+        list of regression descriptions (slower by more than time_tolerance,
+        or MAE up by more than mae_tolerance cm)
+    """
+    regressions = []
+
+    def timing(name, new, old):
+        if new is None or old is None:
+            return
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if max(new, old) >= MIN_COMPARED_SECONDS and change > time_tolerance:
+            flag = "  <-- slower"
+            regressions.append(f"{name}: {old:.4f}s -> {new:.4f}s ({change:+.1%})")
+        print(f"{name:>32} {old:>10.4f} {new:>10.4f} {change:>+8.1%}{flag}")
+
+    print(f"\nAgainst baseline {baseline['environment'].get('commit')} ({baseline['environment'].get('timestamp')})")
+    print(f"{'timing':>32} {'baseline':>10} {'current':>10} {'change':>8}")
+    old_summary, new_summary = baseline["summary"], report["summary"]
+    timing("seconds_per_file", new_summary["seconds_per_file"], old_summary["seconds_per_file"])
+    for stage in PIPELINE_STAGES:
+        timing(f"stage {stage}", new_summary["stages"].get(stage), old_summary["stages"].get(stage))
+    for m, seconds in new_summary["estimator_seconds"].items():
+        timing(f"estimator {m}", seconds, old_summary["estimator_seconds"].get(m))
+
+    print(f"\n{'accuracy':>32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for m, scores in report["accuracy"].items():
+        old = baseline["accuracy"].get(m)
+        if old is None:
+            continue
+        change = scores["mae_cm"] - old["mae_cm"]
+        flag = ""
+        if change > mae_tolerance:
+            flag = "  <-- less accurate"
+            regressions.append(f"{m} MAE: {old['mae_cm']:.2f}cm -> {scores['mae_cm']:.2f}cm")
+        print(f"{m + ' MAE (cm)':>32} {old['mae_cm']:>10.3f} {scores['mae_cm']:>10.3f} {change:>+8.3f}{flag}")
+
+    old_rss, new_rss = old_summary.get("peak_rss_mb"), new_summary.get("peak_rss_mb")
+    if old_rss and new_rss:
+        print(f"\n{'peak RSS (MB)':>32} {old_rss:>10.1f} {new_rss:>10.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Accuracy and latency of every bounding-box method over the sample scans"
+    )
+    parser.add_argument("--data-dir", default="src/data/pictures")
+    parser.add_argument("--files", default=None, help="comma separated file names (default: all)")
+    parser.add_argument("--methods", default=",".join(VALID_METHODS),
+                        help=f"comma separated methods (default: {','.join(VALID_METHODS)})")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per file; timings are medians")
+    parser.add_argument("--target-points", type=int, default=None, help="point budget for voxel pre-downsampling")
+    parser.add_argument("--cluster-engine", default=None, help="target clustering (default: dbscan)")
+    parser.add_argument("--output", default="output/benchmark/report.json", help="JSON report")
+    parser.add_argument("--baseline", default=None, help="earlier report to diff against")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help="relative slowdown reported as a regression (default: 0.10)")
+    parser.add_argument("--mae-tolerance", type=float, default=MAE_TOLERANCE_CM,
+                        help="MAE increase in cm reported as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    methods = [m.strip().upper() for m in args.methods.split(",")]
+    invalid = [m for m in methods if m not in VALID_METHODS]
+    if invalid:
+        parser.error(f"unknown method(s) {', '.join(invalid)}; choose from {', '.join(VALID_METHODS)}")
+
+    ply_files = sorted(Path(args.data_dir).glob("*.ply"), key=lambda p: (len(p.stem), p.stem))
+    if args.files:
+        selected = {s.strip() for s in args.files.split(",")}
+        ply_files = [f for f in ply_files if f.name in selected]
+    if not ply_files:
+        print("No .ply files found.")
+        return
+
+    dataclean_kwargs = {"target_points": args.target_points, "cluster_engine": args.cluster_engine}
+    print(f"Benchmarking {len(ply_files)} files x {len(methods)} methods, {args.repeat} run(s) each...")
+    print(f"{'file':>10} {'points':>8} {'seconds':>8} {'rss MB':>8}")
+
+    files = []
+    # One fresh process per file: peak RSS is per file and no state leaks between scans
+    for path in ply_files:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            record = executor.submit(benchmark_file, str(path), methods, args.repeat, dataclean_kwargs).result()
+        files.append(record)
+        print(f"{record['file']:>10} {record['points_in']:>8} {record['seconds']:>8.3f} "
+              f"{record['peak_rss_mb'] or 0:>8.1f}")
+
+    report = {
+        "environment": environment(),
+        "parameters": {"methods": methods, "repeat": args.repeat, **dataclean_kwargs},
+        "summary": summarize(files, methods),
+        "accuracy": accuracy(files, methods, REFERENCE_CSV) if REFERENCE_CSV.exists() else {},
+        "files": files,
+    }
+
+    summary = report["summary"]
+    print(f"\n{summary['seconds_per_file']:.3f}s per file, {summary['points_per_second']:,.0f} points/s, "
+          f"peak RSS {summary['peak_rss_mb']} MB")
+    print(f"{'method':>10} {'MAE cm':>8} {'RMSE cm':>8} {'bias cm':>8} {'est. ms':>8}")
+    for m in methods:
+        scores = report["accuracy"].get(m, {})
+        print(f"{m:>10} {scores.get('mae_cm', float('nan')):>8.3f} {scores.get('rmse_cm', float('nan')):>8.3f} "
+              f"{scores.get('bias_cm', float('nan')):>8.3f} {summary['estimator_seconds'][m] / len(files) * 1000:>8.2f}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved report to {output}")
+
+    if args.baseline:
+        regressions = compare_reports(
+            report, json.loads(Path(args.baseline).read_text()), args.time_tolerance, args.mae_tolerance
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for r in regressions:
+                print(f"  {r}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
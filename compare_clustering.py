@@ -0,0 +1,100 @@
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.logic.clustering import cluster_agreement, largest_cluster
+from src.logic.dataclean import CLUSTER_PARAMS, load_points, remove_floor
+from src.logic.remove_plain import large_plane_mask
+
+
+def clusters_for_file(path: Path):
+    """
+    Run the pipeline up to plane removal, then isolate the target with both
+    cluster engines.
+
+    Returns:
+        (points entering the clustering, {engine: (indices, seconds)})
+    """
+    def no_report(*args):
+        pass
+
+    points, no_floor, _, segmenter = remove_floor(load_points(str(path)), no_report, no_report)
+    no_planes = no_floor[large_plane_mask(
+        segmenter,
+        max_planes=CLUSTER_PARAMS["max_planes"],
+        min_inliers=CLUSTER_PARAMS["plane_min_inliers"]
+    )]
+    points_no_planes = points[no_planes]
+
+    clusters = {}
+    for engine in ("dbscan", "voxel"):
+        start = time.perf_counter()
+        indices = largest_cluster(
+            points_no_planes,
+            eps=CLUSTER_PARAMS["dbscan_eps"],
+            min_points=CLUSTER_PARAMS["dbscan_min_points"],
+            engine=engine
+        )
+        clusters[engine] = (indices, time.perf_counter() - start)
+
+    return len(points_no_planes), clusters
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Agreement of the voxel cluster engine with Open3D DBSCAN on the sample scans"
+    )
+    parser.add_argument("--data-dir", default="src/data/pictures")
+    parser.add_argument("--output", default=None, help="optional CSV with one row per file")
+    args = parser.parse_args()
+
+    ply_files = sorted(Path(args.data_dir).glob("*.ply"))
+    if not ply_files:
+        print("No .ply files found.")
+        return
+
+    rows = []
+    print(f"{'file':>10} {'points':>8} {'dbscan':>8} {'voxel':>8} {'IoU':>6} {'prec':>6} {'recall':>6} "
+          f"{'t_dbscan':>9} {'t_voxel':>8}")
+
+    for path in ply_files:
+        n_points, clusters = clusters_for_file(path)
+        (dbscan_idx, dbscan_s), (voxel_idx, voxel_s) = clusters["dbscan"], clusters["voxel"]
+        agreement = cluster_agreement(dbscan_idx, voxel_idx)
+
+        rows.append({
+            "file": path.name,
+            "points": n_points,
+            "dbscan_points": agreement["points_a"],
+            "voxel_points": agreement["points_b"],
+            "iou": agreement["iou"],
+            "precision": agreement["precision"],
+            "recall": agreement["recall"],
+            "dbscan_seconds": dbscan_s,
+            "voxel_seconds": voxel_s,
+        })
+        print(f"{path.name:>10} {n_points:>8} {agreement['points_a']:>8} {agreement['points_b']:>8} "
+              f"{agreement['iou']:>6.3f} {agreement['precision']:>6.3f} {agreement['recall']:>6.3f} "
+              f"{dbscan_s:>8.3f}s {voxel_s:>7.3f}s")
+
+    iou = np.array([r["iou"] for r in rows])
+    dbscan_total = sum(r["dbscan_seconds"] for r in rows)
+    voxel_total = sum(r["voxel_seconds"] for r in rows)
+    print(f"\nIoU mean {iou.mean():.3f}, min {iou.min():.3f}")
+    print(f"Clustering time: dbscan {dbscan_total:.2f}s, voxel {voxel_total:.2f}s "
+          f"({dbscan_total / max(voxel_total, 1e-9):.1f}x)")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,21 @@
 import pandas as pd
-import numpy as np
 from pathlib import Path
 
-
-def compute_metrics(pred, true):
-    error = pred - true
-    mae = np.mean(np.abs(error))
-    rmse = np.sqrt(np.mean(error ** 2))
-    bias = np.mean(error)
-    std = np.std(error)
-    return mae, rmse, bias, std
+from src.utils.evaluation import compute_metrics, dimension_matrix, sorted_dimension_errors
 
 
 def evaluate_method(method_file, hand_df):
 
     df = pd.read_csv(method_file)
 
-    # Convert meters → centimeters
-    df[["Height", "Width", "Length"]] *= 100
-
     # Merge on box number
     merged = df.merge(hand_df, on="number", suffixes=("_pred", "_true"))
 
-    all_pred = []
-    all_true = []
-
-    # Row-wise sorted matching
-    for _, row in merged.iterrows():
-
-        pred_dims = np.array([
-            row["Height_pred"],
-            row["Width_pred"],
-            row["Length_pred"]
-        ])
-
-        true_dims = np.array([
-            row["Height_true"],
-            row["Width_true"],
-            row["Length_true"]
-        ])
-
-        pred_sorted = np.sort(pred_dims)
-        true_sorted = np.sort(true_dims)
-
-        all_pred.extend(pred_sorted)
-        all_true.extend(true_sorted)
-
-    all_pred = np.array(all_pred)
-    all_true = np.array(all_true)
+    # Row-wise sorted matching (meters -> centimeters for the predictions)
+    all_pred, all_true = sorted_dimension_errors(
+        dimension_matrix(merged, "_pred", 100),
+        dimension_matrix(merged, "_true")
+    )
 
     mae, rmse, bias, std = compute_metrics(all_pred, all_true)
 
@@ -1,16 +1,22 @@
+import argparse
 import csv
 import pandas as pd
+from datetime import datetime, timezone
 from pathlib import Path
-from src.logic.dataclean import dataclean
-from src.model.mlmodel import load_data_from_csv, train_logistic_regression, train_decision_tree, train_mlp
-from sklearn.preprocessing import StandardScaler
+from src.logic.dataclean import dataclean, PIPELINE_STAGES, VALID_METHODS
+from src.logic.clustering import CLUSTER_ENGINES
+from src.logic.profiling import profile_columns, profile_row
+from src.logic.cache import PointCloudCache
+from src.logic.ply_export import EXPORT_PARAMS, OUTPUT_POLICIES, PLY_COMPRESSIONS, PLY_ENCODINGS, PLY_PRECISIONS
+from src.utils.batch import run_batch, BatchThroughput
+from src.utils.evaluation import confidence_table, dimension_confidence
+from src.model.confidence import dataframe_features, score_features
+from src.model.mlmodel import CLASSIFIERS, CONFIDENCE_REGRESSORS, CV_FOLDS, load_data_from_csv, select_model
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.linear_model import LogisticRegression
 from sklearn.neural_network import MLPClassifier
 import joblib
 
-VALID_METHODS = ("AABB", "OBB", "HULL", "PCA", "HULL_PCA")
-
 def truncate(f, n):
     """Truncates a float f to n decimal places without rounding"""
     factor = 10**n
@@ -64,6 +70,58 @@ def ask_file_selection(ply_files):
             print("Invalid selection. Please choose 1 or 2.")
 
 
+CSV_HEADER = ["number", "Height", "Width", "Length", "point_count", "ransac_inlier_ratio", "std_x", "std_y", "std_z", "aspect_ratio"]
+
+def find_ply_files(data_dir: Path):
+    # numeric stems first (in numeric order), then the rest alphabetically
+    numeric_stem_files = [f for f in data_dir.glob("*.ply") if f.stem.isdigit()]
+    non_numeric_stem_files = [f for f in data_dir.glob("*.ply") if not f.stem.isdigit()]
+
+    return sorted(numeric_stem_files, key=lambda x: int(x.stem)) + sorted(non_numeric_stem_files)
+
+def csv_header(profile_flag=False):
+    header = list(CSV_HEADER)
+    if profile_flag:
+        header += profile_columns(PIPELINE_STAGES)
+    return header
+
+def result_row(file: Path, dims, profile_flag=False, method=None):
+    # one CSV row (matching csv_header) for a dataclean() result; method picks
+    # one estimator out of a multi-method result
+    if method is not None and "methods" in dims:
+        dims = {**dims, **dims["methods"][method]}
+    row = [
+        file.stem,  # index                
+        truncate(dims["height"], 3),
+        truncate(dims["width"], 3),
+        truncate(dims["length"], 3),
+
+        dims["point_count"],
+        dims["ransac_inlier_ratio"],
+        dims["std_x"],
+        dims["std_y"],
+        dims["std_z"],
+        dims["aspect_ratio"]
+    ]
+    if profile_flag:
+        row += profile_row(dims["profile"], PIPELINE_STAGES)
+    return row
+
+def object_row(file: Path, index: int, obj, method=None):
+    # CSV row for an extra object of a multi-object result; the scan-wide
+    # quality columns are left empty
+    if method is not None and "methods" in obj:
+        obj = {**obj, **obj["methods"][method]}
+    return [
+        f"{file.stem}#{index}",
+        truncate(obj["height"], 3),
+        truncate(obj["width"], 3),
+        truncate(obj["length"], 3),
+        obj["point_count"],
+        "", "", "", "",
+        obj["aspect_ratio"]
+    ]
+
 def main():
 
     # Choose method
@@ -71,6 +129,7 @@ def main():
     method = "AABB"     # use AABB as default
     visualization_flag = ask_yes_no("Would you like to visualize the result? (Y/N)\n   -->  ")
     verbose_flag = ask_yes_no("Would you like to execute with verbose mode (show all steps)? (Y/N)\n   -->  ")
+    profile_flag = ask_yes_no("Would you like to record per-stage timings? (Y/N)\n   -->  ")
 
     data_dir = Path("src/data/pictures")
     output_csv = Path(f"output/statistics/{method}_measurement_results.csv")
@@ -79,10 +138,7 @@ def main():
         print("Data directory does not exist.")
         return
 
-    numeric_stem_files = [f for f in data_dir.glob("*.ply") if f.stem.isdigit()]
-    non_numeric_stem_files = [f for f in data_dir.glob("*.ply") if not f.stem.isdigit()]
-
-    ply_files = sorted(numeric_stem_files, key=lambda x: int(x.stem)) + sorted(non_numeric_stem_files)
+    ply_files = find_ply_files(data_dir)
     # Ask user which files to run
     ply_files = ask_file_selection(ply_files)
 
@@ -101,37 +157,24 @@ def main():
                 str(file),
                 visualize_flag=visualization_flag,
                 method=method,
-                verbose=verbose_flag
+                verbose=verbose_flag,
+                profile=profile_flag
             )
 
             # Display results for this file
             if not verbose_flag:
                 print(f"  Dimensions: {dims['width']:.3f} x {dims['length']:.3f} x {dims['height']:.3f} m")
 
-            results.append([
-                file.stem,  # index                
-                truncate(dims["height"], 3),
-                truncate(dims["width"], 3),
-                truncate(dims["length"], 3),
-
-                dims["point_count"],
-                dims["ransac_inlier_ratio"],
-                dims["std_x"],
-                dims["std_y"],
-                dims["std_z"],
-                dims["aspect_ratio"]
-            ])
+            results.append(result_row(file, dims, profile_flag))
         except Exception as exc:  # Keep batch run alive if one file fails.
             print(f"Failed to process {file.name}: {exc}")
             failures.append(file.name)
 
-    output_csv.parent.mkdir(parents=True, exist_ok=True)
-
     # Save to CSV
     output_csv.parent.mkdir(parents=True, exist_ok=True)
     with open(output_csv, mode="w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["number", "Height", "Width", "Length", "point_count", "ransac_inlier_ratio", "std_x", "std_y", "std_z", "aspect_ratio"])
+        writer.writerow(csv_header(profile_flag))
         writer.writerows(results)
 
     print(f"\nSaved results to {output_csv}")
@@ -149,6 +192,132 @@ def main():
         if run_benchmark == "Y":
             run_ml_benchmark(output_csv)
 
+def batch_main(args):
+    """
+    Non-interactive batch mode: process files in parallel and stream rows
+    into the CSV as each file finishes.
+    """
+    data_dir = Path(args.data_dir)
+    if not data_dir.exists():
+        print("Data directory does not exist.")
+        return
+
+    ply_files = find_ply_files(data_dir)
+    if args.files:
+        selected_names = {s.strip() for s in args.files.split(",")}
+        ply_files = [f for f in ply_files if f.name in selected_names]
+
+    if not ply_files:
+        print("No .ply files found.")
+        return
+
+    # Several methods share one cleaning pass and get one CSV each
+    methods = [m.strip().upper() for m in args.method.split(",")]
+    invalid = [m for m in methods if m not in VALID_METHODS]
+    if invalid:
+        print(f"Invalid Method(s) {', '.join(invalid)}. Please choose from {' / '.join(VALID_METHODS)}")
+        return
+    if args.output and len(methods) > 1:
+        print("--output can only be used with a single method.")
+        return
+
+    output_csvs = {
+        m: Path(args.output or f"output/statistics/{m}_measurement_results.csv") for m in methods
+    }
+
+    print(f"Processing {len(ply_files)} files with {args.workers or 'all'} workers ({', '.join(methods)})...")
+    throughput = BatchThroughput()
+    failures = []
+
+    for path in output_csvs.values():
+        path.parent.mkdir(parents=True, exist_ok=True)
+    files = {m: open(path, mode="w", newline="") for m, path in output_csvs.items()}
+    try:
+        writers = {m: csv.writer(f) for m, f in files.items()}
+        for m, f in files.items():
+            writers[m].writerow(csv_header(args.profile))
+            f.flush()
+
+        for item in run_batch(
+            ply_files,
+            workers=args.workers,
+            method=methods if len(methods) > 1 else methods[0],
+            profile=args.profile,
+            target_points=args.target_points,
+            cache=PointCloudCache(args.cache_dir) if args.cache_dir else None,
+            cluster_engine=args.cluster_engine,
+            multi_object=args.multi_object,
+            export={
+                "encoding": args.export_encoding,
+                "precision": args.export_precision,
+                "compression": args.export_compression,
+            },
+            output_policy=args.output_policy
+        ):
+            throughput.add(item)
+            if item.ok:
+                dims = item.result
+                for m, f in files.items():
+                    writers[m].writerow(result_row(item.file, dims, args.profile, method=m))
+                    # Further objects of a multi-object scan get "<stem>#<n>" rows
+                    for i, obj in enumerate(dims.get("objects", [])[1:], start=2):
+                        if "error" not in obj:
+                            writers[m].writerow(object_row(item.file, i, obj, method=m))
+                    f.flush()
+                print(f"[{throughput.files}/{len(ply_files)}] {item.file.name}: "
+                      f"{dims['width']:.3f} x {dims['length']:.3f} x {dims['height']:.3f} m ({item.seconds:.1f}s)")
+            else:
+                failures.append(item.file.name)
+                print(f"[{throughput.files}/{len(ply_files)}] Failed to process {item.file.name}: {item.error}")
+    finally:
+        for f in files.values():
+            f.close()
+
+    for path in output_csvs.values():
+        print(f"\nSaved results to {path}")
+    print(f"Throughput: {throughput.summary()}")
+    if failures:
+        print(f"Skipped {len(failures)} files due to processing errors: {', '.join(failures)}")
+
+    if args.compare:
+        for path in output_csvs.values():
+            compare_between_csv(path, Path(r"Measurements_clean - Sheet1.csv"))
+
+    if args.score_confidence:
+        for path in output_csvs.values():
+            score_results_csv(path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure boxes in PLY scans. Runs interactively unless --batch is given.")
+    parser.add_argument("--batch", action="store_true", help="non-interactive parallel batch run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--method", default="AABB",
+                        help=f"one or more comma separated methods ({' / '.join(VALID_METHODS)})")
+    parser.add_argument("--data-dir", default="src/data/pictures")
+    parser.add_argument("--files", default=None, help="comma separated file names (default: all)")
+    parser.add_argument("--output", default=None, help="output CSV (default: output/statistics/<METHOD>_measurement_results.csv)")
+    parser.add_argument("--profile", action="store_true", help="add per-stage timing columns")
+    parser.add_argument("--target-points", type=int, default=None, help="point budget for voxel pre-downsampling")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse cleaned intermediates across runs from this cache directory (e.g. output/cache)")
+    parser.add_argument("--cluster-engine", choices=CLUSTER_ENGINES, default=None,
+                        help="target clustering (default: dbscan; voxel is much faster)")
+    parser.add_argument("--multi-object", action="store_true",
+                        help="measure every box of a scan (extra objects get '<stem>#<n>' rows)")
+    parser.add_argument("--export-encoding", choices=PLY_ENCODINGS, default=EXPORT_PARAMS["encoding"],
+                        help="cleaned PLY encoding")
+    parser.add_argument("--export-precision", choices=PLY_PRECISIONS, default=EXPORT_PARAMS["precision"],
+                        help="cleaned PLY coordinate type (int16 = quantized relative to the box center, "
+                             "only readable with ply_export.read_ply_points)")
+    parser.add_argument("--export-compression", choices=PLY_COMPRESSIONS, default=EXPORT_PARAMS["compression"],
+                        help="compress cleaned PLY files (.gz / .zst)")
+    parser.add_argument("--output-policy", choices=OUTPUT_POLICIES, default="write",
+                        help="cleaned PLY files: write before moving on (default), in a background thread, or not at all")
+    parser.add_argument("--compare", action="store_true", help="compare against the reference CSV when done")
+    parser.add_argument("--score-confidence", action="store_true",
+                        help="add an ml_confidence column from the saved confidence model when done")
+    return parser.parse_args()
+
 def run_ml_benchmark(csv_path: Path):
     # csv_path = Path(r"output\statistics\AABB_measurement_results.csv")
 
@@ -169,39 +338,19 @@ def run_ml_benchmark(csv_path: Path):
         print("  STARTING MODEL BENCHMARKS")
         print("="*40)
         
-        # Dictionary to keep track of the scores
-        scores = {}
-        
-        # 1. Run Logistic Regression
-        _, _, acc_lr = train_logistic_regression(X, y, verbose=False)
-        scores["Logistic Regression"] = acc_lr
-        
-        # 2. Run Decision Tree
-        _, _, acc_dt = train_decision_tree(X, y, verbose=False)
-        scores["Decision Tree"] = acc_dt
-        
-        # 3. Run Multilayer Perceptron (Neural Network)
-        _, _, acc_mlp = train_mlp(X, y, verbose=False)
-        scores["Neural Network (MLP)"] = acc_mlp
+        # k-fold CV of every candidate (and its fit on all rows) in parallel;
+        # the winner's all-rows fit is kept instead of training it again
+        selection = select_model(X, y, CLASSIFIERS, scoring="accuracy")
         
         # --- THE RESULTS ---
         print("\n" + "="*40)
-        print("  FINAL LEADERBOARD")
+        print(f"  FINAL LEADERBOARD ({CV_FOLDS}-fold CV)")
         print("="*40)
         
-        # Sort the dictionary by highest score
-        sorted_scores = sorted(scores.items(), key=lambda item: item[1], reverse=True)
-        
-        for rank, (model_name, score) in enumerate(sorted_scores, 1):
-            print(f"{rank}. {model_name}: {score * 100:.2f}%")
-
-        best_model_name = sorted_scores[0][0]
-        if best_model_name == "Logistic Regression":
-            model, scaler, _ = train_logistic_regression(X, y, verbose=False)
-        elif best_model_name == "Decision Tree":
-            model, scaler, _ = train_decision_tree(X, y, verbose=False)
-        else:
-            model, scaler, _ = train_mlp(X, y, verbose=False)
+        for rank, (model_name, score, std) in enumerate(selection.leaderboard(), 1):
+            print(f"{rank}. {model_name}: {score * 100:.2f}% (± {std * 100:.2f})")
+
+        model, scaler, best_model_name = selection.model, selection.scaler, selection.name
 
         # Also train a confidence regression model on ALL data for the backend API.
         # The classifiers above predict binary is_accurate, but for the app we need
@@ -211,23 +360,11 @@ def run_ml_benchmark(csv_path: Path):
         feature_cols = ['point_count', 'ransac_inlier_ratio', 'std_x', 'std_y', 'std_z', 'aspect_ratio']
         
         if 'confidence' in df.columns:
-            X_reg = df[feature_cols]
-            y_reg = df['confidence']  # continuous 0-100%
-            
-            from sklearn.ensemble import GradientBoostingRegressor
-            proba_scaler = StandardScaler()
-            X_reg_scaled = proba_scaler.fit_transform(X_reg)
-            
-            proba_model = GradientBoostingRegressor(
-                n_estimators=100, max_depth=3, learning_rate=0.1, random_state=42
-            )
-            proba_model.fit(X_reg_scaled, y_reg)
-            best_proba_name = "GradientBoosting Regressor (confidence)"
+            regression = select_model(df[feature_cols], df['confidence'], CONFIDENCE_REGRESSORS, scoring="mae")
+            proba_model, proba_scaler, best_proba_name = regression.model, regression.scaler, regression.name
             
-            # Quick training error check
-            preds = proba_model.predict(X_reg_scaled)
-            mae = abs(preds - y_reg).mean()
-            print(f"Confidence regressor MAE on training data: {mae:.2f}%")
+            mae, std = regression.scores[best_proba_name]
+            print(f"Confidence regressor MAE ({CV_FOLDS}-fold CV): {mae:.2f}% (± {std:.2f})")
         else:
             print("Warning: 'confidence' column not found — skipping confidence regressor")
             proba_model = None
@@ -237,6 +374,9 @@ def run_ml_benchmark(csv_path: Path):
         model_path = Path("output/models/best_model.joblib")
         model_path.parent.mkdir(parents=True, exist_ok=True)
 
+        # Written to a temporary file and renamed, so a running API (which
+        # reloads the model when the file changes) never reads half a file
+        tmp_path = model_path.with_name(model_path.name + ".tmp")
         joblib.dump({
             "model": model,
             "scaler": scaler,
@@ -244,14 +384,35 @@ def run_ml_benchmark(csv_path: Path):
             "proba_model": proba_model,
             "proba_scaler": proba_scaler,
             "proba_name": best_proba_name,
-        }, model_path)
+            "version": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        }, tmp_path)
+        tmp_path.replace(model_path)
         print(f"Saved best model: {best_model_name} -> {model_path}")
         if proba_model is not None:
             print(f"Saved confidence regressor: {best_proba_name}")
 
 
+def score_results_csv(csv_path: Path, model_path: Path = Path("output/models/best_model.joblib")):
+    """
+    Score every row of a results CSV with the saved confidence regressor in
+    one model call and store it in an 'ml_confidence' column.
+    """
+    if not model_path.exists():
+        print(f"No confidence model found at {model_path}. Run the ML benchmark first.")
+        return
+
+    bundle = joblib.load(model_path)
+    if not isinstance(bundle, dict) or bundle.get("proba_model") is None:
+        print(f"{model_path} has no confidence regressor.")
+        return
+
+    df = pd.read_csv(csv_path)
+    df["ml_confidence"] = score_features(bundle["proba_model"], bundle["proba_scaler"], dataframe_features(df))
+    df.to_csv(csv_path, index=False)
+
+    print(f"\nScored {len(df)} rows of {csv_path} (mean ML confidence {df['ml_confidence'].mean():.2f}%)")
+
 def compare_between_csv(created_csv: Path, reference_csv: Path):
-    ACCURACY_THRESHOLD = 0.85
     if not created_csv.exists():
         print(f"Created CSV file {created_csv} does not exist.")
         return
@@ -263,55 +424,19 @@ def compare_between_csv(created_csv: Path, reference_csv: Path):
     created_df = pd.read_csv(created_csv)
     reference_df = pd.read_csv(reference_csv)
 
-    created_df.columns = created_df.columns.str.strip()
-    reference_df.columns = reference_df.columns.str.strip()
-
-    merged_df = created_df.merge(reference_df, on="number", suffixes=("_created", "_ref"))
-
-    dims = ['Height', 'Width', 'Length']
-    confidence_scores = []
-    accurate_flags = []
-
-    for _, row in merged_df.iterrows():
-        ratios = []
-        all_accurate = True
-
-        for dim in dims:
-            created_value = row[f"{dim}_created"] * 100
-            reference_value = row[f"{dim}_ref"]
-
-            if reference_value == 0:
-                ratios.append(0)
-                all_accurate = False
-                continue
-
-            ratio = min(created_value, reference_value) / max(created_value, reference_value)
-            ratios.append(ratio)
-
-            if ratio < ACCURACY_THRESHOLD:
-                all_accurate = False
-
-        confidence = sum(ratios) / len(ratios)
-        confidence_scores.append(round(confidence * 100, 2))
-        accurate_flags.append(1 if all_accurate else 0)
-
-    merged_df["confidence"] = confidence_scores
-    merged_df["is_accurate"] = accurate_flags
+    merged_df, ratios = confidence_table(created_df, reference_df)
+    confidence_scores = merged_df["confidence"]
 
-    print(f"\nAverage Confidence: {sum(confidence_scores) / len(confidence_scores):.2f}%")
-    print(f"Best:  {max(confidence_scores):.2f}% (object {merged_df.loc[merged_df['confidence'].idxmax(), 'number']})")
-    print(f"Worst: {min(confidence_scores):.2f}% (object {merged_df.loc[merged_df['confidence'].idxmin(), 'number']})")
+    print(f"\nAverage Confidence: {confidence_scores.mean():.2f}%")
+    print(f"Best:  {confidence_scores.max():.2f}% (object {merged_df.loc[confidence_scores.idxmax(), 'number']})")
+    print(f"Worst: {confidence_scores.min():.2f}% (object {merged_df.loc[confidence_scores.idxmin(), 'number']})")
 
-    for dim in dims:
-        dim_ratios = []
-        for _, row in merged_df.iterrows():
-            created = row[f"{dim}_created"] * 100
-            ref = row[f"{dim}_ref"]
-            if ref != 0:
-                dim_ratios.append(min(created, ref) / max(created, ref))
-        print(f"{dim} avg confidence: {sum(dim_ratios)/len(dim_ratios)*100:.2f}%")
+    for dim, ratio in dimension_confidence(ratios).items():
+        print(f"{dim} avg confidence: {ratio*100:.2f}%")
 
     output_cols = ["number", "Height_created", "Width_created", "Length_created", "Height_ref", "Width_ref", "Length_ref", "confidence", "is_accurate", "point_count", "ransac_inlier_ratio", "std_x", "std_y", "std_z", "aspect_ratio"]
+    # Keep per-stage timing columns from profiled runs
+    output_cols += [c for c in merged_df.columns if c in profile_columns(PIPELINE_STAGES)]
     result_df = merged_df[output_cols].rename(columns={
         "Height_created": "Height",
         "Width_created": "Width",
@@ -320,4 +445,8 @@ def compare_between_csv(created_csv: Path, reference_csv: Path):
     result_df.to_csv(created_csv, index=False)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.batch:
+        batch_main(args)
+    else:
+        main()
\ No newline at end of file
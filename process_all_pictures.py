@@ -1,53 +1,63 @@
+import argparse
 import json
 from pathlib import Path
-from src.logic.dataclean import dataclean
+from src.utils.batch import run_batch, BatchThroughput
 
-def process_all_pictures():
+def process_all_pictures(workers=None):
     """Process all .ply files in src/data/pictures and save dimensions to JSON"""
-    
+
     pictures_dir = Path("src/data/pictures")
     output_json = Path("output/dimensions.json")
-    
+    # Results are streamed here (one JSON object per line) as files finish
+    output_jsonl = output_json.with_suffix(".jsonl")
+
     # Ensure output directory exists
     output_json.parent.mkdir(parents=True, exist_ok=True)
-    
+
     # Get all .ply files
     ply_files = sorted(pictures_dir.glob("*.ply"))
-    
+
     if not ply_files:
         print("No .ply files found in src/data/pictures")
         return
-    
+
     results = {}
-    
-    print(f"Processing {len(ply_files)} files...")
-    
-    for i, ply_file in enumerate(ply_files, 1):
-        print(f"\n[{i}/{len(ply_files)}] Processing {ply_file.name}...")
-        
-        try:
-            # Run dataclean without visualization
-            dimensions = dataclean(str(ply_file), visualize_flag=False)
-            
-            # Store results with filename as key
-            results[ply_file.name] = dimensions
-            
-            print(f"  ✓ Width: {dimensions['width']:.3f}, "
-                  f"Length: {dimensions['length']:.3f}, "
-                  f"Height: {dimensions['height']:.3f}")
-            
-        except Exception as e:
-            print(f"  ✗ Error processing {ply_file.name}: {e}")
-            results[ply_file.name] = {"error": str(e)}
-    
-    # Save to JSON
+    throughput = BatchThroughput()
+
+    print(f"Processing {len(ply_files)} files with {workers or 'all'} workers...")
+
+    with open(output_jsonl, 'w') as stream:
+        # Only the dimensions are needed, so the cleaned clouds are not written
+        for item in run_batch(ply_files, workers=workers, output_policy="none"):
+            throughput.add(item)
+
+            if item.ok:
+                dimensions = item.result
+                # Store results with filename as key
+                results[item.file.name] = dimensions
+
+                print(f"[{throughput.files}/{len(ply_files)}] ✓ {item.file.name} "
+                      f"Width: {dimensions['width']:.3f}, "
+                      f"Length: {dimensions['length']:.3f}, "
+                      f"Height: {dimensions['height']:.3f}")
+            else:
+                print(f"[{throughput.files}/{len(ply_files)}] ✗ Error processing {item.file.name}: {item.error}")
+                results[item.file.name] = {"error": item.error}
+
+            stream.write(json.dumps({"file": item.file.name, **results[item.file.name]}) + "\n")
+            stream.flush()
+
+    # Save to JSON (sorted by filename like the sequential run)
     with open(output_json, 'w') as f:
-        json.dump(results, f, indent=2)
-    
+        json.dump(dict(sorted(results.items())), f, indent=2)
+
     print(f"\n✓ Results saved to {output_json}")
     print(f"  Total files processed: {len(results)}")
     print(f"  Successful: {sum(1 for r in results.values() if 'error' not in r)}")
     print(f"  Failed: {sum(1 for r in results.values() if 'error' in r)}")
+    print(f"  Throughput: {throughput.summary()}")
 
 if __name__ == "__main__":
-    process_all_pictures()
+    parser = argparse.ArgumentParser(description="Process all sample scans and save dimensions to JSON")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    process_all_pictures(workers=parser.parse_args().workers)
@@ -0,0 +1,77 @@
+"""
+Micro-batching of small synchronous predictions made from concurrent requests
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, List
+
+
+class MicroBatcher:
+    """
+    Groups items submitted within max_wait seconds (or max_batch items,
+    whichever comes first) into one predict_batch(items) call.
+
+    predict_batch gets a list of items and returns one result per item. It
+    runs in a worker thread (asyncio.to_thread), so a slow prediction does
+    not hold up the event loop; items submitted meanwhile go into the next
+    batch. An exception fails every item of its batch.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Any]], List[Any]], max_batch: int = 64,
+                 max_wait: float = 0.002):
+        self.predict_batch = predict_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+
+        self._pending = []
+        self._timer = None
+        self._tasks = set()  # running predictions (referenced so they are not garbage collected)
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        task = asyncio.get_running_loop().create_task(self._predict(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _predict(self, batch):
+        try:
+            results = await asyncio.to_thread(self.predict_batch, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,183 @@
+"""
+In-memory job store for asynchronous PLY processing with status polling
+"""
+
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from src.logic.profiling import PIPELINE_STAGES
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# Seconds the first load_pipeline() call of this process spent importing it
+pipeline_import_seconds = None
+
+
+def load_pipeline():
+    """
+    dataclean(), importing the cleaning pipeline (Open3D) on first use. In
+    process mode only the workers import it, never the API process.
+    """
+    global pipeline_import_seconds
+    start = time.perf_counter()
+    from src.logic.dataclean import dataclean
+    if pipeline_import_seconds is None:
+        pipeline_import_seconds = round(time.perf_counter() - start, 4)
+    return dataclean
+
+
+def warm_up_worker() -> float:
+    """Pool warm-up: import the pipeline in a worker. Returns the seconds it took there."""
+    load_pipeline()
+    return pipeline_import_seconds
+
+
+def run_dataclean(path: str, **kwargs) -> Dict:
+    """Worker entry point of synchronous uploads: dataclean(path, **kwargs)."""
+    return load_pipeline()(path, **kwargs)
+
+
+def run_dataclean_job(job_id: str, progress, path: str, **kwargs) -> Dict:
+    """
+    Worker entry point: run dataclean() and publish stage progress.
+
+    progress is a dict (thread/inline mode) or a multiprocessing Manager dict
+    proxy (process mode) shared with the JobStore.
+    """
+    def report(stage, index, total):
+        progress[job_id] = (stage, index, total)
+
+    return load_pipeline()(path, progress_callback=report, **kwargs)
+
+
+@dataclass
+class Job:
+    id: str
+    filename: str
+    method: str
+    status: str = "queued"
+    stage: Optional[str] = None
+    stage_index: int = 0
+    stage_count: int = len(PIPELINE_STAGES)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        elapsed_end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "method": self.method,
+            "status": self.status,
+            "stage": self.stage,
+            "stage_index": self.stage_index,
+            "stage_count": self.stage_count,
+            "progress": round(self.stage_index / self.stage_count, 3),
+            "error": self.error,
+            "elapsed": round(elapsed_end - self.created_at, 2),
+        }
+
+
+class JobStore:
+    """
+    Keeps the most recent max_jobs jobs; oldest finished jobs are evicted first.
+    """
+
+    def __init__(self, use_shared_progress: bool = False, max_jobs: int = 256):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._use_shared_progress = use_shared_progress
+        self._manager = None
+        self._progress = None
+
+    def start(self):
+        """
+        Create the progress map. In shared mode this starts a Manager server
+        process, which blocks for a while: call it at startup, off the event loop.
+        """
+        if self._progress is None:
+            if self._use_shared_progress:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+                self._progress = self._manager.dict()
+            else:
+                self._progress = {}
+
+    @property
+    def progress(self):
+        """Progress map handed to the workers (created on first use if start() was not called)."""
+        self.start()
+        return self._progress
+
+    def create(self, filename: str, method: str) -> Job:
+        job = Job(id=uuid.uuid4().hex[:12], filename=filename, method=method)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        The job, with its progress updated. In shared mode that reads the
+        Manager dict (IPC): call it off the event loop.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.status in ("queued", "running"):
+            self._sync_progress(job)
+        return job
+
+    def mark_done(self, job: Job, result: Dict):
+        job.result = result
+        job.status = "done"
+        job.stage = None
+        job.stage_index = job.stage_count
+        job.finished_at = time.time()
+        self._progress_pop(job.id)
+
+    def mark_failed(self, job: Job, error: str):
+        self._sync_progress(job)  # keep the stage the job failed in
+        job.error = error
+        job.status = "failed"
+        job.finished_at = time.time()
+        self._progress_pop(job.id)
+
+    def shutdown(self):
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._progress = None
+
+    def _sync_progress(self, job: Job):
+        try:
+            entry = self.progress.get(job.id)
+        except (EOFError, OSError):  # manager already gone during shutdown
+            return
+        if entry is None:
+            return
+        job.stage, job.stage_index, job.stage_count = entry
+        job.status = "running"
+
+    def _progress_pop(self, job_id: str):
+        try:
+            self.progress.pop(job_id, None)
+        except (EOFError, OSError):
+            pass
+
+    def _evict(self):
+        # Called with the lock held
+        while len(self._jobs) > self.max_jobs:
+            finished = next(
+                (jid for jid, j in self._jobs.items() if j.status in ("done", "failed")),
+                None
+            )
+            if finished is None:
+                break
+            del self._jobs[finished]
@@ -0,0 +1,75 @@
+"""
+Aggregated processing metrics exposed in Prometheus text format on /api/metrics
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+class ProcessingMetrics:
+    """
+    Running totals of processed scans and, when dataclean() is called with
+    profile=True, per-stage time and point counts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.scans_total = defaultdict(int)  # keyed by outcome: ok / failed / rejected
+        self.processing_seconds_sum = 0.0
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.stage_points_in = defaultdict(int)
+        self.stage_points_out = defaultdict(int)
+        self.peak_rss_mb = 0.0
+
+    def record_scan(self, outcome: str, seconds: float = 0.0, profile: Optional[List[Dict]] = None):
+        with self._lock:
+            self.scans_total[outcome] += 1
+            self.processing_seconds_sum += seconds
+            for stage in profile or []:
+                name = stage["stage"]
+                self.stage_seconds[name] += stage["seconds"]
+                self.stage_calls[name] += 1
+                self.stage_points_in[name] += stage["points_in"]
+                self.stage_points_out[name] += stage["points_out"]
+                if stage.get("peak_rss_mb"):
+                    self.peak_rss_mb = max(self.peak_rss_mb, stage["peak_rss_mb"])
+
+    def render(self, pool_stats: Optional[Dict] = None) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+        with self._lock:
+            metric("ply_scans_total", "counter", "Uploaded scans by outcome",
+                   [({"outcome": k}, v) for k, v in sorted(self.scans_total.items())])
+            metric("ply_processing_seconds_sum", "counter", "Total dataclean() wall time",
+                   [({}, round(self.processing_seconds_sum, 4))])
+            stages = sorted(self.stage_calls)
+            metric("ply_stage_seconds_sum", "counter", "Total time spent per pipeline stage",
+                   [({"stage": s}, round(self.stage_seconds[s], 4)) for s in stages])
+            metric("ply_stage_seconds_count", "counter", "Profiled runs per pipeline stage",
+                   [({"stage": s}, self.stage_calls[s]) for s in stages])
+            metric("ply_stage_points_in_total", "counter", "Points entering each pipeline stage",
+                   [({"stage": s}, self.stage_points_in[s]) for s in stages])
+            metric("ply_stage_points_out_total", "counter", "Points leaving each pipeline stage",
+                   [({"stage": s}, self.stage_points_out[s]) for s in stages])
+            metric("ply_worker_peak_rss_megabytes", "gauge", "Highest worker RSS seen in profiled runs",
+                   [({}, self.peak_rss_mb)])
+
+        if pool_stats is not None:
+            metric("ply_pool_running", "gauge", "Scans currently being processed",
+                   [({}, pool_stats["running"])])
+            metric("ply_pool_queued", "gauge", "Scans waiting for a free worker",
+                   [({}, pool_stats["queued"])])
+            metric("ply_pool_capacity", "gauge", "Maximum scans admitted at once",
+                   [({}, pool_stats["capacity"])])
+
+        return "\n".join(lines) + "\n"
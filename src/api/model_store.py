@@ -0,0 +1,164 @@
+"""
+The ML confidence model served by the API, reloaded in the background when
+the model file changes on disk
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ConfidenceModel:
+    """One loaded model file. Never modified: a reload swaps in a new instance."""
+
+    model: Any
+    scaler: Any
+    name: str
+    version: str
+    signature: Tuple[int, int]  # (mtime_ns, size) of the file it was read from
+
+    def info(self) -> Dict:
+        return {"name": self.name, "version": self.version}
+
+
+def read_model_file(path, signature) -> ConfidenceModel:
+    """
+    Load a model file saved by main.run_ml_benchmark() (joblib / scikit-learn
+    are imported here).
+
+    The version is the file's "version" entry, or the start of its SHA-256
+    for files saved without one.
+
+    Raises:
+        ValueError: if the file has no usable model
+    """
+    import joblib
+
+    content = Path(path).read_bytes()
+    data = joblib.load(io.BytesIO(content))
+    version = hashlib.sha256(content).hexdigest()[:12]
+
+    if not isinstance(data, dict):
+        # Legacy format: just the model, no scaler
+        raise ValueError(f"{path} has a model but no scaler; re-run main.py with ML benchmark to save model+scaler")
+    version = str(data.get("version") or version)
+    # Prefer proba_model (smooth probabilities) over best-accuracy model
+    if data.get("proba_model") is not None and data.get("proba_scaler") is not None:
+        return ConfidenceModel(data["proba_model"], data["proba_scaler"], data.get("proba_name", "unknown"),
+                               version, signature)
+    if data.get("model") is not None and data.get("scaler") is not None:
+        return ConfidenceModel(data["model"], data["scaler"], data.get("name", "unknown"), version, signature)
+    raise ValueError(f"Unexpected format in {path}")
+
+
+class ConfidenceModelStore:
+    """
+    The active ConfidenceModel, read on first use and again whenever the
+    file's mtime (or size) changes.
+
+    Lookups stat the file at most once per check_interval seconds. A change
+    is loaded on a background thread while requests keep using the current
+    model, which is then replaced with a single reference assignment, so a
+    request sees either the old or the new model, never a mix. A file that
+    fails to load (e.g. half written) or disappears leaves the current model
+    active; it is retried once it changes again.
+    """
+
+    def __init__(self, path, check_interval: float = 2.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current: Optional[ConfidenceModel] = None
+        self._loaded = False
+        self._reloading = False
+        self._failed_signature = None
+        self._next_check = 0.0
+        self.reloads = 0
+        self.load_seconds = None  # duration of the last successful load
+        self.last_error = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def loaded(self) -> bool:
+        """True once the first load has been attempted."""
+        return self._loaded
+
+    def _load(self, signature):
+        start = time.perf_counter()
+        try:
+            model = read_model_file(self.path, signature)
+        except Exception as e:
+            self._failed_signature = signature
+            self.last_error = str(e)
+            print(f"⚠️  Failed to load confidence model: {e}")
+            return
+        if self._current is not None:
+            self.reloads += 1
+        self._current = model
+        self.load_seconds = round(time.perf_counter() - start, 4)
+        self.last_error = None
+        print(f"✅ Loaded confidence model ({model.name}, version {model.version}) from {self.path}")
+
+    def _reload(self, signature):
+        try:
+            self._load(signature)
+        finally:
+            self._reloading = False
+
+    def check(self):
+        """Start a background reload if the file changed (at most one stat per check_interval)."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+
+        signature = self._file_signature()
+        current = self._current
+        if signature is None or signature == self._failed_signature:
+            return
+        if current is not None and signature == current.signature:
+            return
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(signature,), name="confidence-model-reload",
+                         daemon=True).start()
+
+    def get(self) -> Optional[ConfidenceModel]:
+        """The active model (None without a usable model file). The first call loads it."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    signature = self._file_signature()
+                    if signature is None:
+                        print(f"⚠️  No confidence model found at {self.path}")
+                        print(f"   Run main.py → compare CSV → ML benchmark to generate one.")
+                    else:
+                        self._load(signature)
+                    self._next_check = time.monotonic() + self.check_interval
+                    self._loaded = True
+            return self._current
+        self.check()
+        return self._current
+
+    def stats(self) -> Dict:
+        current = self._current
+        return {
+            **(current.info() if current is not None else {"name": None, "version": None}),
+            "reloads": self.reloads,
+            "reloading": self._reloading,
+            "last_error": self.last_error,
+        }
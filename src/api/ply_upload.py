@@ -2,21 +2,50 @@
 FastAPI backend for PLY file upload and processing
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+
+# Start of this module's import, reported on /api/health
+IMPORT_START = time.perf_counter()
+
+from fastapi import Body, FastAPI, File, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pathlib import Path
+import asyncio
+import os
 import shutil
 import uuid
-import pandas as pd
 import re
-import joblib
-import numpy as np
-from typing import Dict, Optional
-from src.logic.dataclean import dataclean
+from typing import Dict, List, Optional, Tuple
+from src.logic.ply_export import COMPRESSION_SUFFIXES, OUTPUT_POLICIES, export_params
+from src.logic.cache import PointCloudCache
+from src.logic.ply_stream import PlyFormatError, PlyStreamParser, UnsupportedPlyError
+from src.logic.profiling import VALID_METHODS
+from src.api.worker_pool import BoundedWorkerPool
+from src.api.jobs import Job, JobStore, run_dataclean, run_dataclean_job, warm_up_worker
+import src.api.jobs as jobs
+from src.api.metrics import ProcessingMetrics
+from src.api.reference import ReferenceIndex
+from src.api.batcher import MicroBatcher
+from src.model.confidence import score_results
+from src.api.startup import StartupTimings
+from src.api.model_store import ConfidenceModel, ConfidenceModelStore
 
 app = FastAPI(title="PLY Processor API")
 
+# Start-up mode. Open3D and pandas are never imported with this module:
+# Open3D is only needed by the processing workers (or by the first scan in
+# thread / inline mode), pandas by the first reference lookup.
+#   PLY_PRELOAD=0 (default): fast start, the confidence model and the
+#                 reference measurements are also loaded on first use
+#   PLY_PRELOAD=1: load them while this module is imported, so a pre-fork
+#                 server (gunicorn --preload) loads them once in its parent
+#                 and the HTTP workers share them copy-on-write; the
+#                 processing workers are started (and import the pipeline)
+#                 at startup instead of on the first scan
+PRELOAD = os.environ.get("PLY_PRELOAD", "0") == "1"
+startup_timings = StartupTimings()
+
 # Enable CORS for mobile apps
 app.add_middleware(
     CORSMiddleware,
@@ -30,81 +59,165 @@ app.add_middleware(
 UPLOAD_DIR = Path("output/mobile_uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# Reference measurements CSV
+# Uploads are parsed while they stream in; PLY_PERSIST_UPLOADS=0 skips
+# keeping a copy of binary uploads in UPLOAD_DIR (written as the chunks arrive)
+PERSIST_UPLOADS = os.environ.get("PLY_PERSIST_UPLOADS", "1") == "1"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Worker pool for dataclean() so the event loop stays responsive.
+#   PLY_EXECUTION_MODE: "process" (default), "thread" or "inline"
+#   PLY_WORKERS:        number of workers (default: CPU count)
+#   PLY_MAX_QUEUE:      uploads allowed to wait for a free worker (default: 8)
+# Process workers fork from a server process that imported the pipeline once
+processing_pool = BoundedWorkerPool(
+    mode=os.environ.get("PLY_EXECUTION_MODE", "process"),
+    max_workers=int(os.environ.get("PLY_WORKERS", "0")) or None,
+    max_queue=int(os.environ.get("PLY_MAX_QUEUE", "8")),
+    preload=["src.logic.dataclean"],
+)
+
+# PLY_PROFILE=1 runs dataclean() with per-stage profiling (exported on /api/metrics)
+PROFILE_STAGES = os.environ.get("PLY_PROFILE", "0") == "1"
+processing_metrics = ProcessingMetrics()
+
+# PLY_TARGET_POINTS caps the points entering the neighbour-search stages
+# through adaptive voxel pre-downsampling (unset = full resolution)
+TARGET_POINTS = int(os.environ.get("PLY_TARGET_POINTS", "0")) or None
+
+# PLY_CLUSTER_ENGINE picks the target clustering: "dbscan" (default) or "voxel"
+CLUSTER_ENGINE = os.environ.get("PLY_CLUSTER_ENGINE") or None
+
+# Format of the cleaned cloud served by /api/download-cleaned (see EXPORT_PARAMS
+# in src/logic/ply_export.py for the defaults)
+#   PLY_EXPORT_ENCODING:    "binary" or "ascii"
+#   PLY_EXPORT_PRECISION:   "float64", "float32" or "int16" (quantized; only for
+#                           clients that decode it like ply_export.read_ply_points)
+#   PLY_EXPORT_COMPRESSION: "none", "gzip" or "zstd" (sent as Content-Encoding)
+EXPORT_FORMAT = export_params({
+    key: os.environ[f"PLY_EXPORT_{key.upper()}"]
+    for key in ("encoding", "precision", "compression")
+    if os.environ.get(f"PLY_EXPORT_{key.upper()}")
+})
+
+# PLY_OUTPUT_POLICY: "write" (default) writes the cleaned file before
+# answering, "async" on a background thread after the result is ready (a
+# download may then have to wait for it, see download_cleaned), "none" never
+# (the response then has no cleaned_filename)
+OUTPUT_POLICY = os.environ.get("PLY_OUTPUT_POLICY", "write")
+if OUTPUT_POLICY not in OUTPUT_POLICIES:
+    raise ValueError(f"Unknown PLY_OUTPUT_POLICY '{OUTPUT_POLICY}'. Choose one of {OUTPUT_POLICIES}")
+CLEANED_FILE_WAIT_SECONDS = 2.0
+CLEANED_SUFFIXES = tuple(f"_cleaned.ply{suffix}" for suffix in COMPRESSION_SUFFIXES.values())
+
+# PLY_CACHE_DIR enables the content-addressed cache of cleaned intermediates,
+# so re-uploads of the same scan skip the cleaning pipeline (unset = disabled)
+#   PLY_CACHE_MAX_MB: cache size limit before LRU eviction (default: 2048)
+PROCESSING_CACHE = (
+    PointCloudCache(
+        os.environ["PLY_CACHE_DIR"],
+        max_bytes=int(os.environ.get("PLY_CACHE_MAX_MB", "2048")) * 1024 ** 2,
+    )
+    if os.environ.get("PLY_CACHE_DIR") else None
+)
+
+# Jobs created through /api/jobs (progress is shared with pool workers)
+job_store = JobStore(use_shared_progress=processing_pool.mode == "process")
+_job_tasks = set()  # keep references so running job tasks are not garbage collected
+
+@app.on_event("startup")
+async def start_job_store():
+    """Start the job progress map (a Manager process in process mode) before the first job."""
+    await asyncio.to_thread(job_store.start)
+
+@app.on_event("startup")
+async def warm_up_processing_pool():
+    """With PLY_PRELOAD=1, start the processing workers before the first scan."""
+    if not PRELOAD:
+        return
+    with startup_timings.measure("pool_warm_up"):
+        worker_imports = await processing_pool.warm_up(warm_up_worker)
+    startup_timings.record("worker_pipeline_import", max(worker_imports))
+
+@app.on_event("shutdown")
+def shutdown_processing_pool():
+    processing_pool.shutdown()
+    job_store.shutdown()
+
+# Reference measurements CSV, indexed by object number (reloaded when the file changes)
 REFERENCE_CSV = Path("Measurements_clean - Sheet1.csv")
+reference_index = ReferenceIndex(REFERENCE_CSV)
 
-# Load trained ML confidence model (produced by run_ml_benchmark in main.py)
+# Trained ML confidence model (produced by run_ml_benchmark in main.py).
+# A new model file is picked up without a restart: it is loaded in the
+# background and swapped in, in-flight requests finish on the old one.
+#   PLY_MODEL_CHECK_SECONDS: how often the file's mtime is checked (default: 2)
 CONFIDENCE_MODEL_PATH = Path("output/models/best_model.joblib")
-confidence_model = None
-confidence_scaler = None
+confidence_models = ConfidenceModelStore(
+    CONFIDENCE_MODEL_PATH,
+    check_interval=float(os.environ.get("PLY_MODEL_CHECK_SECONDS", "2")),
+)
 
-def load_confidence_model():
-    """Load the trained classifier + scaler at startup."""
-    global confidence_model, confidence_scaler
-    if CONFIDENCE_MODEL_PATH.exists():
-        try:
-            data = joblib.load(CONFIDENCE_MODEL_PATH)
-            if isinstance(data, dict):
-                # Prefer proba_model (smooth probabilities) over best-accuracy model
-                if "proba_model" in data and "proba_scaler" in data:
-                    confidence_model = data["proba_model"]
-                    confidence_scaler = data["proba_scaler"]
-                    print(f"✅ Loaded confidence model ({data.get('proba_name', 'unknown')}) from {CONFIDENCE_MODEL_PATH}")
-                elif "model" in data and "scaler" in data:
-                    confidence_model = data["model"]
-                    confidence_scaler = data["scaler"]
-                    print(f"✅ Loaded ML model ({data.get('name', 'unknown')}) from {CONFIDENCE_MODEL_PATH}")
-                else:
-                    print(f"⚠️  Unexpected format in {CONFIDENCE_MODEL_PATH}")
-            else:
-                # Legacy format: just the model, no scaler
-                confidence_model = data
-                confidence_scaler = None
-                print(f"⚠️  Loaded model from {CONFIDENCE_MODEL_PATH} but no scaler found")
-                print(f"   Re-run main.py with ML benchmark to save model+scaler.")
-        except Exception as e:
-            print(f"⚠️  Failed to load confidence model: {e}")
-            confidence_model = None
-    else:
-        print(f"⚠️  No confidence model found at {CONFIDENCE_MODEL_PATH}")
-        print(f"   Run main.py → compare CSV → ML benchmark to generate one.")
+def get_confidence_model() -> Optional[ConfidenceModel]:
+    """The active model, loaded on first use (or on import with PLY_PRELOAD=1)."""
+    if not confidence_models.loaded:
+        with startup_timings.measure("model_load"):
+            return confidence_models.get()
+    return confidence_models.get()
+
+async def get_confidence_model_async() -> Optional[ConfidenceModel]:
+    """get_confidence_model() without blocking the event loop on the first load."""
+    if confidence_models.loaded:
+        return confidence_models.get()
+    return await asyncio.to_thread(get_confidence_model)
 
-# Load model on import
-load_confidence_model()
+if PRELOAD:
+    get_confidence_model()
+    try:
+        reference_index.refresh()
+    except Exception as e:
+        print(f"⚠️  Could not load reference measurements: {e}")
 
 
-def predict_ml_confidence(dimensions: Dict) -> Optional[float]:
+def predict_ml_confidence_batch(results: List[Dict]) -> List[Tuple[Optional[float], Optional[Dict]]]:
     """
-    Predict confidence score using the trained regression model.
+    Predict confidence scores for many results with one model call.
     
     Args:
-        dimensions: Dict with quality metrics from dataclean()
+        results: Dicts with quality metrics from dataclean()
     
     Returns:
-        ML-predicted confidence score (0-100), or None if model not available
+        (ML-predicted confidence score (0-100), {"name", "version"} of the
+        model that made it) per result; (None, None) if no model is available
     """
-    if confidence_model is None or confidence_scaler is None:
-        return None
+    active = get_confidence_model()
+    if active is None:
+        return [(None, None)] * len(results)
     
     try:
-        features = np.array([[
-            dimensions.get('point_count', 0),
-            dimensions.get('ransac_inlier_ratio', 0),
-            dimensions.get('std_x', 0),
-            dimensions.get('std_y', 0),
-            dimensions.get('std_z', 0),
-            dimensions.get('aspect_ratio', 1),
-        ]])
-        
-        features_scaled = confidence_scaler.transform(features)
-        
         # The proba_model is a regressor that predicts confidence % directly
-        prediction = confidence_model.predict(features_scaled)[0]
-        
-        return round(max(0.0, min(100.0, prediction)), 2)
+        confidences = score_results(active.model, active.scaler, results)
     except Exception as e:
         print(f"⚠️  ML prediction failed: {e}")
-        return None
+        return [(None, None)] * len(results)
+    return [(confidence, active.info()) for confidence in confidences]
+
+def predict_ml_confidence(dimensions: Dict) -> Optional[float]:
+    """
+    Predict confidence score using the trained regression model.
+    
+    Returns:
+        ML-predicted confidence score (0-100), or None if model not available
+    """
+    return predict_ml_confidence_batch([dimensions])[0][0]
+
+# Predictions of concurrent uploads are grouped into one model call
+#   PLY_CONFIDENCE_MAX_BATCH: most predictions per call (default: 64)
+#   PLY_CONFIDENCE_WAIT_MS:   how long the first prediction waits for others (default: 2)
+confidence_batcher = MicroBatcher(
+    predict_ml_confidence_batch,
+    max_batch=int(os.environ.get("PLY_CONFIDENCE_MAX_BATCH", "64")),
+    max_wait=float(os.environ.get("PLY_CONFIDENCE_WAIT_MS", "2")) / 1000,
+)
 
 def calculate_quality_confidence(dimensions: Dict) -> float:
     """
@@ -162,6 +275,17 @@ def calculate_quality_confidence(dimensions: Dict) -> float:
     
     return round(confidence, 2)
 
+async def refresh_reference_index():
+    """
+    Parse a new or changed reference CSV off the event loop (the first parse
+    also imports pandas), so calculate_confidence() only does a dict lookup.
+    """
+    if reference_index.stale():
+        try:
+            await asyncio.to_thread(reference_index.refresh)
+        except Exception as e:
+            print(f"⚠️  Could not load reference measurements: {e}")
+
 def calculate_confidence(dimensions: Dict, filename: str) -> Optional[float]:
     """
     Calculate confidence score by comparing against reference measurements.
@@ -181,24 +305,12 @@ def calculate_confidence(dimensions: Dict, filename: str) -> Optional[float]:
     
     object_number = int(match.group())
     
-    # Check if reference CSV exists
-    if not REFERENCE_CSV.exists():
-        return None
-    
     try:
-        # Load reference measurements
-        reference_df = pd.read_csv(REFERENCE_CSV)
-        reference_df.columns = reference_df.columns.str.strip()
-        
-        # Find the reference row for this object
-        ref_row = reference_df[reference_df['number'] == object_number]
-        if ref_row.empty:
+        # Find the reference row for this object (in cm)
+        ref_row = reference_index.get(object_number)
+        if ref_row is None:
             return None
-        
-        # Get reference dimensions (in cm)
-        ref_height = ref_row['Height'].values[0]
-        ref_width = ref_row['Width'].values[0]
-        ref_length = ref_row['Length'].values[0]
+        ref_height, ref_width, ref_length = ref_row
         
         # Convert our dimensions from meters to cm
         created_height = dimensions['height'] * 100
@@ -228,98 +340,417 @@ def calculate_confidence(dimensions: Dict, filename: str) -> Optional[float]:
 async def root():
     return {"message": "PLY Processor API", "version": "1.0"}
 
+def startup_stats() -> Dict:
+    """Start-up mode and timings, including the lazy steps that already ran in this process."""
+    stats = startup_timings.stats()
+    if reference_index.load_seconds is not None:
+        stats["timings"].setdefault("reference_load", reference_index.load_seconds)
+    if jobs.pipeline_import_seconds is not None:
+        stats["timings"].setdefault("pipeline_import", jobs.pipeline_import_seconds)
+    return {"mode": "preload" if PRELOAD else "lazy", **stats}
+
 @app.get("/api/health")
 async def health_check():
-    return {"status": "ok", "message": "Server is running"}
+    return {
+        "status": "ok",
+        "message": "Server is running",
+        "processing": processing_pool.stats(),
+        "confidence_batching": confidence_batcher.stats(),
+        "confidence_model": confidence_models.stats(),
+        "startup": startup_stats()
+    }
 
-@app.post("/api/upload-ply")
-async def upload_ply(file: UploadFile = File(...), method: str = "AABB"):
+def new_upload_path(filename: str):
     """
-    Upload a PLY file, process it, and return dimensions
-    
-    Args:
-        file: The PLY file to upload
-        method: Processing method - "AABB" (fast) or "HULL" (accurate, slow)
+    Validate an upload's filename and pick where it is stored under UPLOAD_DIR.
+
+    Returns:
+        (file_id, file_path) where file_id is the short id used for the cleaned file
     """
     # Validate file extension
-    if not file.filename.endswith('.ply'):
+    if not filename or not filename.endswith('.ply'):
         raise HTTPException(status_code=400, detail="File must be a .ply file")
-    
+
     # Generate unique filename
     file_id = str(uuid.uuid4())[:8]
-    original_filename = file.filename
-    saved_filename = f"{file_id}_{original_filename}"
-    file_path = UPLOAD_DIR / saved_filename
-    
+    saved_filename = f"{file_id}_{Path(filename).name}"
+    return file_id, UPLOAD_DIR / saved_filename
+
+def save_upload(file: UploadFile):
+    """
+    Save an uploaded PLY file under UPLOAD_DIR. Blocking: call it with
+    asyncio.to_thread from request handlers.
+
+    Returns:
+        (file_id, file_path) where file_id is the short id used for the cleaned file
+    """
+    file_id, file_path = new_upload_path(file.filename)
+
     # Save uploaded file
     try:
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    
-    # Process the PLY file
+
+    return file_id, file_path
+
+async def iter_upload(file: UploadFile):
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+async def receive_ply(chunks, file_path: Path, total_bytes: Optional[int] = None):
+    """
+    Parse a PLY body while its chunks arrive.
+
+    Binary little-endian bodies (what PlyScan sends) are decoded straight into
+    a vertex array; with PLY_PERSIST_UPLOADS the raw body is also written to
+    file_path chunk by chunk as it arrives, never held in memory. Other PLY
+    flavours are written to file_path the same way for Open3D's reader.
+    total_bytes (the body size, when known) lets a header that announces more
+    vertices than the body can hold be rejected before the body arrives.
+
+    Returns:
+        (N, 3) float32 array of vertex positions, or None when the body was saved to
+        file_path for dataclean() to read
+    """
+    parser = PlyStreamParser(total_bytes=total_bytes)
+    streaming = True
+    head = []  # chunks before the end of the header, until it is known whether they go to disk
+    out = None  # file_path, once the body is written to disk
+    completed = False
+    try:
+        async for chunk in chunks:
+            if streaming:
+                try:
+                    parser.feed(chunk)
+                except UnsupportedPlyError:
+                    streaming = False
+            if out is None and (PERSIST_UPLOADS or not streaming):
+                out = await asyncio.to_thread(open, file_path, "wb")
+                await asyncio.to_thread(out.writelines, head)
+                head = []
+            if out is not None:
+                await asyncio.to_thread(out.write, chunk)
+            elif not parser.header_parsed:
+                head.append(chunk)
+            elif head:
+                head = []
+
+        if not streaming:
+            completed = True
+            return None
+
+        # float32 as scanned: the buffer dataclean() works on, and half the
+        # size to hand to a worker process
+        points = parser.close(dtype="float32")
+        completed = True
+        return points
+    except PlyFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid PLY file: {e}")
+    finally:
+        if out is not None:
+            await asyncio.to_thread(out.close)
+            if not completed:
+                file_path.unlink(missing_ok=True)
+
+def build_response(dimensions: Dict, file_id: str, original_filename: str, elapsed: float,
+                   ml_confidence: Optional[float] = None, confidence_model: Optional[Dict] = None) -> Dict:
+    """
+    Pick a confidence score and build the JSON body returned to the app.
+    ml_confidence is the model's prediction (see confidence_batcher), if any,
+    and confidence_model the name and version of the model that made it.
+    """
+    print(f"✅ Processing complete in {elapsed:.2f}s")
+    print(f"   Dimensions: {dimensions['width']:.3f} x {dimensions['length']:.3f} x {dimensions['height']:.3f} m")
+
+    # Confidence priority: ML model → reference-based → quality heuristic
+    confidence = ml_confidence
+    confidence_type = "ml_model"
+
+    if confidence is None:
+        # Fall back to reference-based if ML model unavailable
+        confidence = calculate_confidence(dimensions, original_filename)
+        confidence_type = "reference"
+
+    if confidence is None:
+        # Fall back to quality heuristic as last resort
+        confidence = calculate_quality_confidence(dimensions)
+        confidence_type = "quality"
+
+    print(f"   Confidence: {confidence:.1f}% ({confidence_type})")
+
+    # dataclean() writes the cleaned cloud to UPLOAD_DIR (unless PLY_OUTPUT_POLICY=none)
+    cleaned_filename = dimensions.get("cleaned_file")
+
+    response = {
+        "success": True,
+        "original_filename": original_filename,
+        "cleaned_filename": cleaned_filename,
+        "dimensions": {
+            "width": float(dimensions["width"]),
+            "length": float(dimensions["length"]),
+            "height": float(dimensions["height"])
+        },
+        "quality_metrics": {
+            "point_count": int(dimensions["point_count"]),
+            "ransac_inlier_ratio": float(dimensions["ransac_inlier_ratio"]),
+            "aspect_ratio": float(dimensions["aspect_ratio"])
+        },
+        "confidence": confidence,  # Always present now (reference or quality-based)
+        "confidence_model": confidence_model if confidence_type == "ml_model" else None,
+        "processing_time": round(elapsed, 2)
+    }
+    if "methods" in dimensions:
+        response["methods"] = dimensions["methods"]
+    if "profile" in dimensions:
+        response["profile"] = dimensions["profile"]
+    if "objects" in dimensions:
+        response["objects"] = dimensions["objects"]
+    return response
+
+def parse_methods(method: str):
+    """
+    "AABB" -> "AABB", "AABB,OBB" -> ["AABB", "OBB"] (multi-method mode)
+
+    Raises:
+        HTTPException: 400 for an empty or unknown method
+    """
+    methods = [m.strip().upper() for m in method.split(",") if m.strip()]
+    invalid = [m for m in methods if m not in VALID_METHODS]
+    if not methods or invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid method '{method}'. Choose from {', '.join(VALID_METHODS)}"
+        )
+    return methods if len(methods) > 1 else methods[0]
+
+def reserve_worker_slot():
+    """Reject early (503) when every worker is busy and the queue is full."""
+    if not processing_pool.try_acquire():
+        processing_metrics.record_scan("rejected")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy processing other scans, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Processing metrics in Prometheus text format (stage timings need PLY_PROFILE=1)
+    """
+    return processing_metrics.render(processing_pool.stats())
+
+async def process_upload(chunks, filename: str, method: str, multi_object: bool = False,
+                         total_bytes: Optional[int] = None):
+    """
+    Receive an upload, process it, and build the JSON response.
+    total_bytes is the size of the upload, if known.
+    """
+    methods = parse_methods(method)
+    reserve_worker_slot()
+    try:
+        file_id, file_path = new_upload_path(filename)
+        points = await receive_ply(chunks, file_path, total_bytes)
+
+        # Process the PLY file
+        try:
+            start_time = time.time()
+            print(f"⏱️  Processing {filename} with {method} method...")
+
+            # Use AABB (fast) by default, or HULL (accurate but slower)
+            dimensions = await processing_pool.run_reserved(
+                run_dataclean,
+                str(file_path),
+                visualize_flag=False,
+                method=methods,
+                verbose=False,
+                profile=PROFILE_STAGES,
+                target_points=TARGET_POINTS,
+                cache=PROCESSING_CACHE,
+                points=points,
+                cluster_engine=CLUSTER_ENGINE,
+                multi_object=multi_object,
+                output_dir=str(UPLOAD_DIR),
+                export=EXPORT_FORMAT,
+                output_policy=OUTPUT_POLICY
+            )
+
+            elapsed = time.time() - start_time
+            processing_metrics.record_scan("ok", elapsed, dimensions.get("profile"))
+            await get_confidence_model_async()
+            ml_confidence, model_info = await confidence_batcher.submit(dimensions)
+            await refresh_reference_index()
+            response_data = build_response(dimensions, file_id, filename, elapsed, ml_confidence, model_info)
+            return JSONResponse(content=response_data)
+
+        except Exception as e:
+            processing_metrics.record_scan("failed")
+            # Clean up uploaded file on error
+            if file_path.exists():
+                file_path.unlink()
+            raise HTTPException(status_code=500, detail=f"Failed to process PLY file: {str(e)}")
+    finally:
+        processing_pool.release()
+
+@app.post("/api/upload-ply")
+async def upload_ply(file: UploadFile = File(...), method: str = "AABB", multi_object: bool = False):
+    """
+    Upload a PLY file, process it, and return dimensions
+
+    Starlette spools the whole multipart body (to a temporary file once it
+    is large) before this handler runs, so parsing only starts after the
+    upload has finished; /api/upload-ply-stream parses while it arrives.
+
+    Args:
+        file: The PLY file to upload
+        method: Processing method - "AABB" (fast) or "HULL" (accurate, slow).
+                A comma separated list (e.g. "AABB,OBB,HULL") cleans once and
+                returns every estimate under "methods".
+        multi_object: Measure every box in the scan; the response gets an
+                "objects" list (largest first, with cluster centroids)
+    """
+    return await process_upload(iter_upload(file), file.filename, method, multi_object, file.size)
+
+@app.post("/api/upload-ply-stream")
+async def upload_ply_stream(request: Request, filename: str = "scan.ply", method: str = "AABB",
+                            multi_object: bool = False):
+    """
+    Same as /api/upload-ply, but the request body is the raw PLY file
+    (Content-Type: application/octet-stream) instead of a multipart form.
+
+    The body is parsed as it streams in, so processing starts as soon as
+    the last byte arrives.
+
+    Args:
+        filename: Name of the scan, used for the reference lookup and output names
+        method, multi_object: Same as /api/upload-ply
+    """
+    content_length = request.headers.get("content-length")
+    total_bytes = int(content_length) if content_length and content_length.isdigit() else None
+    return await process_upload(request.stream(), filename, method, multi_object, total_bytes)
+
+async def _run_job(job: Job, file_id: str, file_path: Path, multi_object: bool = False):
+    """Background task: process an uploaded file and store the result on the job."""
     try:
-        import time
         start_time = time.time()
-        print(f"⏱️  Processing {original_filename} with {method} method...")
-        
-        # Use AABB (fast) by default, or HULL (accurate but slower)
-        dimensions = dataclean(
+        print(f"⏱️  Job {job.id}: processing {job.filename} with {job.method} method...")
+
+        dimensions = await processing_pool.run_reserved(
+            run_dataclean_job,
+            job.id,
+            job_store.progress,
             str(file_path),
             visualize_flag=False,
-            method=method,
-            verbose=False
+            method=parse_methods(job.method),
+            verbose=False,
+            profile=PROFILE_STAGES,
+            target_points=TARGET_POINTS,
+            cache=PROCESSING_CACHE,
+            cluster_engine=CLUSTER_ENGINE,
+            multi_object=multi_object,
+            output_dir=str(UPLOAD_DIR),
+            export=EXPORT_FORMAT,
+            output_policy=OUTPUT_POLICY
         )
-        
+
         elapsed = time.time() - start_time
-        print(f"✅ Processing complete in {elapsed:.2f}s")
-        print(f"   Dimensions: {dimensions['width']:.3f} x {dimensions['length']:.3f} x {dimensions['height']:.3f} m")
-        
-        # Confidence priority: ML model → reference-based → quality heuristic
-        confidence = predict_ml_confidence(dimensions)
-        confidence_type = "ml_model"
-        
-        if confidence is None:
-            # Fall back to reference-based if ML model unavailable
-            confidence = calculate_confidence(dimensions, original_filename)
-            confidence_type = "reference"
-        
-        if confidence is None:
-            # Fall back to quality heuristic as last resort
-            confidence = calculate_quality_confidence(dimensions)
-            confidence_type = "quality"
-        
-        print(f"   Confidence: {confidence:.1f}% ({confidence_type})")
-        
-        # Create cleaned filename
-        cleaned_filename = f"{file_id}_cleaned.ply"
-        
-        response_data = {
-            "success": True,
-            "original_filename": original_filename,
-            "cleaned_filename": cleaned_filename,
-            "dimensions": {
-                "width": float(dimensions["width"]),
-                "length": float(dimensions["length"]),
-                "height": float(dimensions["height"])
-            },
-            "quality_metrics": {
-                "point_count": int(dimensions["point_count"]),
-                "ransac_inlier_ratio": float(dimensions["ransac_inlier_ratio"]),
-                "aspect_ratio": float(dimensions["aspect_ratio"])
-            },
-            "confidence": confidence,  # Always present now (reference or quality-based)
-            "processing_time": round(elapsed, 2)
-        }
-        
-        return JSONResponse(content=response_data)
-    
+        processing_metrics.record_scan("ok", elapsed, dimensions.get("profile"))
+        await get_confidence_model_async()
+        ml_confidence, model_info = await confidence_batcher.submit(dimensions)
+        await refresh_reference_index()
+        # mark_done / mark_failed / get talk to the Manager in process mode
+        await asyncio.to_thread(job_store.mark_done, job, build_response(
+            dimensions, file_id, job.filename, elapsed, ml_confidence, model_info
+        ))
     except Exception as e:
-        # Clean up uploaded file on error
+        print(f"❌ Job {job.id} failed: {e}")
+        processing_metrics.record_scan("failed")
         if file_path.exists():
             file_path.unlink()
-        raise HTTPException(status_code=500, detail=f"Failed to process PLY file: {str(e)}")
+        await asyncio.to_thread(job_store.mark_failed, job, f"Failed to process PLY file: {str(e)}")
+    finally:
+        processing_pool.release()
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), method: str = "AABB", multi_object: bool = False):
+    """
+    Upload a PLY file and return a job id immediately; processing runs in the background.
+
+    Poll /api/jobs/{job_id} for status and fetch /api/jobs/{job_id}/result when done.
+    """
+    parse_methods(method)  # 400 before anything is reserved or saved
+    reserve_worker_slot()
+    try:
+        # Off the event loop: copying a large scan to disk takes a while
+        file_id, file_path = await asyncio.to_thread(save_upload, file)
+    except Exception:
+        processing_pool.release()
+        raise
+
+    job = job_store.create(file.filename, method)
+    # The worker slot is released by _run_job when processing ends
+    task = asyncio.create_task(_run_job(job, file_id, file_path, multi_object))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "result_url": f"/api/jobs/{job.id}/result"
+    }
+
+@app.post("/api/confidence/batch")
+async def confidence_batch(results: List[Dict] = Body(...)):
+    """
+    Score many results at once with the ML confidence model.
+
+    Args:
+        results: JSON list of objects with the quality metrics of dataclean()
+                (point_count, ransac_inlier_ratio, std_x, std_y, std_z, aspect_ratio)
+
+    Returns:
+        {"count": n, "confidences": [0-100, ...], "model": {"name", "version"}},
+        confidences in request order
+    """
+    active = await get_confidence_model_async()
+    if active is None:
+        raise HTTPException(status_code=503, detail="No confidence model loaded")
+    try:
+        confidences = score_results(active.model, active.scaler, results)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not score results: {e}")
+    return {"count": len(confidences), "confidences": confidences, "model": active.info()}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report job status (queued/running/done/failed) and the current dataclean stage
+    """
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Return the processing result of a finished job (same body as /api/upload-ply).
+    Answers 202 with the job status while it is still queued or running.
+    """
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "done":
+        return JSONResponse(status_code=202, content=job.to_dict())
+    return JSONResponse(content=job.result)
 
 @app.get("/api/download-cleaned/{filename}")
 async def download_cleaned(filename: str):
@@ -327,16 +758,35 @@ async def download_cleaned(filename: str):
     Download a processed/cleaned PLY file
     """
     file_path = UPLOAD_DIR / filename
+
+    # With PLY_OUTPUT_POLICY=async the cleaned file lands a few ms after the
+    # upload response (written by the worker, so there is no write to wait
+    # on here), so a download right behind it may have to poll for it. Files
+    # are renamed into place once complete: it is never served half written.
+    deadline = time.monotonic() + CLEANED_FILE_WAIT_SECONDS
+    while not file_path.exists() and filename.endswith(CLEANED_SUFFIXES) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
+
+    # Compressed exports go out as-is with a Content-Encoding, so HTTP
+    # clients decompress them transparently into the .ply
+    headers = {}
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and filename.endswith(suffix):
+            headers["Content-Encoding"] = compression
+            filename = filename[:-len(suffix)]
     
     return FileResponse(
         path=file_path,
         media_type="application/octet-stream",
-        filename=filename
+        filename=filename,
+        headers=headers
     )
 
+startup_timings.record("api_import", time.perf_counter() - IMPORT_START)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,72 @@
+"""
+In-memory index of the hand-measured reference dimensions, reloaded when the
+CSV file changes on disk
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class ReferenceIndex:
+    """
+    Reference Height / Width / Length (cm) keyed by object number.
+
+    The CSV is parsed on first use and again only when its mtime (or size)
+    changes, so a lookup is one os.stat() plus a dict access. pandas is only
+    imported by that first parse.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._rows: Dict[int, Tuple[float, float, float]] = {}
+        self.load_seconds = None  # duration of the last parse
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        import pandas as pd
+
+        reference_df = pd.read_csv(self.path)
+        reference_df.columns = reference_df.columns.str.strip()
+        # First row wins when a number is listed twice (as the old per-request lookup did)
+        reference_df = reference_df.drop_duplicates(subset="number")
+        dims = reference_df[["Height", "Width", "Length"]].to_numpy(dtype=float)
+        return dict(zip(reference_df["number"].astype(int), map(tuple, dims.tolist())))
+
+    def stale(self) -> bool:
+        """True when the next lookup would (re)parse the CSV."""
+        return self._file_signature() != self._signature
+
+    def refresh(self) -> bool:
+        """Reload the CSV if it changed. Returns True when the index is usable."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return signature is not None
+        with self._lock:
+            if signature != self._signature:
+                start = time.perf_counter()
+                self._rows = self._load() if signature is not None else {}
+                self.load_seconds = round(time.perf_counter() - start, 4)
+                self._signature = signature
+                if signature is not None:
+                    print(f"✅ Loaded {len(self._rows)} reference measurements from {self.path}")
+        return signature is not None
+
+    def get(self, number: int) -> Optional[Tuple[float, float, float]]:
+        """(height, width, length) in cm, or None when the object has no reference."""
+        if not self.refresh():
+            return None
+        return self._rows.get(number)
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,44 @@
+"""
+Timings of the API process start-up steps (reported on /api/health)
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# Heavy libraries whose presence in the API process /api/health reports
+HEAVY_MODULES = ("open3d", "pandas", "sklearn", "scipy")
+
+
+class StartupTimings:
+    """
+    Seconds spent in named start-up steps (module import, model loading,
+    worker warm-up). Steps that run lazily are recorded the first time they
+    happen; later runs of a step do not overwrite it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._timings.setdefault(name, round(seconds, 4))
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            timings = dict(self._timings)
+        return {
+            "timings": timings,
+            "loaded_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+        }
@@ -0,0 +1,163 @@
+"""
+Bounded worker pool that runs CPU-heavy processing off the FastAPI event loop
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Sequence
+
+# "process" runs jobs on all cores, "thread" keeps them in this process
+# (handy for debugging), "inline" is the old blocking behaviour.
+EXECUTION_MODES = ("process", "thread", "inline")
+
+
+class PoolFullError(Exception):
+    """Raised when every worker is busy and the waiting queue is full."""
+
+
+class BoundedWorkerPool:
+    """
+    Executor wrapper that admits at most max_workers + max_queue jobs at once.
+
+    Jobs beyond that limit are rejected immediately with PoolFullError so the
+    API can answer 503 instead of piling up work it cannot finish.
+    """
+
+    def __init__(self, mode: str = "process", max_workers: Optional[int] = None, max_queue: int = 8,
+                 preload: Sequence[str] = ()):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{mode}'. Choose one of {EXECUTION_MODES}")
+
+        self.mode = mode
+        self.preload = list(preload)
+        self.max_workers = 1 if mode == "inline" else (max_workers or os.cpu_count() or 1)
+        self.max_queue = max(0, max_queue)
+        self.capacity = self.max_workers + self.max_queue
+
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=self._process_context(),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken executor so the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # already replaced by another job
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _process_context(self):
+        # Neither start method forks the server's threads into the workers.
+        # forkserver forks them from a clean server process that imported
+        # the preload modules once, so (re)starting a worker takes
+        # milliseconds and the modules' memory is shared copy-on-write;
+        # spawn (the only choice on Windows) imports them in every worker.
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            if self.preload:
+                context.set_forkserver_preload(self.preload)
+            return context
+        return multiprocessing.get_context("spawn")
+
+    async def warm_up(self, fn, *args):
+        """
+        Start every worker now instead of on the first job, running
+        fn(*args) once per worker (e.g. to import the pipeline there).
+
+        Returns:
+            list of the fn results
+        """
+        if self.mode == "inline":
+            return [fn(*args)]
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        return await asyncio.gather(*(
+            loop.run_in_executor(executor, fn, *args) for _ in range(self.max_workers)
+        ))
+
+    def try_acquire(self) -> bool:
+        """Reserve a slot. Returns False when the pool is full."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the pool and await its result.
+
+        Raises:
+            PoolFullError: if no slot is available
+        """
+        if not self.try_acquire():
+            raise PoolFullError(f"Processing queue is full ({self.capacity} jobs in flight)")
+
+        try:
+            return await self.run_reserved(fn, *args, **kwargs)
+        finally:
+            self.release()
+
+    async def run_reserved(self, fn, *args, **kwargs):
+        """
+        Run fn in the pool using a slot the caller already acquired.
+
+        A worker that dies (OOM kill, native crash) breaks its process pool:
+        the jobs that were running in it fail with BrokenProcessPool, and the
+        pool is replaced so later jobs run normally. A job that only reaches
+        the broken pool afterwards is resubmitted to the new one.
+        """
+        call = functools.partial(fn, *args, **kwargs)
+        if self.mode == "inline":
+            return call()
+
+        while True:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(call)
+            except BrokenProcessPool:
+                # Broken before this job was queued: it never ran, try again
+                self._discard_executor(executor)
+                continue
+            try:
+                return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "running": min(in_flight, self.max_workers),
+            "queued": max(0, in_flight - self.max_workers),
+            "capacity": self.capacity,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
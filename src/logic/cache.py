@@ -0,0 +1,190 @@
+"""
+Content-addressed on-disk cache for intermediate dataclean() results (its
+size-bounded DiskCache base also backs the fitted-model cache in
+src/model/mlmodel.py)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+# Bump when a pipeline change makes old cache entries invalid
+CACHE_VERSION = 2
+
+# The cache directory is only rescanned when the size tracked in this process
+# goes over budget, or after this many writes (other processes write to it
+# too, so between rescans the tracked size is an estimate)
+RESCAN_WRITES = 64
+
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# is not rescanned on every write
+EVICT_TO = 0.9
+
+# cache_dir -> [tracked bytes, writes since the last rescan], per process
+_tracked = {}
+_tracked_lock = threading.Lock()
+
+
+class DiskCache:
+    """
+    Size-bounded directory of cache entries (files with one of SUFFIXES,
+    sharded by the first two characters of their key).
+
+    Entries are evicted least-recently-used first once the cache grows past
+    max_bytes; the directory is not scanned on every write (see
+    RESCAN_WRITES). Safe to share between worker processes: writes go to a
+    temp file that is atomically renamed into place.
+    """
+
+    SUFFIXES = ()
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self._entries())
+
+    def evict(self, target_bytes=None) -> int:
+        """
+        When the cache is over max_bytes, delete least recently used
+        entries until it holds at most target_bytes (default max_bytes).
+
+        Returns:
+            bytes left in the cache
+        """
+        if target_bytes is None:
+            target_bytes = self.max_bytes
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except FileNotFoundError:  # removed by another worker
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return total
+        for _, size, p in sorted(entries):
+            if total <= target_bytes:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return [p for p in self.cache_dir.glob("*/*") if p.suffix in self.SUFFIXES]
+
+    @staticmethod
+    def _touch(path: Path):
+        # mtime doubles as the last-access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path: Path, write):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        written = os.path.getsize(tmp)
+        os.replace(tmp, path)
+        self._track(written)
+
+    def _track(self, written: int):
+        """Count a write; rescan and evict when over budget or due for a rescan."""
+        with _tracked_lock:
+            state = _tracked.get(self.cache_dir)
+            if state is not None and state[1] < RESCAN_WRITES and state[0] + written <= self.max_bytes:
+                state[0] += written
+                state[1] += 1
+                return
+        total = self.evict(int(self.max_bytes * EVICT_TO))
+        with _tracked_lock:
+            _tracked[self.cache_dir] = [total, 0]
+
+
+class PointCloudCache(DiskCache):
+    """
+    Stores point arrays (.npy) and small JSON records under cache_dir.
+
+    Keys are chained: stage_key(parent, stage, params) hashes the parent key
+    with the stage's parameters, so an entry is reused only when the input
+    bytes and every upstream parameter are identical.
+    """
+
+    SUFFIXES = (".npy", ".json")
+
+    def __init__(self, cache_dir="output/cache", max_bytes=2 * 1024 ** 3):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def file_digest(path, chunk_size=1024 * 1024) -> str:
+        """SHA-256 of the file contents."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def array_digest(points: np.ndarray) -> str:
+        """SHA-256 of an in-memory point array (dtype, shape and values)."""
+        points = np.ascontiguousarray(points)
+        digest = hashlib.sha256(f"{points.dtype.str}{points.shape}".encode())
+        digest.update(memoryview(points).cast("B"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def stage_key(parent_key: str, stage: str, params: Dict) -> str:
+        payload = json.dumps(
+            {"v": CACHE_VERSION, "parent": parent_key, "stage": stage, "params": params},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_points(self, key: str) -> Optional[np.ndarray]:
+        path = self._path(key, ".npy")
+        if not path.exists():
+            return None
+        try:
+            points = np.load(path)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return points
+
+    def put_points(self, key: str, points: np.ndarray):
+        self._write(self._path(key, ".npy"), lambda f: np.save(f, np.ascontiguousarray(points)))
+
+    def get_json(self, key: str) -> Optional[Dict]:
+        path = self._path(key, ".json")
+        if not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return data
+
+    def put_json(self, key: str, data: Dict):
+        self._write(self._path(key, ".json"), lambda f: f.write(json.dumps(data).encode()))
@@ -0,0 +1,153 @@
+"""
+Target isolation: indices of the largest cluster of a point cloud
+"""
+
+import itertools
+
+import numpy as np
+
+CLUSTER_ENGINES = ("dbscan", "voxel")
+
+# 3x3x3 voxel block around (and including) a voxel
+NEIGHBOR_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)), dtype=np.int64)
+# Offsets that share a face; only these link core voxels (linking along
+# edges and corners as well merged boxes with nearby clutter on the samples)
+FACE_NEIGHBORS = np.abs(NEIGHBOR_OFFSETS).sum(axis=1) <= 1
+
+
+def cluster_labels(pcd, eps=0.02, min_points=100, engine="dbscan"):
+    """
+    Cluster label of every point of pcd (-1 for noise).
+
+    Args:
+        pcd: Open3D point cloud, or (N, 3) array of points
+        eps: neighbourhood radius
+        min_points: points needed in a neighbourhood to be dense
+        engine: "dbscan" (Open3D cluster_dbscan) or "voxel"
+                (voxel_cluster_labels, near-linear approximation)
+    """
+    if engine == "dbscan":
+        if isinstance(pcd, np.ndarray):
+            import open3d as o3d
+            pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(pcd.astype(np.float64, copy=False)))
+        return np.array(pcd.cluster_dbscan(eps=eps, min_points=min_points))
+
+    if engine == "voxel":
+        return voxel_cluster_labels(pcd if isinstance(pcd, np.ndarray) else np.asarray(pcd.points), eps, min_points)
+
+    raise ValueError(f"Unknown cluster engine '{engine}'. Choose one of {CLUSTER_ENGINES}")
+
+
+def clusters_by_size(labels, min_size=1):
+    """
+    Point indices of every cluster with at least min_size points, largest first.
+    """
+    labels = np.asarray(labels)
+    valid = labels >= 0
+    if not valid.any():
+        return []
+    sizes = np.bincount(labels[valid])
+    order = np.argsort(-sizes, kind="stable")
+    return [np.flatnonzero(labels == label) for label in order if sizes[label] >= max(min_size, 1)]
+
+
+def largest_cluster(pcd, eps=0.02, min_points=100, engine="dbscan"):
+    """
+    Indices of the points in the largest cluster of pcd (see cluster_labels).
+
+    Returns:
+        sorted int array of point indices (empty when everything is noise)
+    """
+    clusters = clusters_by_size(cluster_labels(pcd, eps, min_points, engine))
+    return clusters[0] if clusters else np.empty(0, dtype=np.int64)
+
+
+def voxel_cluster_labels(points, eps=0.02, min_points=100):
+    """
+    DBSCAN-like clustering on a voxel grid.
+
+    Points are hashed into voxels of edge eps / sqrt(3), so two points in
+    the same voxel are always within eps. A voxel is dense ("core") when
+    its 3x3x3 block, a cube about the size of the eps sphere, holds at least
+    min_points points. Core voxels sharing a face form clusters via
+    connected components, and other occupied voxels touching a core voxel
+    join its cluster like DBSCAN border points.
+
+    Cost is one sort of the voxel keys plus 27 lookups per occupied voxel.
+
+    Returns:
+        cluster label of every point (-1 for noise)
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Voxel coordinates, shifted so neighbours (-1 .. +1) stay non-negative
+    voxel_size = eps / np.sqrt(3)
+    coords = np.floor((points - points.min(axis=0)) / voxel_size).astype(np.int64) + 1
+    dims = coords.max(axis=0) + 2
+    keys = (coords[:, 0] * dims[1] + coords[:, 1]) * dims[2] + coords[:, 2]
+
+    voxel_keys, point_voxel, voxel_counts = np.unique(keys, return_inverse=True, return_counts=True)
+    point_voxel = point_voxel.ravel()
+    n_voxels = len(voxel_keys)
+
+    # neighbors[i, j] = index of the j-th neighbour of voxel i, or -1
+    key_offsets = (NEIGHBOR_OFFSETS[:, 0] * dims[1] + NEIGHBOR_OFFSETS[:, 1]) * dims[2] + NEIGHBOR_OFFSETS[:, 2]
+    neighbor_keys = voxel_keys[:, None] + key_offsets[None, :]
+    neighbors = np.searchsorted(voxel_keys, neighbor_keys)
+    neighbors[neighbors == n_voxels] = 0
+    neighbors[voxel_keys[neighbors] != neighbor_keys] = -1
+
+    occupied = neighbors >= 0
+    block_counts = np.where(occupied, voxel_counts[neighbors], 0).sum(axis=1)
+    core = block_counts >= min_points
+    if not core.any():
+        return np.full(len(points), -1, dtype=np.int64)
+
+    # Connected components of the core voxels
+    src, col = np.nonzero(occupied)
+    dst = neighbors[src, col]
+    core_edges = core[src] & core[dst] & FACE_NEIGHBORS[col]
+    graph = coo_matrix(
+        (np.ones(core_edges.sum(), dtype=np.int8), (src[core_edges], dst[core_edges])),
+        shape=(n_voxels, n_voxels)
+    )
+    _, component = connected_components(graph, directed=False)
+    # Number the components of core voxels 0 .. n_clusters - 1
+    voxel_label = np.full(n_voxels, -1, dtype=np.int64)
+    voxel_label[core] = np.unique(component[core], return_inverse=True)[1].ravel()
+
+    # Border voxels take the label of a neighbouring core voxel
+    border = ~core & (occupied & core[np.where(occupied, neighbors, 0)]).any(axis=1)
+    if border.any():
+        border_neighbors = neighbors[border]
+        is_core = (border_neighbors >= 0) & core[np.where(border_neighbors >= 0, border_neighbors, 0)]
+        first_core = border_neighbors[np.arange(len(border_neighbors)), is_core.argmax(axis=1)]
+        voxel_label[border] = voxel_label[first_core]
+
+    return voxel_label[point_voxel]
+
+
+def cluster_agreement(indices_a, indices_b):
+    """
+    Agreement of two point selections (e.g. the largest cluster from two engines).
+
+    Returns:
+        dict with the sizes, intersection over union, and precision / recall
+        of selection b against selection a
+    """
+    a = np.asarray(indices_a)
+    b = np.asarray(indices_b)
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    union = len(a) + len(b) - common
+    return {
+        "points_a": len(a),
+        "points_b": len(b),
+        "iou": common / union if union else 1.0,
+        "precision": common / len(b) if len(b) else 1.0,
+        "recall": common / len(a) if len(a) else 1.0,
+    }
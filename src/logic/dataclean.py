@@ -1,159 +1,42 @@
 import open3d as o3d
 import numpy as np
+from dataclasses import dataclass, field
 from pathlib import Path
-from src.logic.remove_plain import remove_large_planes
-
-# Load point cloud (works for .ply and .xyz)
-def dataclean(dir:str, 
-              visualize_flag=True, 
-              method="AABB", 
-              output_dir="output",
-              verbose=False):
-
-
-    ####
-    # Verbose Flag helper function to display each steps
-    def show_step(title, pcd, color=None):
-        if not verbose:
-            return
-        print(f"\n--- {title} ---")
-        temp = pcd
-        if color is not None:
-            temp = pcd.clone()
-            temp.paint_uniform_color(color)
-        o3d.visualization.draw_geometries([temp])
-    ####
-    
-    pcd = o3d.io.read_point_cloud(dir)
-    show_step("Original Point Cloud", pcd)
-
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    ###
-    # 1. Radius outlier removal (your first layer)
-    pcd, _ = pcd.remove_radius_outlier(
-        nb_points=10,
-        radius=0.02
-    )
-
-    points = np.asarray(pcd.points)
-    z = points[:, 2]
-    show_step("After Radius Outlier Removal", pcd)
-
-    # 2. Normalize Z to [0, 1]
-    z_min, z_max = z.min(), z.max()
-    z_norm = (z - z_min) / (z_max - z_min)
-
-    # 3. Histogram equalization
-    hist, bins = np.histogram(z_norm, bins=256, density=True)
-    cdf = hist.cumsum()
-    cdf = cdf / cdf[-1]
-
-    z_eq = np.interp(z_norm, bins[:-1], cdf)
-
-    low, high = np.percentile(z_eq, [2, 98])
-    mask = (z_eq > low) & (z_eq < high)
-
-    points_clean = points[mask]
-    pcd_histogram = o3d.geometry.PointCloud()
-    pcd_histogram.points = o3d.utility.Vector3dVector(points_clean)
-
-    show_step("After Histogram Z Filtering(Equalization)", pcd_histogram)
-
-    ###
-    # 4. RANSAC
-    plane_model, inliers = pcd_histogram.segment_plane(
-        distance_threshold=0.005,
-        ransac_n=3,
-        num_iterations=1000
-    )
-
-    [a, b, c, d] = plane_model
-    normal = np.array([a, b, c])
-    normal /= np.linalg.norm(normal)
-
-    ###
-    # 5. Only accept near-horizontal planes
-    if abs(normal @ np.array([0, 0, 1])) > 0.9:
-        pcd_no_floor = pcd_histogram.select_by_index(inliers, invert=True)
-    else:
-        pcd_no_floor = pcd_histogram
-
-    show_step("After Floor Removal (RANSAC)", pcd_no_floor)
-
-    pcd_no_planes = remove_large_planes(pcd_no_floor, max_planes=3)
-
-    show_step("After Removing Large Planes", pcd_no_planes)
-
-
-    ###
-    # 6. DBSCAN
-    labels = np.array(
-        pcd_no_planes.cluster_dbscan(
-            eps = 0.02,
-            min_points=100
-        )
-    )
-
-    valid = labels >= 0
-    largest_label = np.bincount(labels[valid]).argmax()
-
-    pcd_target = pcd_no_planes.select_by_index(
-        np.where(labels == largest_label)[0]
-    )
-
-    pcd_target.paint_uniform_color([0, 1, 0])
-    show_step("After First DBSCAN (Largest Cluster)", pcd_target)
-
-
-    #####################################
-
-     # --- 6. Optional: voxel downsampling ---
-    pcd_target = pcd_target.voxel_down_sample(voxel_size=0.002)
-
-    # --- 7. PCA alignment ---
-    points = np.asarray(pcd_target.points)
-    centered = points - points.mean(axis=0)
-
-    U, S, Vt = np.linalg.svd(centered, full_matrices=False)
-    aligned_points = centered @ Vt.T
-    pcd_target.points = o3d.utility.Vector3dVector(aligned_points)
-
-    pts = np.asarray(pcd_target.points)
-
-    #z_floor = np.min(pts[:, 2])
-    #mask = pts[:, 2] > z_floor + 0.003
-
-    z_floor = np.percentile(pts[:, 2], 0.5)  # Use percentile instead of min
-    z_ceiling = np.percentile(pts[:, 2], 99.5)
-    mask_z = (pts[:, 2] > z_floor) & (pts[:, 2] < z_ceiling)
-
-
-    # Remove X and Y outliers
-    x_min, x_max = np.percentile(pts[:, 0], [1, 97.5])
-    y_min, y_max = np.percentile(pts[:, 1], [1, 97.5])
-    mask_x = (pts[:, 0] > x_min) & (pts[:, 0] < x_max)
-    mask_y = (pts[:, 1] > y_min) & (pts[:, 1] < y_max)
-
-    mask = mask_z & mask_x & mask_y
-    pcd_target = pcd_target.select_by_index(np.where(mask)[0])
-
-    pcd_target, _ = pcd_target.remove_statistical_outlier(
-       nb_neighbors=30,
-       std_ratio=1.0
-    )
-
-    show_step("After Fine Tuning", pcd_target)
-    #####################################
+from src.logic.remove_plain import PlaneSegmenter, large_plane_mask
+from src.logic.profiling import PIPELINE_STAGES, VALID_METHODS, StageProfiler
+from src.logic.downsample import adaptive_voxel_downsample
+from src.logic.zband import z_band_mask
+from src.logic.outliers import radius_outlier_mask
+from src.logic.clustering import CLUSTER_ENGINES, cluster_labels, clusters_by_size
+from src.logic.minbox import min_floor_box
+from src.logic.ply_export import OUTPUT_POLICIES, export_params, export_path, write_ply, write_ply_async
+
+def convex_hull(pcd_target, shared=None):
+    # HULL and HULL_PCA need the same hull; shared caches it between them
+    if shared is not None and "hull" in shared:
+        return shared["hull"]
+    hull, _ = pcd_target.compute_convex_hull()
+    hull.compute_vertex_normals()
+    hull.paint_uniform_color([1, 0, 0])  # red
+    if shared is not None:
+        shared["hull"] = hull
+    return hull
+
+def estimate_dimensions(pcd_target, method="AABB", shared=None):
+    """
+    Run one bounding-box estimator on a cleaned target cloud.
+    shared is an optional dict reused across calls on the same cloud; MINBOX
+    reads the floor normal (in the cloud's frame) from shared["floor_normal"]
+    and falls back to the cloud's z axis.
+
+    Returns:
+        (dims dict with width/length/height/aspect_ratio, list of geometries to draw)
+    """
+    if method not in VALID_METHODS:
+        raise ValueError(f"Unknown method '{method}'. Choose one of {VALID_METHODS}")
 
     width = length = height = 0
-    geometry_to_show = []
-
-    # Always show cleaned target in gray
-    pcd_vis = o3d.geometry.PointCloud(pcd_target)
-    pcd_vis.paint_uniform_color([0.6, 0.6, 0.6])
-    geometry_to_show.append(pcd_vis)
+    geometry = []
 
     #### 
     # Axis-Aligned Bounding Box (AABB)
@@ -163,7 +46,7 @@ def dataclean(dir:str,
         width, length, height = extent
 
         aabb.color = (1, 0, 0)  # red
-        geometry_to_show.append(aabb)
+        geometry.append(aabb)
 
     ####
     # Oriented Bounding Box (OBB)
@@ -174,7 +57,7 @@ def dataclean(dir:str,
         width, length, height = dims
 
         obb.color = (0, 1, 0)  # green
-        geometry_to_show.append(obb)
+        geometry.append(obb)
 
     ####
     # PCA Bounding Box (manual)
@@ -203,14 +86,12 @@ def dataclean(dir:str,
         box.extent = dims
         box.color = (0, 0, 1)  # blue
 
-        geometry_to_show.append(box)
+        geometry.append(box)
 
     ####
     # Convex Hull (AABB from hull vertices)
     elif method == "HULL":
-        hull, _ = pcd_target.compute_convex_hull()
-        hull.compute_vertex_normals()
-        hull.paint_uniform_color([1, 0, 0])  # red
+        hull = convex_hull(pcd_target, shared)
 
         hull_points = np.asarray(hull.vertices)
         mins = hull_points.min(axis=0)
@@ -220,14 +101,12 @@ def dataclean(dir:str,
         dims_sorted = np.sort(dims)
         width, length, height = dims_sorted
 
-        geometry_to_show.append(hull)
+        geometry.append(hull)
 
     ####
     # Convex Hull + PCA
     elif method == "HULL_PCA":
-        hull, _ = pcd_target.compute_convex_hull()
-        hull.compute_vertex_normals()
-        hull.paint_uniform_color([1, 0, 0])
+        hull = convex_hull(pcd_target, shared)
 
         hull_points = np.asarray(hull.vertices)
         centered = hull_points - hull_points.mean(axis=0)
@@ -242,53 +121,612 @@ def dataclean(dir:str,
         dims_sorted = np.sort(dims)
         width, length, height = dims_sorted
 
-        geometry_to_show.append(hull)
+        geometry.append(hull)
 
-    ############################################
+    ####
+    # Minimum box on the floor: rotating calipers on the hull footprint
+    # projected onto the floor plane, height along the floor normal
+    elif method == "MINBOX":
+        hull = convex_hull(pcd_target, shared)
+        floor_normal = (shared or {}).get("floor_normal", (0.0, 0.0, 1.0))
+
+        extent, center, rotation = min_floor_box(np.asarray(hull.vertices), floor_normal)
+        width, length, height = extent
+
+        box = o3d.geometry.OrientedBoundingBox(center, rotation, extent)
+        box.color = (1, 0, 1)  # magenta
+        geometry.append(box)
+
+    # Aspect ratio (max dimension / min dimension)
+    dims_array = np.array([width, length, height])
+    aspect_ratio = float(np.max(dims_array) / np.min(dims_array)) if np.min(dims_array) > 0 else 0
+
+    return {
+        'width': float(width),
+        'length': float(length),
+        'height': float(height),
+        'aspect_ratio': aspect_ratio
+    }, geometry
+
+# Tunables of each cacheable segment of the pipeline. A cache entry is keyed
+# by the input file hash plus the parameters of its segment and of every
+# segment before it, so e.g. changing DBSCAN eps reuses the cached floor removal.
+FLOOR_PARAMS = {
+    "radius_nb_points": 10,
+    "radius": 0.02,
+    "hist_bins": 256,
+    "hist_percentiles": (2, 98),
+    "ransac_distance": 0.005,
+    "ransac_iterations": 1000,
+    "ransac_probability": 0.999,
+    "ransac_seed": 0,
+    "horizontal_threshold": 0.9,
+}
+CLUSTER_PARAMS = {
+    "max_planes": 3,
+    "plane_distance": 0.005,
+    "plane_min_inliers": 5000,
+    "dbscan_eps": 0.02,
+    "dbscan_min_points": 100,
+    # "dbscan" (Open3D) or "voxel" (voxel-grid connected components, much
+    # faster; see src/logic/clustering.py and compare_clustering.py)
+    "cluster_engine": "dbscan",
+    # dataclean(multi_object=True) measures the largest cluster and every
+    # other cluster at least this big (clutter clusters in the single-box
+    # sample scans reach ~10.5k points)...
+    "min_object_points": 12000,
+    # ...and no more elongated than this (std along the longest / shortest
+    # principal axis: boxes in the samples stay below 5, the clutter strips
+    # next to them are above 10)
+    "max_object_aspect": 6.0,
+}
+FINE_TUNE_PARAMS = {
+    "voxel_size": 0.002,
+    "z_percentiles": (0.5, 99.5),
+    "xy_percentiles": (1, 97.5),
+    "stat_nb_neighbors": 30,
+    "stat_std_ratio": 1.0,
+}
+
+@dataclass
+class PipelineConfig:
+    """
+    The tunables of one dataclean() run, one dict per pipeline segment
+    (defaults: FLOOR_PARAMS, CLUSTER_PARAMS, FINE_TUNE_PARAMS).
+    """
+    floor: dict = field(default_factory=lambda: dict(FLOOR_PARAMS))
+    cluster: dict = field(default_factory=lambda: dict(CLUSTER_PARAMS))
+    fine_tune: dict = field(default_factory=lambda: dict(FINE_TUNE_PARAMS))
+
+    @classmethod
+    def from_overrides(cls, overrides=None):
+        """
+        Defaults with flat overrides applied, e.g. {"dbscan_eps": 0.03}
+        (parameter names are unique across segments).
+        """
+        config = cls()
+        for name, value in (overrides or {}).items():
+            for section in (config.floor, config.cluster, config.fine_tune):
+                if name in section:
+                    section[name] = value
+                    break
+            else:
+                raise ValueError(f"Unknown pipeline parameter '{name}'. Choose one of {list(cls().flat())}")
+        return config
+
+    def flat(self):
+        return {**self.floor, **self.cluster, **self.fine_tune}
+
+def load_points(path):
+    """
+    Vertex positions of a scan as one float32 (N, 3) buffer. The scanner
+    writes float32 coordinates, so nothing is lost; Open3D's float64 cloud
+    only lives while reading.
+    """
+    return np.asarray(o3d.io.read_point_cloud(path).points, dtype=np.float32)
+
+def cloud_from_points(points, color=None):
+    """Open3D cloud for the native kernels (copies points as float64)."""
+    pcd = o3d.geometry.PointCloud()
+    # Vector3dVector converts other dtypes element by element, ~50x slower
+    pcd.points = o3d.utility.Vector3dVector(np.asarray(points, dtype=np.float64))
+    if color is not None:
+        pcd.paint_uniform_color(color)
+    return pcd
+
+def remove_floor(points, report, show_step, target_points=None, verbose=False, params=None):
+    """
+    Pre-downsampling, radius outlier removal, histogram Z filtering and floor RANSAC.
+
+    points is the (N, 3) buffer of the scan; the filters only narrow down an
+    index array into it. params defaults to FLOOR_PARAMS.
+
+    Returns:
+        (point buffer: points, or its pre-downsampled copy, indices of the
+        points left after floor removal, floor info dict with the RANSAC
+        counts and floor normal, PlaneSegmenter left at those points)
+    """
+    p = params or FLOOR_PARAMS
+
+    ###
+    # 0. Optional adaptive voxel pre-downsampling: keeps at most target_points
+    #    so the neighbour searches below scale with object size, not scan density.
+    report("pre_voxel", len(points))
+    if target_points is not None and len(points) > target_points:
+        pcd, pre_voxel = adaptive_voxel_downsample(cloud_from_points(points), target_points)
+        points = np.asarray(pcd.points, dtype=np.float32)
+        if verbose:
+            print(f"Pre-downsampled with voxel {pre_voxel:.4f} m -> {len(points)} points")
+
+    ###
+    # 1. Radius outlier removal (your first layer)
+    report("radius_outlier", len(points))
+    indices = np.flatnonzero(radius_outlier_mask(points, p["radius_nb_points"], p["radius"]))
+    show_step("After Radius Outlier Removal", points, indices)
+
+    # 2-3. Histogram equalization of Z, then drop the lowest / highest band
+    #      (single-pass equivalent of normalize -> equalize -> percentile)
+    report("histogram_filter", len(indices))
+    z = points[indices, 2].astype(np.float64)
+    indices = indices[z_band_mask(z, p["hist_percentiles"], p["hist_bins"])]
+    show_step("After Histogram Z Filtering(Equalization)", points, indices)
+
+    ###
+    # 4. RANSAC (the segmenter is handed on to remove_large_planes so the
+    #    wall search reuses its hypotheses)
+    report("floor_ransac", len(indices))
+    segmenter = PlaneSegmenter(
+        points[indices],
+        distance_threshold=p["ransac_distance"],
+        max_iterations=p["ransac_iterations"],
+        probability=p["ransac_probability"],
+        seed=p["ransac_seed"]
+    )
+    plane_model, inliers = segmenter.next_plane()
+
+    [a, b, c, d] = plane_model
+    normal = np.array([a, b, c])
+    normal /= np.linalg.norm(normal)
+
+    ###
+    # 5. Only accept near-horizontal planes
+    is_floor = abs(normal @ np.array([0, 0, 1])) > p["horizontal_threshold"]
+    ransac_total = len(indices)
+    if is_floor:
+        segmenter.remove(inliers)
+        indices = indices[segmenter.remaining]
+
+    show_step("After Floor Removal (RANSAC)", points, indices)
+
+    floor_info = {
+        "ransac_inliers": len(inliers),
+        "ransac_total": ransac_total,
+        "floor_normal": normal.tolist(),
+        "floor_removed": bool(is_floor),
+    }
+    return points, indices, floor_info, segmenter
+
+def isolate_objects(points, indices, report, show_step, segmenter=None, cluster_engine=None,
+                    min_object_points=None, params=None):
+    """
+    Remove the remaining large planes and cluster what is left.
+
+    indices selects the points of the buffer left after floor removal.
+    segmenter is the PlaneSegmenter of the floor search, if available (its
+    remaining points must be those, in order); its hypotheses are reused when
+    it used the same distance threshold.
+    params defaults to CLUSTER_PARAMS; cluster_engine overrides its "cluster_engine".
+
+    Returns:
+        list of index arrays into points, largest cluster first: only the
+        largest one, or with min_object_points the largest one plus every
+        other cluster with at least that many points and a principal aspect
+        ratio of at most params["max_object_aspect"]
+    """
+    p = params or CLUSTER_PARAMS
+
+    if segmenter is not None and segmenter.distance_threshold != p["plane_distance"]:
+        segmenter = None
+
+    report("remove_planes", len(indices))
+    if segmenter is None:
+        segmenter = PlaneSegmenter(points[indices], p["plane_distance"])
+    indices = indices[large_plane_mask(segmenter, p["max_planes"], p["plane_min_inliers"])]
+
+    show_step("After Removing Large Planes", points, indices)
+
+
+    ###
+    # 6. DBSCAN (or its voxel-grid approximation)
+    report("dbscan", len(indices))
+    labels = cluster_labels(
+        points[indices],
+        eps=p["dbscan_eps"],
+        min_points=p["dbscan_min_points"],
+        engine=cluster_engine or p["cluster_engine"]
+    )
+    clusters = clusters_by_size(labels)
+    if not clusters:
+        raise ValueError("No object cluster found after plane removal")
+    # The largest cluster is always measured (as in single-object mode);
+    # min_object_points and max_object_aspect only decide which other
+    # clusters count as objects
+    if min_object_points is None:
+        clusters = clusters[:1]
+    else:
+        clusters = clusters[:1] + [
+            c for c in clusters[1:]
+            if len(c) >= min_object_points and principal_aspect(points[indices[c]]) <= p["max_object_aspect"]
+        ]
+
+    objects = [indices[cluster] for cluster in clusters]
+    show_step("After First DBSCAN (Largest Cluster)", points, objects[0], [0, 1, 0])
+    return objects
+
+def principal_aspect(points):
+    """Spread along the longest principal axis over the spread along the shortest."""
+    spread = np.linalg.svd(points - points.mean(axis=0, dtype=np.float64), compute_uv=False)
+    return float(spread[0] / max(spread[-1], 1e-12))
+
+def isolate_target(points, indices, report, show_step, segmenter=None, cluster_engine=None, params=None):
+    """
+    Remove the remaining large planes and keep the largest DBSCAN cluster.
+
+    Returns:
+        indices of its points in points
+    """
+    return isolate_objects(points, indices, report, show_step, segmenter, cluster_engine, params=params)[0]
+
+def fine_tune(points, report, show_step, floor_normal=None, params=None):
+    """
+    Voxel downsampling, PCA alignment, percentile trimming and statistical
+    outlier removal of the target cluster ((N, 3) array of its points).
+
+    Returns the cleaned cloud, painted green, as an Open3D point cloud for
+    the bounding-box estimators. floor_normal (scan frame) is optional; when
+    given, the result is (cleaned cloud, floor normal in the PCA-aligned
+    frame) instead. params defaults to FINE_TUNE_PARAMS.
+    """
+    p = params or FINE_TUNE_PARAMS
+
+     # --- 6. Optional: voxel downsampling ---
+    report("voxel_downsample", len(points))
+    pcd_target = cloud_from_points(points).voxel_down_sample(voxel_size=p["voxel_size"])
+
+    # --- 7. PCA alignment ---
+    points = np.asarray(pcd_target.points)
+    report("pca_alignment", len(points))
+    centered = points - points.mean(axis=0)
+
+    U, S, Vt = np.linalg.svd(centered, full_matrices=False)
+    pts = centered @ Vt.T
+    if floor_normal is not None:
+        floor_normal = (Vt @ np.asarray(floor_normal)).tolist()
+
+    #z_floor = np.min(pts[:, 2])
+    #mask = pts[:, 2] > z_floor + 0.003
+
+    z_low, z_high = p["z_percentiles"]
+    z_floor = np.percentile(pts[:, 2], z_low)  # Use percentile instead of min
+    z_ceiling = np.percentile(pts[:, 2], z_high)
+    mask_z = (pts[:, 2] > z_floor) & (pts[:, 2] < z_ceiling)
+
+
+    # Remove X and Y outliers
+    x_min, x_max = np.percentile(pts[:, 0], p["xy_percentiles"])
+    y_min, y_max = np.percentile(pts[:, 1], p["xy_percentiles"])
+    mask_x = (pts[:, 0] > x_min) & (pts[:, 0] < x_max)
+    mask_y = (pts[:, 1] > y_min) & (pts[:, 1] < y_max)
+
+    mask = mask_z & mask_x & mask_y
+    pcd_target = cloud_from_points(pts[mask], [0, 1, 0])
+
+    report("statistical_outlier", len(pcd_target.points))
+    pcd_target, _ = pcd_target.remove_statistical_outlier(
+       nb_neighbors=p["stat_nb_neighbors"],
+       std_ratio=p["stat_std_ratio"]
+    )
+
+    show_step("After Fine Tuning", np.asarray(pcd_target.points))
+    if floor_normal is not None:
+        return pcd_target, floor_normal
+    return pcd_target
+
+def measure_object(points, methods, floor_normal=None, params=None):
+    """
+    Fine-tune one cluster ((N, 3) array of its points) and estimate its
+    dimensions with every method.
+
+    Returns:
+        (cleaned point cloud or None on failure, result dict with the
+        dimensions of the first method, point_count, centroid of the cluster
+        in scan coordinates and 'methods' when there are several, floor
+        normal in the cleaned cloud's frame, {method: dimensions},
+        bounding-box geometry for visualization)
+    """
+    def no_report(*args):
+        pass
+
+    centroid = points.mean(axis=0, dtype=np.float64).tolist()
+    try:
+        pcd_cleaned, aligned_normal = fine_tune(points, no_report, no_report, floor_normal or (0, 0, 1), params)
+        dims, geometry = {}, []
+        shared = {"floor_normal": aligned_normal}
+        for m in methods:
+            dims[m], method_geometry = estimate_dimensions(pcd_cleaned, m, shared)
+            geometry.extend(method_geometry)
+    except Exception as e:
+        return None, {"centroid": centroid, "error": str(e)}, None, {}, []
+
+    entry = {**dims[methods[0]], "point_count": len(pcd_cleaned.points), "centroid": centroid}
+    if len(methods) > 1:
+        entry["methods"] = dims
+    return pcd_cleaned, entry, aligned_normal, dims, geometry
+
+# Load point cloud (works for .ply and .xyz)
+def dataclean(dir:str, 
+              visualize_flag=True, 
+              method="AABB", 
+              output_dir="output",
+              verbose=False,
+              progress_callback=None,
+              profile=False,
+              target_points=None,
+              cache=None,
+              points=None,
+              cluster_engine=None,
+              multi_object=False,
+              min_object_points=None,
+              export=None,
+              output_policy="write",
+              config=None):
+    """
+    Clean a scan, isolate the target object and measure it.
+
+    cache is an optional PointCloudCache: the cloud after floor removal, the
+    DBSCAN target cluster, the cleaned cloud and the dimensions are reused
+    when the file contents and the parameters of those stages are unchanged.
+
+    points is an optional (N, 3) array of vertex positions that was already
+    parsed (e.g. while an upload streamed in); dir is then only used to name
+    the cleaned output file and is not read.
+
+    cluster_engine picks the target clustering ("dbscan" or "voxel"),
+    default config.cluster["cluster_engine"].
+
+    multi_object=True measures the largest cluster plus every other one with
+    at least min_object_points points (default
+    config.cluster["min_object_points"]) that is not too elongated to be a
+    box (config.cluster["max_object_aspect"]) and adds
+    an 'objects' list (largest first, each with its centroid) to the result.
+    The top-level dimensions still describe the largest object. Only the
+    floor removal is taken from the cache in this mode.
+
+    export overrides the format of the cleaned cloud written to output_dir
+    (EXPORT_PARAMS in src/logic/ply_export.py: encoding, precision,
+    compression); the file name is returned as 'cleaned_file'.
+
+    output_policy (OUTPUT_POLICIES) decides what happens to that file:
+    "write" writes it before returning, "async" queues it on a background
+    writer thread (it appears shortly after the call returns, see
+    ply_export.wait_for_writes), "none" skips it and output_dir entirely.
+
+    config is a PipelineConfig, or a dict of flat overrides such as
+    {"dbscan_eps": 0.03}, replacing the module-level defaults for this run.
+    """
+
+    # method may be a single name or a sequence of names; a sequence cleans
+    # the cloud once and adds a 'methods' dict with one result per estimator
+    multi_method = not isinstance(method, str)
+    methods = list(method) if multi_method else [method]
+    for m in methods:
+        if m not in VALID_METHODS:
+            raise ValueError(f"Unknown method '{m}'. Choose one of {VALID_METHODS}")
+    if not isinstance(config, PipelineConfig):
+        config = PipelineConfig.from_overrides(config)
+    export = export_params(export)
+    if output_policy not in OUTPUT_POLICIES:
+        raise ValueError(f"Unknown output policy '{output_policy}'. Choose one of {OUTPUT_POLICIES}")
+    cluster_engine = cluster_engine or config.cluster["cluster_engine"]
+    if cluster_engine not in CLUSTER_ENGINES:
+        raise ValueError(f"Unknown cluster engine '{cluster_engine}'. Choose one of {CLUSTER_ENGINES}")
+
+    ####
+    # Stage helper: called when each stage of PIPELINE_STAGES starts with the
+    # number of points entering it.
+    #   progress_callback(stage, index, total) feeds the API job status
+    #   profile=True records per-stage time / point counts / peak memory
+    profiler = StageProfiler() if profile else None
+
+    def report(stage, n_points):
+        if profiler is not None:
+            profiler.lap(stage, n_points)
+        if progress_callback is not None:
+            progress_callback(stage, PIPELINE_STAGES.index(stage) + 1, len(PIPELINE_STAGES))
+
+    ####
+    # Verbose Flag helper function to display each steps (points[indices]
+    # is only gathered when displayed)
+    def show_step(title, points, indices=None, color=None):
+        if not verbose:
+            return
+        print(f"\n--- {title} ---")
+        o3d.visualization.draw_geometries([
+            cloud_from_points(points if indices is None else points[indices], color)
+        ])
+    ####
+
+    output_dir = Path(output_dir)
+    if output_policy != "none":
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    ####
+    # The stages carry one (N, 3) buffer of the scan (float32, as scanned)
+    # plus index arrays into it; Open3D clouds are only built for its native
+    # kernels (DBSCAN, voxel downsampling, statistical outliers, estimators).
+    #
+    # Cache checkpoints: floor -> cluster -> cleaned -> dims (each key chains
+    # the previous one, so a changed parameter only invalidates what follows)
+    report("load", 0)
+    floor_info = no_floor = cluster = pcd_target = segmenter = None
+    if cache is not None:
+        floor_key = cache.stage_key(
+            cache.array_digest(points) if points is not None else cache.file_digest(dir), "floor", {**config.floor, "target_points": target_points}
+        )
+        cluster_key = cache.stage_key(floor_key, "cluster", {**config.cluster, "cluster_engine": cluster_engine})
+        cleaned_key = cache.stage_key(cluster_key, "cleaned", config.fine_tune)
+
+        floor_info = cache.get_json(floor_key)
+        cached = None
+        if floor_info is not None and multi_object:
+            cached = cache.get_points(floor_key)
+        elif floor_info is not None:
+            cached = cache.get_points(cleaned_key)
+            if cached is not None:
+                pcd_target = cloud_from_points(cached, [0, 1, 0])
+                cached = None
+            else:
+                cluster = cache.get_points(cluster_key)
+                if cluster is None:
+                    cached = cache.get_points(floor_key)
+        if cached is not None:
+            points, no_floor = cached, np.arange(len(cached))
+
+    if pcd_target is None and cluster is None and no_floor is None:
+        if points is None:
+            points = load_points(dir)
+        else:
+            points = np.asarray(points, dtype=np.float32)
+        show_step("Original Point Cloud", points)
+
+        input_point_count = len(points)
+        points, no_floor, floor_info, segmenter = remove_floor(points, report, show_step, target_points, verbose, config.floor)
+        floor_info["input_point_count"] = input_point_count
+        if cache is not None:
+            cache.put_points(floor_key, points[no_floor])
+            cache.put_json(floor_key, floor_info)
+
+    # MINBOX measures height along the normal of the dominant RANSAC plane.
+    # It is used even when that plane failed the horizontal test: the sample
+    # scans are taken with y up, and the plane is the floor all the same.
+    scan_up = floor_info["floor_normal"]
+    aligned_up = None
+
+    objects = None
+    if multi_object:
+        clusters = isolate_objects(
+            points, no_floor, report, show_step, segmenter, cluster_engine,
+            min_object_points or config.cluster["min_object_points"], config.cluster
+        )
+
+        # Fine tuning + bounding boxes of all objects (reported as one stage)
+        report("voxel_downsample", sum(len(c) for c in clusters))
+        measured = [measure_object(points[c], methods, scan_up, config.fine_tune) for c in clusters]
+
+        pcd_target, _, aligned_up, object_dims, object_geometry = measured[0]
+        objects = [entry for _, entry, _, _, _ in measured]
+        if pcd_target is None:
+            raise ValueError(f"Failed to measure the largest object: {objects[0]['error']}")
+
+    if pcd_target is None and cluster is None:
+        cluster = points[isolate_target(points, no_floor, report, show_step, segmenter, cluster_engine, config.cluster)]
+        if cache is not None:
+            cache.put_points(cluster_key, cluster)
+
+    if pcd_target is None:
+        pcd_target, aligned_up = fine_tune(cluster, report, show_step, scan_up, config.fine_tune)
+        if cache is not None:
+            cache.put_points(cleaned_key, np.asarray(pcd_target.points))
+            cache.put_json(cleaned_key, {"floor_normal": aligned_up})
+    elif aligned_up is None and cache is not None:
+        aligned_up = (cache.get_json(cleaned_key) or {}).get("floor_normal")
+
+    #####################################
+
+    report("bounding_box", len(pcd_target.points))
+    geometry_to_show = []
+
+    # Always show cleaned target in gray
+    pcd_vis = o3d.geometry.PointCloud(pcd_target)
+    pcd_vis.paint_uniform_color([0.6, 0.6, 0.6])
+    geometry_to_show.append(pcd_vis)
+
+    # Every requested estimator runs on the same cleaned target
+    method_dims = {}
+    shared = {"floor_normal": aligned_up} if aligned_up is not None else {}
+    if objects is not None:
+        # Already measured with the other objects
+        method_dims = object_dims
+        geometry_to_show.extend(object_geometry)
+    for m in methods:
+        if m in method_dims:
+            continue
+        dims_key = cache.stage_key(cleaned_key, "dims", {"method": m}) if cache is not None else None
+        cached_dims = cache.get_json(dims_key) if cache is not None and not visualize_flag else None
+        if cached_dims is not None:
+            method_dims[m] = cached_dims
+            continue
+
+        method_dims[m], geometry = estimate_dimensions(pcd_target, m, shared)
+        geometry_to_show.extend(geometry)
+        if cache is not None:
+            cache.put_json(dims_key, method_dims[m])
 
-    
     filename = dir.split('/')[-1]
 
     # Calculate quality metrics
     final_points = np.asarray(pcd_target.points)
     point_count = len(final_points)
+    input_point_count = floor_info["input_point_count"]
     
     # RANSAC inlier ratio
-    total_points_before_ransac = len(np.asarray(pcd_histogram.points))
-    ransac_inlier_ratio = len(inliers) / total_points_before_ransac if total_points_before_ransac > 0 else 0
-    
+    total_points_before_ransac = floor_info["ransac_total"]
+    ransac_inlier_ratio = floor_info["ransac_inliers"] / total_points_before_ransac if total_points_before_ransac > 0 else 0
+
     # Standard deviations along each axis
     std_x = float(np.std(final_points[:, 0]))
     std_y = float(np.std(final_points[:, 1]))
     std_z = float(np.std(final_points[:, 2]))
-    
-    # Aspect ratio (max dimension / min dimension)
-    dims_array = np.array([width, length, height])
-    aspect_ratio = float(np.max(dims_array) / np.min(dims_array)) if np.min(dims_array) > 0 else 0
 
     if verbose:
-        print(f"\n{method} dimensions of {filename}:")
-        print(f"Width:  {width:.3f}")
-        print(f"Length: {length:.3f}")
-        print(f"Height: {height:.3f}")
+        for m, dims in method_dims.items():
+            print(f"\n{m} dimensions of {filename}:")
+            print(f"Width:  {dims['width']:.3f}")
+            print(f"Length: {dims['length']:.3f}")
+            print(f"Height: {dims['height']:.3f}")
 
+    report("export", point_count)
     input_path = Path(dir)
     output_path = output_dir / f"{input_path.stem}_cleaned.ply"
-
-    o3d.io.write_point_cloud(str(output_path), pcd_target)  
+    colors = np.asarray(pcd_target.colors) if pcd_target.has_colors() else None
+    if output_policy == "write":
+        output_path = write_ply(output_path, final_points, colors, **export)
+    elif output_policy == "async":
+        write_ply_async(output_path, final_points, colors, **export)
+        output_path = export_path(output_path, export["compression"])
       
     if visualize_flag:
         o3d.visualization.draw_geometries(geometry_to_show)
 
     # Return dimensions and quality metrics for batch processing
-    return {
-        'width': float(width),
-        'length': float(length),
-        'height': float(height),
+    # (top-level width/length/height/aspect_ratio come from the first method)
+    result = {
+        **method_dims[methods[0]],
         'point_count': point_count,
+        'input_point_count': input_point_count,
         'ransac_inlier_ratio': float(ransac_inlier_ratio),
         'std_x': std_x,
         'std_y': std_y,
         'std_z': std_z,
-        'aspect_ratio': aspect_ratio
-    }
\ No newline at end of file
+    }
+    if output_policy != "none":
+        result['cleaned_file'] = output_path.name
+    if multi_method:
+        result['methods'] = method_dims
+    if objects is not None:
+        result['objects'] = objects
+
+    if profiler is not None:
+        result['profile'] = profiler.finish(point_count)
+
+    return result
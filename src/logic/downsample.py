@@ -0,0 +1,39 @@
+import math
+
+# Smallest pre-downsampling voxel. It matches the final voxel_down_sample()
+# in dataclean() so this size never removes detail the pipeline would keep.
+MIN_PRE_VOXEL = 0.002
+
+# Largest pre-downsampling voxel. The neighbour-count thresholds downstream
+# (radius outlier nb_points=10, DBSCAN min_points=100 within 2 cm) stop being
+# reachable on object surfaces beyond roughly this spacing; 3 mm already
+# raised the sample-scan MAE from 3.4 to 4.8 cm.
+MAX_PRE_VOXEL = 0.0025
+
+
+def adaptive_voxel_downsample(pcd, target_points, min_voxel=MIN_PRE_VOXEL, max_voxel=MAX_PRE_VOXEL):
+    """
+    Voxel-downsample pcd until it holds at most target_points points.
+
+    Scans are mostly surfaces, so the point count falls roughly with the
+    square of the voxel size; each retry uses that to pick the next size.
+    The voxel never grows past max_voxel, so the budget is best-effort: dense
+    scans shrink a lot, already sparse scans barely change.
+
+    Returns:
+        (downsampled point cloud, voxel size used) or (pcd, None) when the
+        cloud already fits the budget
+    """
+    if target_points is None or len(pcd.points) <= target_points:
+        return pcd, None
+
+    voxel = min_voxel
+    while True:
+        down = pcd.voxel_down_sample(voxel_size=voxel)
+        count = len(down.points)
+        if count <= target_points or voxel >= max_voxel:
+            return down, voxel
+
+        growth = math.sqrt(count / target_points)
+        voxel = min(max_voxel, voxel * min(max(growth, 1.1), 2.0))
+
@@ -0,0 +1,115 @@
+"""
+Minimum-volume box standing on the floor: minimum-area rectangle of the
+footprint (rotating calipers) times the height along the floor normal
+"""
+
+import numpy as np
+
+
+def floor_basis(normal):
+    """
+    Orthonormal frame (u, v, normal) with u and v spanning the floor plane.
+
+    Returns:
+        3x3 array whose rows are u, v and the unit normal
+    """
+    normal = np.asarray(normal, dtype=np.float64)
+    normal = normal / np.linalg.norm(normal)
+    # Cross with the axis least aligned with the normal for a stable u
+    helper = np.zeros(3)
+    helper[np.argmin(np.abs(normal))] = 1.0
+    u = np.cross(normal, helper)
+    u /= np.linalg.norm(u)
+    v = np.cross(normal, u)
+    return np.stack([u, v, normal])
+
+
+def convex_hull_2d(points):
+    """
+    Convex hull of 2-D points (Andrew's monotone chain).
+
+    Returns:
+        hull vertices in counter-clockwise order, without collinear points
+    """
+    points = np.unique(np.asarray(points, dtype=np.float64), axis=0)
+    if len(points) < 3:
+        return points
+
+    def half(sequence):
+        chain = []
+        for p in sequence:
+            while len(chain) >= 2:
+                (ax, ay), (bx, by) = chain[-2], chain[-1]
+                if (bx - ax) * (p[1] - ay) - (by - ay) * (p[0] - ax) > 0:
+                    break
+                chain.pop()
+            chain.append(tuple(p))
+        return chain[:-1]
+
+    lower = half(points)
+    upper = half(points[::-1])
+    return np.array(lower + upper)
+
+
+def min_area_rectangle(points):
+    """
+    Minimum-area rectangle enclosing 2-D points.
+
+    One side of the optimal rectangle lies on a hull edge, so the calipers
+    only need to visit the hull edge directions; all of them are evaluated
+    at once as an (edges x hull vertices) projection.
+
+    Returns:
+        (center (2,), side lengths (2,) with the longer side first,
+        unit direction (2,) of the longer side)
+    """
+    hull = convex_hull_2d(points)
+    if len(hull) < 3:
+        # Degenerate footprint: a point or a segment
+        lo, hi = hull.min(axis=0), hull.max(axis=0)
+        axis = np.array([1.0, 0.0]) if hi[0] - lo[0] >= hi[1] - lo[1] else np.array([0.0, 1.0])
+        sides = np.sort(hi - lo)[::-1]
+        return (lo + hi) / 2, sides, axis
+
+    edges = np.roll(hull, -1, axis=0) - hull
+    directions = edges / np.linalg.norm(edges, axis=1, keepdims=True)
+    normals = np.stack([-directions[:, 1], directions[:, 0]], axis=1)
+
+    along = directions @ hull.T      # (edges, vertices)
+    across = normals @ hull.T
+    lo_a, hi_a = along.min(axis=1), along.max(axis=1)
+    lo_c, hi_c = across.min(axis=1), across.max(axis=1)
+    areas = (hi_a - lo_a) * (hi_c - lo_c)
+
+    best = np.argmin(areas)
+    d, n = directions[best], normals[best]
+    center = d * (lo_a[best] + hi_a[best]) / 2 + n * (lo_c[best] + hi_c[best]) / 2
+    sides = np.array([hi_a[best] - lo_a[best], hi_c[best] - lo_c[best]])
+    if sides[1] > sides[0]:
+        sides, d = sides[::-1], n
+    return center, sides, d
+
+
+def min_floor_box(points, floor_normal):
+    """
+    Smallest box with one face on the floor plane that holds points.
+
+    Args:
+        points: (N, 3) points (e.g. convex hull vertices of the object)
+        floor_normal: floor normal in the same frame as points
+
+    Returns:
+        (extent [longer side, shorter side, height], center (3,),
+        rotation 3x3 whose columns are the box axes)
+    """
+    basis = floor_basis(floor_normal)
+    local = np.asarray(points) @ basis.T
+
+    center_2d, sides, direction = min_area_rectangle(local[:, :2])
+    low, high = local[:, 2].min(), local[:, 2].max()
+
+    axis_a = direction[0] * basis[0] + direction[1] * basis[1]
+    axis_b = np.cross(basis[2], axis_a)
+    rotation = np.stack([axis_a, axis_b, basis[2]], axis=1)
+    center = center_2d[0] * basis[0] + center_2d[1] * basis[1] + (low + high) / 2 * basis[2]
+    return np.array([sides[0], sides[1], high - low]), center, rotation
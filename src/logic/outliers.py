@@ -0,0 +1,52 @@
+"""
+Neighbour-count outlier filter returning a mask instead of a new cloud
+"""
+
+import numpy as np
+
+# Points per neighbour query (bounds the temporaries to a few MB)
+QUERY_CHUNK = 1 << 15
+
+
+def radius_outlier_mask(points, nb_points=10, radius=0.02):
+    """
+    Same selection as Open3D's remove_radius_outlier: a point is kept when
+    more than nb_points points (itself included) lie within radius.
+
+    A k-nearest query bounded by radius stops after nb_points + 1 neighbours
+    instead of collecting every point of the ball, which is several times
+    faster on dense scans.
+
+    Without scipy it falls back to Open3D's remove_radius_outlier itself.
+
+    Args:
+        points: (N, 3) array (float32 or float64)
+
+    Returns:
+        boolean mask of len(points), True for the points to keep
+    """
+    points = np.asarray(points)
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return _open3d_radius_outlier_mask(points, nb_points, radius)
+
+    tree = cKDTree(points)
+    mask = np.empty(len(points), dtype=bool)
+    # Queried in chunks: each returns (chunk, k) distances and indices
+    for start in range(0, len(points), QUERY_CHUNK):
+        distances, _ = tree.query(points[start:start + QUERY_CHUNK], k=[nb_points + 1],
+                                  distance_upper_bound=radius)
+        mask[start:start + QUERY_CHUNK] = np.isfinite(distances[:, 0])
+    return mask
+
+
+def _open3d_radius_outlier_mask(points, nb_points, radius):
+    import open3d as o3d
+
+    # Vector3dVector is much slower on float32 input
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(np.asarray(points, dtype=np.float64)))
+    _, kept = pcd.remove_radius_outlier(nb_points=nb_points, radius=radius)
+    mask = np.zeros(len(points), dtype=bool)
+    mask[np.asarray(kept, dtype=np.int64)] = True
+    return mask
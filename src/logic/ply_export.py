@@ -0,0 +1,227 @@
+"""
+Compact PLY export of cleaned clouds: binary or ASCII, float64 / float32 /
+quantized int16 coordinates, optional gzip or zstd compression
+"""
+
+import gzip
+import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+
+from src.logic.ply_stream import PlyStreamParser
+
+PLY_ENCODINGS = ("binary", "ascii")
+PLY_PRECISIONS = ("float64", "float32", "int16")
+PLY_COMPRESSIONS = ("none", "gzip", "zstd")
+
+# Default of dataclean(export=...): the binary float64 file Open3D wrote
+# before. float32 (~0.1 um resolution at scan scale) halves its size and
+# stays a standard PLY; int16 is opt-in only, see QUANTIZATION_COMMENT.
+EXPORT_PARAMS = {
+    "encoding": "binary",
+    "precision": "float64",
+    "compression": "none",
+}
+
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# What dataclean() does with the cleaned cloud: nothing, write it before
+# returning, or hand it to a background writer thread
+OUTPUT_POLICIES = ("none", "write", "async")
+
+# int16 coordinates are stored as (point - origin) / scale; the header keeps
+# origin and scale in this comment. Only read_ply_points() applies it: Open3D
+# and other PLY readers ignore comments and load the raw integers, so int16
+# files are for consumers that use read_ply_points(), never the default.
+QUANTIZATION_COMMENT = "comment quantized origin {:.9g} {:.9g} {:.9g} scale {:.9g}"
+QUANTIZATION_PATTERN = re.compile(rb"comment quantized origin (\S+) (\S+) (\S+) scale (\S+)")
+
+COORDINATE_TYPES = {"float64": ("double", "<f8"), "float32": ("float", "<f4"), "int16": ("short", "<i2")}
+
+
+def export_params(overrides=None):
+    """EXPORT_PARAMS with overrides applied and checked."""
+    params = {**EXPORT_PARAMS, **(overrides or {})}
+    for key, choices in (("encoding", PLY_ENCODINGS), ("precision", PLY_PRECISIONS),
+                         ("compression", PLY_COMPRESSIONS)):
+        if params[key] not in choices:
+            raise ValueError(f"Unknown PLY {key} '{params[key]}'. Choose one of {choices}")
+    return params
+
+
+def quantize(points):
+    """
+    int16 coordinates relative to the bounding-box center.
+
+    Returns:
+        (int16 (N, 3) array, origin (3,), scale) with
+        points ~= origin + quantized * scale, error at most scale / 2
+    """
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    origin = (lo + hi) / 2
+    scale = max(float((hi - lo).max()) / 2 / 32767, np.finfo(np.float32).tiny)
+    quantized = np.round((points - origin) / scale).astype(np.int16)
+    return quantized, origin, scale
+
+
+def ply_bytes(points, colors=None, encoding="binary", precision="float64"):
+    """
+    Encode a point cloud as a PLY file.
+
+    Args:
+        points: (N, 3) coordinates in metres
+        colors: optional (N, 3) floats in [0, 1], stored as uchar RGB
+
+    Returns:
+        the file contents
+    """
+    points = np.asarray(points, dtype=np.float64)
+    ply_type, dtype = COORDINATE_TYPES[precision]
+
+    header = ["ply", f"format {'ascii' if encoding == 'ascii' else 'binary_little_endian'} 1.0"]
+    if precision == "int16" and len(points):
+        coords, origin, scale = quantize(points)
+        header.append(QUANTIZATION_COMMENT.format(*origin, scale))
+    else:
+        coords = points.astype(dtype)
+
+    fields = [("x", dtype), ("y", dtype), ("z", dtype)]
+    header.append(f"element vertex {len(points)}")
+    header += [f"property {ply_type} {axis}" for axis in "xyz"]
+    if colors is not None:
+        fields += [("red", "u1"), ("green", "u1"), ("blue", "u1")]
+        header += [f"property uchar {channel}" for channel in ("red", "green", "blue")]
+    header.append("end_header")
+    header = ("\n".join(header) + "\n").encode("ascii")
+
+    vertices = np.empty(len(points), dtype=fields)
+    for i, axis in enumerate("xyz"):
+        vertices[axis] = coords[:, i]
+    if colors is not None:
+        rgb = np.round(np.clip(np.asarray(colors), 0, 1) * 255).astype(np.uint8)
+        for i, channel in enumerate(("red", "green", "blue")):
+            vertices[channel] = rgb[:, i]
+
+    if encoding == "binary":
+        return header + vertices.tobytes()
+
+    float_format = "%.9g" if precision == "float32" else "%.17g"
+    formats = ["%d" if precision == "int16" else float_format] * 3 + ["%d"] * (len(fields) - 3)
+    body = io.StringIO()
+    np.savetxt(body, np.column_stack([vertices[name] for name, _ in fields]), fmt=formats)
+    return header + body.getvalue().encode("ascii")
+
+
+def compress(data, compression):
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def decompress(data, compression):
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def export_path(path, compression="none"):
+    """Path write_ply() writes to: ".gz" / ".zst" appended when compressed."""
+    return Path(f"{path}{COMPRESSION_SUFFIXES[compression]}")
+
+
+def write_ply(path, points, colors=None, encoding="binary", precision="float64", compression="none"):
+    """
+    Write a point cloud in the given format.
+
+    Returns:
+        the path written (see export_path)
+    """
+    export_params({"encoding": encoding, "precision": precision, "compression": compression})
+    path = export_path(path, compression)
+    data = compress(ply_bytes(points, colors, encoding, precision), compression)
+
+    # Write then rename, so a reader never sees a half-written file
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    return path
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_pending_writes = set()
+
+
+def write_ply_async(path, points, colors=None, **export):
+    """
+    write_ply() on a background thread (one per process, so files are
+    written in order). points and colors are copied first.
+
+    Returns:
+        Future of the written path; failures are printed
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ply-export")
+
+    points = np.array(points, copy=True)
+    colors = None if colors is None else np.array(colors, copy=True)
+    future = _writer.submit(write_ply, path, points, colors, **export)
+    _pending_writes.add(future)
+
+    def done(f):
+        _pending_writes.discard(f)
+        if f.exception() is not None:
+            print(f"Failed to write {path}: {f.exception()}")
+
+    future.add_done_callback(done)
+    return future
+
+
+def wait_for_writes(timeout=None):
+    """Block until the background writes queued so far have finished."""
+    wait(list(_pending_writes), timeout=timeout)
+
+
+def read_ply_points(path):
+    """
+    Vertex coordinates (N, 3) float64 of a file written by write_ply(),
+    decompressed and dequantized.
+    """
+    path = Path(path)
+    compression = {suffix: name for name, suffix in COMPRESSION_SUFFIXES.items() if suffix}.get(path.suffix, "none")
+    data = decompress(path.read_bytes(), compression)
+
+    header_end = data.index(b"end_header") + len(b"end_header\n")
+    header = data[:header_end]
+    if b"format ascii" in header:
+        n_vertices = int(re.search(rb"element vertex (\d+)", header).group(1))
+        rows = data[header_end:].decode("ascii").split("\n")[:n_vertices]
+        points = np.array([row.split()[:3] for row in rows], dtype=np.float64).reshape(-1, 3)
+    else:
+        parser = PlyStreamParser()
+        parser.feed(data)
+        points = parser.close()
+
+    match = QUANTIZATION_PATTERN.search(header)
+    if match:
+        origin = np.array([float(v) for v in match.groups()[:3]])
+        points = origin + points * float(match.group(4))
+    return points
@@ -0,0 +1,166 @@
+"""
+Incremental parser for binary little-endian PLY files
+"""
+
+import numpy as np
+
+# PLY scalar types -> little-endian NumPy dtypes
+PLY_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "<i2", "int16": "<i2",
+    "ushort": "<u2", "uint16": "<u2",
+    "int": "<i4", "int32": "<i4",
+    "uint": "<u4", "uint32": "<u4",
+    "float": "<f4", "float32": "<f4",
+    "double": "<f8", "float64": "<f8",
+}
+
+# Give up looking for end_header after this many bytes
+MAX_HEADER_BYTES = 64 * 1024
+
+# Largest vertex count accepted from a header (a dense LiDAR scan has a few
+# million); the header is untrusted input
+MAX_VERTICES = 50_000_000
+
+
+class PlyFormatError(ValueError):
+    """The data is not a valid PLY file (bad header, truncated body, ...)."""
+
+
+class UnsupportedPlyError(PlyFormatError):
+    """Valid PLY that this parser does not handle (ASCII, big-endian, list properties)."""
+
+
+class PlyStreamParser:
+    """
+    Parse the vertex positions of a binary little-endian PLY file from chunks
+    of bytes as they arrive, e.g. straight from an HTTP request body.
+
+    The header is parsed as soon as it is complete; vertex records are then
+    appended to a buffer as they arrive, so no second pass over the data is
+    needed once the last chunk has been fed. The buffer only grows with the
+    bytes actually received, never with the vertex count the header claims.
+
+    Usage:
+        parser = PlyStreamParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        points = parser.close()  # (N, 3) float64 x/y/z
+    """
+
+    def __init__(self, max_vertices: int = MAX_VERTICES, total_bytes=None):
+        """
+        Args:
+            max_vertices: larger vertex counts are rejected
+            total_bytes: size of the whole file when known (e.g. Content-Length);
+                    a header claiming more vertex data than that is rejected
+        """
+        self.max_vertices = max_vertices
+        self.total_bytes = total_bytes
+        self._header = bytearray()
+        self.vertex_count = None
+        self.vertex_dtype = None
+        self._skip = 0        # bytes of fixed-size elements stored before the vertices
+        self._buffer = None
+        self._expected = 0    # vertex bytes the header announces
+
+    @property
+    def header_parsed(self) -> bool:
+        return self._buffer is not None
+
+    def feed(self, chunk: bytes):
+        if not self.header_parsed:
+            self._header += chunk
+            end = self._header.find(b"end_header")
+            line_end = self._header.find(b"\n", end) if end >= 0 else -1
+            if line_end < 0:
+                if len(self._header) > MAX_HEADER_BYTES:
+                    raise PlyFormatError("PLY header too long or missing end_header")
+                return
+            self._parse_header(bytes(self._header[:line_end + 1]))
+            if self.total_bytes is not None and line_end + 1 + self._skip + self._expected > self.total_bytes:
+                raise PlyFormatError(
+                    f"PLY header announces {self.vertex_count} vertices, more than the "
+                    f"{self.total_bytes} byte body can hold"
+                )
+            chunk = bytes(self._header[line_end + 1:])
+            self._header = bytearray()
+
+        view = memoryview(chunk)
+        if self._skip:
+            skipped = min(self._skip, len(view))
+            self._skip -= skipped
+            view = view[skipped:]
+
+        # Anything after the vertex element (faces, ...) is ignored
+        take = min(len(view), self._expected - len(self._buffer))
+        if take:
+            self._buffer += view[:take]
+
+    def close(self, dtype=np.float64) -> np.ndarray:
+        """
+        Returns:
+            (N, 3) array of vertex positions (float64 by default)
+        """
+        if not self.header_parsed:
+            raise PlyFormatError("Incomplete PLY header")
+        if self._skip or len(self._buffer) < self._expected:
+            raise PlyFormatError(
+                f"Truncated PLY body: expected {self._expected} vertex bytes, got {len(self._buffer)}"
+            )
+
+        vertices = np.frombuffer(self._buffer, dtype=self.vertex_dtype, count=self.vertex_count)
+        return np.column_stack((vertices["x"], vertices["y"], vertices["z"])).astype(dtype, copy=False)
+
+    def _parse_header(self, header: bytes):
+        lines = [line.strip() for line in header.decode("ascii", errors="replace").splitlines()]
+        if not lines or lines[0] != "ply":
+            raise PlyFormatError("Missing 'ply' magic line")
+
+        elements = []  # [name, count, [(property name, dtype)]]
+        for line in lines[1:]:
+            words = line.split()
+            if not words or words[0] in ("comment", "obj_info", "end_header"):
+                continue
+
+            if words[0] == "format":
+                if len(words) < 2 or words[1] != "binary_little_endian":
+                    raise UnsupportedPlyError(f"Unsupported PLY format: {line}")
+            elif words[0] == "element":
+                if len(words) != 3 or not words[2].isdigit():
+                    raise PlyFormatError(f"Bad element line: {line}")
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == "property":
+                if not elements:
+                    raise PlyFormatError("Property declared before any element")
+                if len(words) >= 2 and words[1] == "list":
+                    # Variable-length records: only fine after the vertex element
+                    elements[-1][2].append((words[-1], None))
+                    continue
+                if len(words) != 3 or words[1] not in PLY_TYPES:
+                    raise PlyFormatError(f"Bad property line: {line}")
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+            else:
+                raise PlyFormatError(f"Unexpected PLY header line: {line}")
+
+        skip = 0
+        for name, count, properties in elements:
+            if any(dtype is None for _, dtype in properties):
+                raise UnsupportedPlyError(f"List properties in element '{name}'")
+            dtype = np.dtype(properties)
+            if name == "vertex":
+                missing = {"x", "y", "z"} - set(dtype.names or ())
+                if missing:
+                    raise PlyFormatError(f"Vertex element lacks {sorted(missing)}")
+                if count > self.max_vertices:
+                    raise PlyFormatError(f"PLY header announces {count} vertices (limit {self.max_vertices})")
+                self.vertex_count = count
+                self.vertex_dtype = dtype
+                self._skip = skip
+                self._expected = count * dtype.itemsize
+                self._buffer = bytearray()
+                return
+            skip += count * dtype.itemsize
+
+        raise PlyFormatError("PLY file has no vertex element")
@@ -0,0 +1,110 @@
+"""
+Per-stage timing, point count and memory instrumentation for dataclean()
+"""
+
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+# Pipeline stages of dataclean() in execution order (reported through
+# progress_callback). Kept here, away from Open3D, so the API can size job
+# progress without importing the pipeline.
+PIPELINE_STAGES = (
+    "load",
+    "pre_voxel",
+    "radius_outlier",
+    "histogram_filter",
+    "floor_ransac",
+    "remove_planes",
+    "dbscan",
+    "voxel_downsample",
+    "pca_alignment",
+    "statistical_outlier",
+    "bounding_box",
+    "export",
+)
+
+# Bounding-box estimators accepted by dataclean(method=...), kept here for
+# the same reason: the API validates requests against them
+VALID_METHODS = ("AABB", "OBB", "HULL", "PCA", "HULL_PCA", "MINBOX")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Process high-water mark RSS in MB (None where unsupported, e.g. Windows)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 2)
+    return round(peak / 1024, 2)
+
+
+class StageProfiler:
+    """
+    Lap-style profiler: lap(stage, n) closes the running stage with n output
+    points and starts the next one with n input points.
+
+    Each record holds:
+        stage, seconds, points_in, points_out,
+        peak_rss_mb    - process RSS high-water mark after the stage
+        peak_traced_mb - peak Python/NumPy allocations during the stage
+                         (Open3D's C++ buffers are not visible to tracemalloc)
+    """
+
+    def __init__(self):
+        self.records: List[Dict] = []
+        self._current: Optional[Dict] = None
+        self._started_tracemalloc = False
+
+    def lap(self, stage: str, n_points: int):
+        self._close(n_points)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._current = {
+            "stage": stage,
+            "points_in": int(n_points),
+            "_start": time.perf_counter(),
+        }
+
+    def finish(self, n_points: int) -> List[Dict]:
+        """Close the last stage and return all records."""
+        self._close(n_points)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return self.records
+
+    def _close(self, n_points: int):
+        if self._current is None:
+            return
+        record = self._current
+        record["seconds"] = round(time.perf_counter() - record.pop("_start"), 4)
+        record["points_out"] = int(n_points)
+        record["peak_rss_mb"] = peak_rss_mb()
+        record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        self.records.append(record)
+        self._current = None
+
+
+def profile_columns(stages) -> List[str]:
+    """CSV column names used for per-stage timings in batch runs."""
+    return [f"t_{stage}" for stage in stages] + ["t_total", "peak_rss_mb"]
+
+
+def profile_row(profile: List[Dict], stages) -> List:
+    """Flatten a profile into values matching profile_columns(stages)."""
+    by_stage = {r["stage"]: r for r in profile}
+    row = [by_stage[s]["seconds"] if s in by_stage else "" for s in stages]
+    row.append(round(sum(r["seconds"] for r in profile), 4))
+    rss = [r["peak_rss_mb"] for r in profile if r["peak_rss_mb"] is not None]
+    row.append(max(rss) if rss else "")
+    return row
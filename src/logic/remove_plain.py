@@ -1,15 +1,183 @@
-def remove_large_planes(pcd, max_planes=3):
-    remaining = pcd
-    for _ in range(max_planes):
-        plane_model, inliers = remaining.segment_plane(
-            distance_threshold=0.005,
-            ransac_n=3,
-            num_iterations=1000
+import math
+
+import numpy as np
+
+# Hypotheses scored per batch / points scored per block (bounds the
+# (hypotheses x points) float32 temporary to a few MB)
+HYPOTHESIS_BATCH = 32
+POINT_BLOCK = 1 << 14
+
+# Least-squares refits of the winning plane on its own inliers
+REFINE_STEPS = 3
+
+
+class PlaneSegmenter:
+    """
+    RANSAC engine that pulls several planes out of one cloud.
+
+    Plane hypotheses are sampled in batches and scored with one matrix
+    product per batch. The number of hypotheses adapts to the inlier ratio
+    of the best plane so far (standard RANSAC bound for the requested
+    success probability, capped at max_iterations), so a dominant floor needs
+    a few hundred hypotheses instead of a fixed 1000.
+
+    Extracted planes are removed by clearing a mask, not by copying the
+    cloud. Hypotheses drawn for one plane stay in the pool for the next one:
+    their inlier counts are only reduced by the points that were removed.
+    """
+
+    def __init__(self, points, distance_threshold=0.005, max_iterations=1000,
+                 probability=0.999, seed=0):
+        self.points = np.asarray(points, dtype=np.float64)
+        # Scoring runs in float32 on a (3, n) layout: one (batch, 3) @ (3, block)
+        # product per block
+        self.points32 = np.ascontiguousarray(self.points.T, dtype=np.float32)
+        self.distance_threshold = distance_threshold
+        self.max_iterations = max_iterations
+        self.probability = probability
+        self.rng = np.random.default_rng(seed)
+        self.remaining = np.ones(len(self.points), dtype=bool)
+
+        self._planes = np.empty((0, 4), dtype=np.float32)
+        self._samples = np.empty((0, 3), dtype=np.intp)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def remaining_indices(self):
+        return np.flatnonzero(self.remaining)
+
+    def next_plane(self):
+        """
+        Find the best plane among the remaining points (they are not removed).
+
+        Returns:
+            (plane_model [a, b, c, d], inlier indices into points), or
+            (None, empty array) when fewer than 3 points remain
+        """
+        indices = self.remaining_indices()
+        if len(indices) < 3:
+            return None, np.empty(0, dtype=np.intp)
+
+        remaining32 = self.points32[:, indices]
+        while len(self._counts) < self.max_iterations:
+            best = self._counts.max() if len(self._counts) else 0
+            needed = self._required_iterations(best / len(indices))
+            if len(self._counts) >= needed:
+                break
+            batch = min(HYPOTHESIS_BATCH, needed - len(self._counts), self.max_iterations - len(self._counts))
+            self._draw(indices, remaining32, batch)
+
+        if not len(self._counts) or self._counts.max() == 0:
+            return None, np.empty(0, dtype=np.intp)
+
+        # Refine the best hypothesis with least-squares fits on its inliers
+        points = self.points[indices]
+        plane = self._planes[self._counts.argmax()].astype(np.float64)
+        inliers = np.flatnonzero(self._distances(points, plane) <= self.distance_threshold)
+        for _ in range(REFINE_STEPS):
+            if len(inliers) < 3:
+                break
+            refined = fit_plane(points[inliers])
+            refined_inliers = np.flatnonzero(self._distances(points, refined) <= self.distance_threshold)
+            if len(refined_inliers) <= len(inliers):
+                break
+            plane, inliers = refined, refined_inliers
+        return plane, indices[inliers]
+
+    def remove(self, inliers):
+        """Drop points from the remaining set and update the hypothesis pool."""
+        self.remaining[inliers] = False
+
+        # Hypotheses sampled from removed points described the removed plane
+        alive = self.remaining[self._samples].all(axis=1)
+        self._planes, self._samples, self._counts = (
+            self._planes[alive], self._samples[alive], self._counts[alive]
         )
+        if len(self._counts):
+            self._counts -= self._score(self.points32[:, inliers])
 
-        if len(inliers) < 5000:
+    def _required_iterations(self, inlier_ratio):
+        sample_success = inlier_ratio ** 3
+        if sample_success >= 1:
+            return 1
+        if sample_success <= 0:
+            return self.max_iterations
+        needed = math.log(1 - self.probability) / math.log(1 - sample_success)
+        return min(self.max_iterations, max(1, math.ceil(needed)))
+
+    def _draw(self, indices, remaining32, batch):
+        samples = indices[self.rng.integers(0, len(indices), size=(batch, 3))]
+        p0, p1, p2 = (self.points[samples[:, i]] for i in range(3))
+        normals = np.cross(p1 - p0, p2 - p0)
+        norms = np.linalg.norm(normals, axis=1)
+        valid = norms > 1e-12
+
+        planes = np.zeros((batch, 4))
+        planes[valid, :3] = normals[valid] / norms[valid, None]
+        planes[valid, 3] = -np.einsum("ij,ij->i", planes[valid, :3], p0[valid])
+        planes = planes.astype(np.float32)
+
+        counts = np.zeros(batch, dtype=np.int64)
+        counts[valid] = self._score(remaining32, planes[valid])
+
+        self._planes = np.concatenate([self._planes, planes])
+        self._samples = np.concatenate([self._samples, samples])
+        self._counts = np.concatenate([self._counts, counts])
+
+    def _score(self, points32, planes=None):
+        # Inlier count of every hypothesis over (3, n) points, block by block
+        planes = self._planes if planes is None else planes
+        counts = np.zeros(len(planes), dtype=np.int64)
+        normals, offsets = planes[:, :3], planes[:, 3:]
+        for start in range(0, points32.shape[1], POINT_BLOCK):
+            distances = normals @ points32[:, start:start + POINT_BLOCK]
+            distances += offsets
+            np.abs(distances, out=distances)
+            counts += np.count_nonzero(distances <= self.distance_threshold, axis=1)
+        return counts
+
+    @staticmethod
+    def _distances(points, plane):
+        return np.abs(points @ plane[:3] + plane[3])
+
+
+def fit_plane(points):
+    """Least-squares plane [a, b, c, d] (unit normal) through points."""
+    centroid = points.mean(axis=0)
+    _, _, Vt = np.linalg.svd(points - centroid, full_matrices=False)
+    normal = Vt[-1]
+    return np.append(normal, -normal @ centroid)
+
+
+def large_plane_mask(segmenter, max_planes=3, min_inliers=5000):
+    """
+    Remove up to max_planes planes with at least min_inliers points each
+    from the segmenter's remaining points.
+
+    Returns:
+        mask over the points that were remaining on entry, False for the
+        points of the removed planes
+    """
+    entry_indices = segmenter.remaining_indices()
+
+    for _ in range(max_planes):
+        plane_model, inliers = segmenter.next_plane()
+
+        if len(inliers) < min_inliers:
             break  # stop if plane is small
 
-        remaining = remaining.select_by_index(inliers, invert=True)
+        segmenter.remove(inliers)
+
+    return segmenter.remaining[entry_indices]
+
+
+def remove_large_planes(pcd, max_planes=3, distance_threshold=0.005, min_inliers=5000, segmenter=None):
+    """
+    Remove up to max_planes planes with at least min_inliers points each.
 
-    return remaining
+    segmenter is an optional PlaneSegmenter (e.g. the one that already
+    looked for the floor) whose hypotheses are reused; pcd must then hold its
+    remaining points, in order.
+    """
+    if segmenter is None:
+        segmenter = PlaneSegmenter(np.asarray(pcd.points), distance_threshold)
+    return pcd.select_by_index(np.flatnonzero(large_plane_mask(segmenter, max_planes, min_inliers)))
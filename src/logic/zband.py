@@ -0,0 +1,144 @@
+"""
+Z-band filter: drops the lowest and highest points of a cloud after
+histogram equalization of their heights
+"""
+
+import numpy as np
+
+# Points are normalized / binned this many at a time
+CHUNK_SIZE = 1 << 16
+
+
+def z_band_mask_reference(z, percentiles=(2, 98), bins=256):
+    """
+    The histogram equalization filter as originally written in dataclean().
+    Several full passes with float64 temporaries; kept as the exact fallback.
+    """
+    z_min, z_max = z.min(), z.max()
+    z_norm = (z - z_min) / (z_max - z_min)
+
+    hist, edges = np.histogram(z_norm, bins=bins, density=True)
+    cdf = hist.cumsum()
+    cdf = cdf / cdf[-1]
+
+    z_eq = np.interp(z_norm, edges[:-1], cdf)
+
+    low, high = np.percentile(z_eq, percentiles)
+    return (z_eq > low) & (z_eq < high)
+
+
+def _percentile_position(n, q):
+    # Same virtual index as np.percentile(method="linear")
+    virtual = (n - 1) * (q / 100)
+    k = min(int(np.floor(virtual)), n - 1)
+    return k, min(k + 1, n - 1), virtual - k
+
+
+def _lerp(a, b, t):
+    # Same rounding as np.percentile's interpolation
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def _bin_indices(z_norm, edges):
+    # np.histogram's bin assignment: edges[i] <= x < edges[i + 1], and the
+    # last bin also holds x == edges[-1]
+    bins = len(edges) - 1
+    indices = (z_norm * bins).astype(np.intp)
+    indices[indices == bins] -= 1
+    indices[z_norm < edges[indices]] -= 1
+    indices[(z_norm >= edges[indices + 1]) & (indices != bins - 1)] += 1
+    return indices
+
+
+def z_band_mask(z, percentiles=(2, 98), bins=256, chunk_size=CHUNK_SIZE):
+    """
+    Boolean mask of the points kept by the histogram equalization Z filter,
+    identical to z_band_mask_reference().
+
+    The equalized height is a monotone function of z, so its percentiles are
+    the equalized values of the matching order statistics of z, which come
+    from one np.partition. One chunked pass stores each point's histogram
+    bin (one byte per point); the equalized heights of a bin lie between the
+    CDF values at its edges, so whole bins are inside or outside the band and
+    only the points of the bins holding a cut value are interpolated.
+
+    The rank of every percentile value is recounted the same way, so the
+    rare case where rounding at a bin edge breaks monotonicity is detected
+    and falls back to the reference computation.
+
+    Args:
+        z: point heights (any 1-D float array, may be a strided view)
+        percentiles: (low, high) percentiles of the equalized heights to cut
+        bins: histogram bins for the equalization
+
+    Returns:
+        mask of len(z), True for points strictly inside the band
+    """
+    z = np.asarray(z)
+    n = len(z)
+    k, k_next, low_gamma = _percentile_position(n, percentiles[0])
+    m, m_next, high_gamma = _percentile_position(n, percentiles[1])
+    ranks = np.array([k, k_next, m, m_next])
+
+    # Single O(n) selection gives min, max and the four order statistics
+    part = np.partition(z, sorted({0, k, k_next, m, m_next, n - 1}))
+    z_min, z_max = part[0], part[n - 1]
+    scale = z_max - z_min
+    if not np.isfinite(scale) or scale == 0:
+        return z_band_mask_reference(z, percentiles, bins)
+
+    def normalize(values):
+        return (values - z_min) / scale
+
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    bin_of = np.empty(n, dtype=np.uint8 if bins <= 256 else np.intp)
+    for start in range(0, n, chunk_size):
+        bin_of[start:start + chunk_size] = _bin_indices(normalize(z[start:start + chunk_size]), edges)
+    counts = np.bincount(bin_of, minlength=bins)
+
+    # Equalization curve, as np.histogram(density=True) computes it
+    hist = counts / np.diff(edges) / counts.sum()
+    cdf = hist.cumsum()
+    cdf = cdf / cdf[-1]
+    xp = edges[:-1]
+
+    stats = np.interp(normalize(part[ranks]), xp, cdf)
+    low = _lerp(stats[0], stats[1], low_gamma)
+    high = _lerp(stats[2], stats[3], high_gamma)
+
+    # Equalized heights of bin j lie in [cdf[j], cdf[j + 1]] up to rounding
+    # (the last bin maps to cdf[-1]); widen by a margin far above float error
+    margin = 1e-12
+    bin_low = cdf - margin
+    bin_high = np.append(cdf[1:], cdf[-1]) + margin
+
+    cuts = np.concatenate(([low, high], stats))
+    straddles = (bin_low[:, None] <= cuts) & (cuts <= bin_high[:, None])
+    exact_bins = np.flatnonzero(straddles.any(axis=1))
+
+    inside = (bin_low > low) & (bin_high < high)
+    is_exact = np.zeros(bins, dtype=bool)
+    is_exact[exact_bins] = True
+
+    # Table lookups per chunk (fancy indexing would widen bin_of to intp)
+    mask = np.empty(n, dtype=bool)
+    exact_points = []
+    for start in range(0, n, chunk_size):
+        chunk_bins = bin_of[start:start + chunk_size]
+        mask[start:start + chunk_size] = inside[chunk_bins]
+        exact_points.append(np.flatnonzero(is_exact[chunk_bins]) + start)
+    exact_points = np.concatenate(exact_points)
+
+    z_eq = np.interp(normalize(z[exact_points]), xp, cdf)
+    mask[exact_points] = (z_eq > low) & (z_eq < high)
+
+    # stats[i] is the ranks[i]-th smallest equalized height iff fewer than
+    # ranks[i] + 1 values are below it and more than ranks[i] are at or below it
+    for rank, value in zip(ranks, stats):
+        below = counts[~is_exact & (bin_high < value)].sum() + np.count_nonzero(z_eq < value)
+        at_or_below = below + np.count_nonzero(z_eq == value)
+        if below > rank or at_or_below <= rank:
+            return z_band_mask_reference(z, percentiles, bins)
+
+    return mask
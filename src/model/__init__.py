@@ -50,49 +50,95 @@ def train_val_test_split(
 
 
 #linear regression (GD) learned gd in 171
+SOLVERS = ("gd", "normal", "sgd")
+
+
 @dataclass
 class LinearRegressionGD:
+    """
+    Least-squares linear regression, one target (y: (N,)) or several fitted
+    together (Y: (N, K), e.g. the [w, l, h] of load_dataset_csv).
+
+    solver:
+        "gd"     full-batch gradient descent (max_iter steps)
+        "normal" closed form (least-squares solve), no lr / max_iter
+        "sgd"    mini-batch gradient descent, max_iter epochs of batch_size
+                 rows, for datasets too large for the other two
+    """
     lr: float = 1e-2
     max_iter: int = 5000
     tol: float = 1e-8
-    w_: np.ndarray | None = None  # (D,)
-    b_: float = 0.0
+    solver: str = "gd"
+    batch_size: int = 256
+    seed: int = 42
+    w_: np.ndarray | None = None  # (D,) or (D, K)
+    b_: float | np.ndarray = 0.0  # scalar or (K,)
 
     def fit(self, X: np.ndarray, y: np.ndarray) -> "LinearRegressionGD":
         """
         X: (N, D)
-        y: (N,)
+        y: (N,) or (N, K)
         """
-        N, D = X.shape
-        self.w_ = np.zeros(D, dtype=float)
-        self.b_ = 0.0
+        if self.solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{self.solver}'. Choose one of {SOLVERS}")
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        Y = y.reshape(len(y), -1)
+
+        # Bias as an extra all-ones column: theta = [w; b], shape (D + 1, K)
+        Xb = np.hstack([X, np.ones((len(X), 1))])
+        if self.solver == "normal":
+            theta = np.linalg.lstsq(Xb, Y, rcond=None)[0]
+        elif self.solver == "sgd":
+            theta = self._fit_sgd(Xb, Y)
+        else:
+            theta = self._fit_gd(Xb, Y)
+
+        self.w_ = theta[:-1] if y.ndim > 1 else theta[:-1, 0]
+        self.b_ = theta[-1] if y.ndim > 1 else float(theta[-1, 0])
+        return self
+
+    def _fit_gd(self, Xb: np.ndarray, Y: np.ndarray) -> np.ndarray:
+        # Same updates as X.T @ (X @ theta - Y) / N, but with X.T @ X and
+        # X.T @ Y computed once, each step costs O(D^2 K) instead of O(N D K)
+        N = len(Xb)
+        gram = Xb.T @ Xb
+        xty = Xb.T @ Y
+        yty = float((Y * Y).sum())
+        theta = np.zeros((Xb.shape[1], Y.shape[1]))
 
         prev_loss = None
         for it in range(self.max_iter):
-            yhat = X @ self.w_ + self.b_
-            err = yhat - y
-
-            loss = (err @ err) / (2.0 * N)  # MSE/2
+            g_theta = gram @ theta
+            loss = (float((theta * g_theta).sum()) - 2.0 * float((theta * xty).sum()) + yty) / (2.0 * N)  # MSE/2
             if prev_loss is not None and abs(prev_loss - loss) < self.tol:
                 break
             prev_loss = loss
 
-            # Gradients
-            grad_w = (X.T @ err) / N
-            grad_b = err.mean()
+            theta -= self.lr * (g_theta - xty) / N
+        return theta
 
-            # Update
-            self.w_ -= self.lr * grad_w
-            self.b_ -= self.lr * grad_b
+    def _fit_sgd(self, Xb: np.ndarray, Y: np.ndarray) -> np.ndarray:
+        N = len(Xb)
+        rng = np.random.default_rng(self.seed)
+        theta = np.zeros((Xb.shape[1], Y.shape[1]))
 
-        return self
+        prev_loss = None
+        for epoch in range(self.max_iter):
+            order = rng.permutation(N)
+            loss = 0.0
+            for start in range(0, N, self.batch_size):
+                batch = order[start : start + self.batch_size]
+                err = Xb[batch] @ theta - Y[batch]
+                loss += float((err * err).sum())
+                theta -= self.lr * (Xb[batch].T @ err) / len(batch)
+
+            loss /= 2.0 * N  # mean MSE/2 seen during the epoch
+            if prev_loss is not None and abs(prev_loss - loss) < self.tol:
+                break
+            prev_loss = loss
+        return theta
 
     def predict(self, X: np.ndarray) -> np.ndarray:
         assert self.w_ is not None
         return X @ self.w_ + self.b_
-
-
-
-
-
-
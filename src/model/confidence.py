@@ -0,0 +1,51 @@
+"""
+Batch scoring with the confidence regressor saved by main.run_ml_benchmark()
+"""
+
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# Feature columns of the confidence regressor, with the value used when a
+# result lacks one
+CONFIDENCE_FEATURES = {
+    "point_count": 0,
+    "ransac_inlier_ratio": 0,
+    "std_x": 0,
+    "std_y": 0,
+    "std_z": 0,
+    "aspect_ratio": 1,
+}
+
+
+def confidence_features(results: Iterable[Dict]) -> np.ndarray:
+    """(n, 6) feature matrix from dataclean() results or result CSV rows."""
+    return np.array(
+        [[result.get(name, default) for name, default in CONFIDENCE_FEATURES.items()] for result in results],
+        dtype=np.float64
+    ).reshape(-1, len(CONFIDENCE_FEATURES))
+
+
+def dataframe_features(df) -> np.ndarray:
+    """Feature matrix from the columns of a results DataFrame (missing columns / cells get the defaults)."""
+    return (
+        df.reindex(columns=list(CONFIDENCE_FEATURES))
+        .fillna(CONFIDENCE_FEATURES)
+        .to_numpy(dtype=np.float64)
+    )
+
+
+def score_features(model, scaler, features: np.ndarray) -> np.ndarray:
+    """
+    Confidence (0-100, two decimals) of every feature row, with one
+    scaler.transform and one model.predict call for the whole matrix.
+    """
+    if len(features) == 0:
+        return np.empty(0)
+    prediction = model.predict(scaler.transform(features))
+    return np.round(np.clip(prediction, 0.0, 100.0), 2)
+
+
+def score_results(model, scaler, results: List[Dict]) -> List[float]:
+    """score_features() for a list of result dicts, as plain floats."""
+    return score_features(model, scaler, confidence_features(results)).tolist()
@@ -1,11 +1,23 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+import sklearn
+from sklearn.base import clone, is_classifier
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.model_selection import KFold, StratifiedKFold, train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.metrics import silhouette_score
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score, classification_report, mean_absolute_error
+
+from src.logic.cache import DiskCache
 
 def load_data_from_csv(csv_path, target_column):
     df = pd.read_csv(csv_path)
@@ -94,4 +106,178 @@ def train_mlp(X, y, verbose=True):
         print("Classification Report:")
         print(classification_report(y_test, y_pred, zero_division=0))
     
-    return model, scaler, accuracy
\ No newline at end of file
+    return model, scaler, accuracy
+
+
+# Candidates of run_ml_benchmark(): the classifiers predicting is_accurate,
+# and the regressor predicting the confidence % served by the API. They are
+# cloned before every fit.
+CLASSIFIERS = {
+    "Logistic Regression": LogisticRegression(),
+    "Decision Tree": DecisionTreeClassifier(random_state=42),
+    "Neural Network (MLP)": MLPClassifier(hidden_layer_sizes=(64, 32), max_iter=1000, random_state=42),
+}
+CONFIDENCE_REGRESSORS = {
+    "GradientBoosting Regressor (confidence)": GradientBoostingRegressor(
+        n_estimators=100, max_depth=3, learning_rate=0.1, random_state=42
+    ),
+}
+
+# name -> (metric(y_true, y_pred), True if higher is better)
+SCORERS = {
+    "accuracy": (accuracy_score, True),
+    "mae": (mean_absolute_error, False),
+}
+
+CV_FOLDS = 5
+
+
+class ModelCache(DiskCache):
+    """
+    Fitted models and fold scores on disk, keyed by the hash of the feature
+    matrix, the labels, the estimator's parameters and the rows it was
+    trained on. Re-running the benchmark on an unchanged results CSV then
+    trains nothing. Bounded to max_bytes like PointCloudCache (least
+    recently used entries go first).
+    """
+
+    SUFFIXES = (".joblib",)
+
+    def __init__(self, cache_dir="output/models/cache", max_bytes=256 * 1024 ** 2):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(data_digest: str, estimator, train_idx, test_idx) -> str:
+        payload = json.dumps({
+            "data": data_digest,
+            "estimator": type(estimator).__name__,
+            "params": estimator.get_params(),
+            "sklearn": sklearn.__version__,
+            "train": hashlib.sha256(np.asarray(train_idx, dtype=np.int64).tobytes()).hexdigest(),
+            "test": None if test_idx is None else
+                    hashlib.sha256(np.asarray(test_idx, dtype=np.int64).tobytes()).hexdigest(),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        path = self._path(key, ".joblib")
+        if not path.exists():
+            return None
+        try:
+            value = joblib.load(path)
+        except Exception:
+            return None
+        self._touch(path)
+        return value
+
+    def put(self, key: str, value):
+        self._write(self._path(key, ".joblib"), lambda f: joblib.dump(value, f))
+
+
+def data_digest(X, y) -> str:
+    """SHA-256 of the feature matrix and labels (dtype, shape and values)."""
+    digest = hashlib.sha256()
+    for array in (np.ascontiguousarray(X, dtype=np.float64), np.ascontiguousarray(y)):
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def cv_splits(y, estimator, folds=CV_FOLDS, seed=42):
+    """
+    (train, test) index pairs of shuffled k-fold CV: stratified for
+    classifiers when every class has enough rows, with no more folds than
+    rows (or than members of the smallest class).
+    """
+    y = np.asarray(y)
+    if is_classifier(estimator):
+        smallest = np.unique(y, return_counts=True)[1].min()
+        if smallest >= 2:
+            splitter = StratifiedKFold(n_splits=min(folds, smallest), shuffle=True, random_state=seed)
+            return list(splitter.split(np.zeros(len(y)), y))
+    splitter = KFold(n_splits=max(2, min(folds, len(y))), shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y))))
+
+
+def fit_scaled(estimator, X, y, train_idx, test_idx=None, scoring="accuracy", cache_dir=None, digest=None):
+    """
+    Fit a StandardScaler and a clone of estimator on the train rows.
+
+    Returns:
+        the test-row score when test_idx is given, else (model, scaler)
+    """
+    cache = ModelCache(cache_dir) if cache_dir is not None else None
+    if cache is not None:
+        key = ModelCache.key(digest, estimator, train_idx, test_idx)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    scaler = StandardScaler()
+    model = clone(estimator)
+    model.fit(scaler.fit_transform(X[train_idx]), y[train_idx])
+    if test_idx is None:
+        result = (model, scaler)
+    else:
+        metric, _ = SCORERS[scoring]
+        result = float(metric(y[test_idx], model.predict(scaler.transform(X[test_idx]))))
+
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+@dataclass
+class SelectionResult:
+    name: str                 # winning candidate
+    model: Any                # fitted on every row
+    scaler: StandardScaler    # fitted on every row
+    scoring: str
+    scores: Dict[str, Tuple[float, float]] = field(default_factory=dict)  # name -> (mean, std) over the folds
+
+    def leaderboard(self):
+        """[(name, mean, std)], best first."""
+        higher_is_better = SCORERS[self.scoring][1]
+        return sorted(((name, mean, std) for name, (mean, std) in self.scores.items()),
+                      key=lambda item: -item[1] if higher_is_better else item[1])
+
+
+def select_model(X, y, candidates: Dict[str, Any], scoring="accuracy", folds=CV_FOLDS, n_jobs=-1,
+                 cache_dir: Optional[str] = "output/models/cache") -> SelectionResult:
+    """
+    k-fold cross-validation of every candidate, run as one batch of
+    parallel jobs (n_jobs as in joblib, -1 = all cores). Only the winner is
+    then fitted on all rows.
+
+    Args:
+        candidates: name -> unfitted estimator
+        scoring: key of SCORERS
+        cache_dir: ModelCache directory, None to disable
+
+    Returns:
+        SelectionResult of the candidate with the best mean fold score
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    digest = data_digest(X, y) if cache_dir is not None else None
+
+    tasks = [
+        (name, train_idx, test_idx)
+        for name, estimator in candidates.items()
+        for train_idx, test_idx in cv_splits(y, estimator, folds)
+    ]
+    results = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(fit_scaled)(candidates[name], X, y, train_idx, test_idx, scoring, cache_dir, digest)
+        for name, train_idx, test_idx in tasks
+    )
+
+    fold_scores = {name: [] for name in candidates}
+    for (name, _, _), score in zip(tasks, results):
+        fold_scores[name].append(score)
+
+    scores = {name: (float(np.mean(values)), float(np.std(values))) for name, values in fold_scores.items()}
+    # Ties go to the candidate listed first
+    higher_is_better = SCORERS[scoring][1]
+    best = (max if higher_is_better else min)(scores, key=lambda name: scores[name][0])
+    model, scaler = fit_scaled(candidates[best], X, y, np.arange(len(y)), cache_dir=cache_dir, digest=digest)
+    return SelectionResult(best, model, scaler, scoring, scores)
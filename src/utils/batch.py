@@ -0,0 +1,101 @@
+"""
+Parallel batch runner: fans dataclean() out over a process pool
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from src.logic.dataclean import dataclean
+
+
+@dataclass
+class BatchResult:
+    file: Path
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchThroughput:
+    """Tracks files/s and points/s over a batch run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.files = 0
+        self.failed = 0
+        self.points = 0
+
+    def add(self, item: BatchResult):
+        self.files += 1
+        if item.ok:
+            self.points += item.result.get("input_point_count", 0)
+        else:
+            self.failed += 1
+
+    def summary(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"{self.files} files in {elapsed:.1f}s "
+                f"({self.files / elapsed:.2f} files/s, {self.points / elapsed:,.0f} points/s), "
+                f"{self.failed} failed")
+
+
+def _process_file(path: str, dataclean_kwargs: Dict) -> BatchResult:
+    # Runs in a worker: never let one bad file take the batch down
+    start = time.perf_counter()
+    try:
+        result = dataclean(path, **dataclean_kwargs)
+        return BatchResult(Path(path), result=result, seconds=time.perf_counter() - start)
+    except Exception as e:
+        traceback.print_exc()
+        return BatchResult(Path(path), error=str(e), seconds=time.perf_counter() - start)
+
+
+def run_batch(files: List[Path], workers: Optional[int] = None, **dataclean_kwargs) -> Iterator[BatchResult]:
+    """
+    Run dataclean() on every file and yield a BatchResult as each one finishes
+    (completion order, not input order).
+
+    Args:
+        files: PLY files to process
+        workers: process count (default: CPU count); 1 runs in this process
+        **dataclean_kwargs: forwarded to dataclean(), visualization is always off
+    """
+    dataclean_kwargs = {**dataclean_kwargs, "visualize_flag": False, "verbose": False}
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for file in files:
+            yield _process_file(str(file), dataclean_kwargs)
+        return
+
+    crashed = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(files) or 1)) as executor:
+        futures = {executor.submit(_process_file, str(f), dataclean_kwargs): f for f in files}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                # A worker died hard (e.g. a native crash) and took the pool with it
+                crashed.append(futures[future])
+
+    # Retry those files one per fresh process so only the culprit fails
+    for file in crashed:
+        yield _run_isolated(file, dataclean_kwargs)
+
+
+def _run_isolated(file: Path, dataclean_kwargs: Dict) -> BatchResult:
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(_process_file, str(file), dataclean_kwargs).result()
+        except BrokenProcessPool as e:
+            return BatchResult(file, error=f"worker crashed: {e}")
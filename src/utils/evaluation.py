@@ -0,0 +1,91 @@
+"""
+Vectorized comparison of measured box dimensions against hand measurements,
+shared by main.compare_between_csv() and compare_statistics.py
+"""
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ("Height", "Width", "Length")
+
+# A measurement is accurate when every dimension is within this ratio of the reference
+ACCURACY_THRESHOLD = 0.85
+
+
+def dimension_matrix(df, suffix="", scale=1.0):
+    """(rows, 3) float array of the Height / Width / Length columns."""
+    return df[[f"{dim}{suffix}" for dim in DIMENSIONS]].to_numpy(dtype=np.float64) * scale
+
+
+def dimension_ratios(created, reference):
+    """
+    min / max ratio of each created and reference dimension.
+
+    Returns:
+        array shaped like the inputs, NaN where the reference is 0
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.minimum(created, reference) / np.maximum(created, reference)
+    ratios[reference == 0] = np.nan
+    return ratios
+
+
+def confidence_table(created_df, reference_df, threshold=ACCURACY_THRESHOLD):
+    """
+    Merge created measurements (meters) with references (centimeters) on
+    'number' and score every row.
+
+    Adds 'confidence' (mean ratio in percent, a dimension with a 0 reference
+    counts as 0) and 'is_accurate' (1 when every ratio reaches threshold).
+
+    Returns:
+        (merged DataFrame with _created / _ref columns, (rows, 3) ratios)
+    """
+    created_df = created_df.copy()
+    reference_df = reference_df.copy()
+    created_df.columns = created_df.columns.str.strip()
+    reference_df.columns = reference_df.columns.str.strip()
+
+    # Extra objects of multi-object runs ("<n>#<k>") have no reference
+    created_df["number"] = pd.to_numeric(created_df["number"], errors="coerce")
+    created_df = created_df.dropna(subset=["number"])
+    created_df["number"] = created_df["number"].astype(reference_df["number"].dtype)
+
+    merged = created_df.merge(reference_df, on="number", suffixes=("_created", "_ref"))
+
+    reference = dimension_matrix(merged, "_ref")
+    ratios = dimension_ratios(dimension_matrix(merged, "_created", 100), reference)
+    missing = reference == 0
+
+    merged["confidence"] = np.round(np.where(missing, 0, ratios).mean(axis=1) * 100, 2)
+    # NaN ratios (missing created values) do not fail the check
+    merged["is_accurate"] = (~missing & ~(ratios < threshold)).all(axis=1).astype(int)
+    return merged, ratios
+
+
+def dimension_confidence(ratios):
+    """Mean ratio of each dimension over the rows with a reference, {dim: ratio}."""
+    return {
+        dim: float(np.mean(column[~np.isnan(column)]))
+        for dim, column in zip(DIMENSIONS, ratios.T)
+    }
+
+
+def sorted_dimension_errors(pred, true):
+    """
+    Errors after sorting each row's dimensions, so the smallest predicted
+    dimension is matched with the smallest reference and so on.
+
+    Returns:
+        (flattened sorted predictions, flattened sorted references)
+    """
+    return np.sort(pred, axis=1).ravel(), np.sort(true, axis=1).ravel()
+
+
+def compute_metrics(pred, true):
+    error = pred - true
+    mae = np.mean(np.abs(error))
+    rmse = np.sqrt(np.mean(error ** 2))
+    bias = np.mean(error)
+    std = np.std(error)
+    return mae, rmse, bias, std
@@ -0,0 +1,292 @@
+import argparse
+import ast
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.logic.cache import PointCloudCache
+from src.logic.dataclean import VALID_METHODS, PipelineConfig, dataclean
+from src.utils.evaluation import DIMENSIONS, compute_metrics, sorted_dimension_errors
+
+REFERENCE_CSV = Path("Measurements_clean - Sheet1.csv")
+
+# Profile stages of each cached pipeline segment; a segment's time is taken
+# from the run that actually computed it, so settings sharing the floor
+# removal (or the target cluster) share its cost
+SEGMENT_STAGES = {
+    "floor": ("load", "pre_voxel", "radius_outlier", "histogram_filter", "floor_ransac"),
+    "cluster": ("remove_planes", "dbscan"),
+    "fine_tune": ("voxel_downsample", "pca_alignment", "statistical_outlier"),
+}
+
+# Measured on every run (not cached by the sweep)
+PER_RUN_STAGES = ("bounding_box", "export")
+
+
+def parse_param(text):
+    """
+    "dbscan_eps=0.015,0.02,0.03" -> ("dbscan_eps", [0.015, 0.02, 0.03]).
+    Values are Python literals; tuples are written in parentheses:
+    "z_percentiles=(0.5,99.5),(1,99)".
+    """
+    name, sep, values = text.partition("=")
+    if not sep or not values:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2,... but got '{text}'")
+    try:
+        parsed = ast.literal_eval(f"[{values}]")
+    except (ValueError, SyntaxError):
+        raise argparse.ArgumentTypeError(f"could not parse the values of '{text}'")
+    return name.strip(), [list(v) if isinstance(v, tuple) else v for v in parsed]
+
+
+def build_grid(params, n_random=None, seed=0):
+    """
+    Every combination of the swept values as flat override dicts (or
+    n_random of them drawn without replacement).
+    """
+    names = [name for name, _ in params]
+    grid = [dict(zip(names, values)) for values in itertools.product(*(v for _, v in params))]
+    if n_random is not None and n_random < len(grid):
+        grid = random.Random(seed).sample(grid, n_random)
+    return grid
+
+
+def segment_keys(overrides, target_points, cluster_engine):
+    """Identity of the floor / cluster / fine-tune segments a setting runs."""
+    config = PipelineConfig.from_overrides(overrides)
+    floor = json.dumps({**config.floor, "target_points": target_points}, sort_keys=True)
+    cluster = json.dumps({**config.cluster, "cluster_engine": cluster_engine}, sort_keys=True)
+    return {
+        "floor": floor,
+        "cluster": floor + cluster,
+        "fine_tune": floor + cluster + json.dumps(config.fine_tune, sort_keys=True),
+    }
+
+
+def sweep_file(path: str, overrides, method: str, cache_dir: str, dataclean_kwargs):
+    """
+    One pipeline run with profiling and the shared cache.
+
+    Returns:
+        dims (or the error) and per-stage seconds of the run
+    """
+    try:
+        result = dataclean(
+            path,
+            visualize_flag=False,
+            method=method,
+            profile=True,
+            cache=PointCloudCache(cache_dir),
+            output_policy="none",
+            config=overrides,
+            **dataclean_kwargs
+        )
+    except Exception as e:
+        return {"error": str(e)}
+    stages = {}
+    for record in result["profile"]:
+        stages[record["stage"]] = stages.get(record["stage"], 0.0) + record["seconds"]
+    return {
+        "dims": [result["height"] * 100, result["width"] * 100, result["length"] * 100],
+        "stages": stages,
+    }
+
+
+def schedule(jobs, keys):
+    """
+    Split (file, setting) jobs into three phases: the first setting of every
+    distinct floor removal, then of every distinct target cluster, then the
+    rest. Each phase runs in parallel on the intermediates cached by the
+    previous one instead of recomputing them in every worker.
+    """
+    phases = [[], [], []]
+    seen_floor, seen_cluster = set(), set()
+    for file, i in jobs:
+        floor, cluster = (file, keys[i]["floor"]), (file, keys[i]["cluster"])
+        if floor not in seen_floor:
+            phases[0].append((file, i))
+        elif cluster not in seen_cluster:
+            phases[1].append((file, i))
+        else:
+            phases[2].append((file, i))
+        seen_floor.add(floor)
+        seen_cluster.add(cluster)
+    return phases
+
+
+def segment_seconds(runs, keys):
+    """
+    {(file, segment, segment key): seconds} from the runs that computed each
+    cached segment (the ones whose profile has the segment's last stage).
+    """
+    seconds = {}
+    for (file, i), run in runs.items():
+        for segment, stages in SEGMENT_STAGES.items():
+            if stages[-1] in run.get("stages", {}):
+                seconds[(file, segment, keys[i][segment])] = sum(run["stages"].get(s, 0.0) for s in stages)
+    return seconds
+
+
+def estimated_seconds(runs, keys, segments, file, i):
+    """
+    Cold runtime of setting i on a file: each cached segment timed in the
+    run that computed it, plus this run's own bounding box and export.
+    """
+    seconds = sum(segments.get((file, segment, keys[i][segment]), 0.0) for segment in SEGMENT_STAGES)
+    return seconds + sum(runs[(file, i)]["stages"].get(s, 0.0) for s in PER_RUN_STAGES)
+
+
+def pareto_front(df):
+    """True for settings no other complete setting beats on both MAE and time."""
+    complete = df[df["failures"] == 0]
+    front = []
+    for _, row in df.iterrows():
+        if row["failures"] or np.isnan(row["mae_cm"]):
+            front.append(False)
+            continue
+        dominated = (
+            (complete["mae_cm"] <= row["mae_cm"]) & (complete["seconds"] <= row["seconds"])
+            & ((complete["mae_cm"] < row["mae_cm"]) | (complete["seconds"] < row["seconds"]))
+        )
+        front.append(not dominated.any())
+    return front
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grid / random search over the dataclean thresholds, ranked by MAE and runtime"
+    )
+    parser.add_argument("--param", action="append", type=parse_param, default=[],
+                        help="swept parameter as name=v1,v2,... (repeatable), e.g. dbscan_eps=0.015,0.02")
+    parser.add_argument("--random", type=int, default=None, help="evaluate only N random settings of the grid")
+    parser.add_argument("--seed", type=int, default=0, help="seed of --random")
+    parser.add_argument("--data-dir", default="src/data/pictures")
+    parser.add_argument("--files", default=None, help="comma separated file names (default: all)")
+    parser.add_argument("--method", default="AABB", help=f"bounding box method ({', '.join(VALID_METHODS)})")
+    parser.add_argument("--target-points", type=int, default=None, help="point budget for voxel pre-downsampling")
+    parser.add_argument("--cluster-engine", default=None, help="target clustering (default: dbscan)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parallel worker processes")
+    parser.add_argument("--cache-dir", default=None,
+                        help="shared intermediate cache (default: a temporary directory, removed after the sweep)")
+    parser.add_argument("--keep-cache", action="store_true", help="keep the temporary cache after the sweep")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="remove --cache-dir after the sweep (a given --cache-dir is kept otherwise)")
+    parser.add_argument("--output", default="output/sweep/results.csv", help="ranking CSV")
+    parser.add_argument("--top", type=int, default=10, help="settings printed per ranking")
+    args = parser.parse_args()
+
+    method = args.method.upper()
+    if method not in VALID_METHODS:
+        parser.error(f"unknown method {method}; choose from {', '.join(VALID_METHODS)}")
+    if not args.param:
+        parser.error("nothing to sweep; pass at least one --param name=v1,v2,...")
+    try:
+        for name, values in args.param:
+            for value in values:
+                PipelineConfig.from_overrides({name: value})
+    except ValueError as e:
+        parser.error(str(e))
+    if not REFERENCE_CSV.exists():
+        parser.error(f"reference measurements not found: {REFERENCE_CSV}")
+
+    reference = pd.read_csv(REFERENCE_CSV)
+    reference.columns = reference.columns.str.strip()
+    reference = reference.drop_duplicates(subset="number").set_index("number")
+
+    ply_files = sorted(Path(args.data_dir).glob("*.ply"), key=lambda p: (len(p.stem), p.stem))
+    if args.files:
+        selected = {s.strip() for s in args.files.split(",")}
+        ply_files = [f for f in ply_files if f.name in selected]
+    # Only scans with a reference measurement can be scored
+    ply_files = [f for f in ply_files if f.stem.isdigit() and int(f.stem) in reference.index]
+    if not ply_files:
+        print("No .ply files with reference measurements found.")
+        return
+
+    grid = build_grid(args.param, args.random, args.seed)
+    keys = [segment_keys(overrides, args.target_points, args.cluster_engine) for overrides in grid]
+    dataclean_kwargs = {"target_points": args.target_points, "cluster_engine": args.cluster_engine}
+    jobs = [(str(path), i) for i in range(len(grid)) for path in ply_files]
+    phases = schedule(jobs, keys)
+
+    print(f"Sweeping {len(grid)} settings x {len(ply_files)} files ({len(jobs)} runs, "
+          f"{len({k['floor'] for k in keys})} floor / {len({k['cluster'] for k in keys})} cluster variants) "
+          f"with {args.workers} worker(s)...")
+
+    # Only a cache directory created here is removed by default: --cache-dir
+    # may be a cache shared with other runs
+    temporary_cache = args.cache_dir is None
+    cache_dir = tempfile.mkdtemp(prefix="sweep_cache_") if temporary_cache else args.cache_dir
+
+    start = time.perf_counter()
+    runs = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for n, phase in enumerate(phases, 1):
+            futures = {
+                job: executor.submit(sweep_file, job[0], grid[job[1]], method, cache_dir, dataclean_kwargs)
+                for job in phase
+            }
+            for job, future in futures.items():
+                runs[job] = future.result()
+            print(f"  phase {n}/3: {len(phase)} runs, {time.perf_counter() - start:.1f}s")
+    if args.clear_cache or (temporary_cache and not args.keep_cache):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    elif temporary_cache:
+        print(f"Kept the sweep cache in {cache_dir}")
+
+    segments = segment_seconds(runs, keys)
+    rows = []
+    for i, overrides in enumerate(grid):
+        pred, true, seconds, failures = [], [], 0.0, 0
+        for path in ply_files:
+            run = runs[(str(path), i)]
+            if "error" in run:
+                failures += 1
+                continue
+            pred.append(run["dims"])
+            true.append(reference.loc[int(path.stem), list(DIMENSIONS)].to_numpy(dtype=float))
+            seconds += estimated_seconds(runs, keys, segments, str(path), i)
+        mae = rmse = bias = float("nan")
+        if pred:
+            mae, rmse, bias, _ = compute_metrics(*sorted_dimension_errors(np.array(pred), np.array(true)))
+        rows.append({
+            **{name: str(value) if isinstance(value, list) else value for name, value in overrides.items()},
+            "mae_cm": round(float(mae), 4),
+            "rmse_cm": round(float(rmse), 4),
+            "bias_cm": round(float(bias), 4),
+            "seconds": round(seconds, 4),
+            "files": len(pred),
+            "failures": failures,
+        })
+
+    df = pd.DataFrame(rows)
+    df["pareto"] = pareto_front(df)
+    df = df.sort_values(["failures", "mae_cm", "seconds"]).reset_index(drop=True)
+    df.insert(0, "rank_mae", range(1, len(df) + 1))
+    df["rank_seconds"] = df["seconds"].rank(method="min").astype(int)
+
+    names = [name for name, _ in args.param]
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(f"\nBest {method} MAE (cm):")
+        print(df.head(args.top)[names + ["mae_cm", "seconds", "failures", "pareto"]].to_string(index=False))
+        print("\nFastest (estimated cold seconds over all files):")
+        print(df.sort_values(["seconds", "mae_cm"]).head(args.top)[names + ["mae_cm", "seconds", "failures", "pareto"]]
+              .to_string(index=False))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(output, index=False)
+    print(f"\nSaved ranking to {output}")
+
+
+if __name__ == "__main__":
+    main()
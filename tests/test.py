@@ -0,0 +1,922 @@
+"""
+Regression tests, run from the project root with:
+    python -m pytest tests/test.py
+"""
+
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import joblib
+import numpy as np
+import open3d as o3d
+import pandas as pd
+import pytest
+
+import benchmark
+from compare_clustering import clusters_for_file
+import main
+import src.logic.zband as zband
+import src.utils.batch as batch
+from src.api.batcher import MicroBatcher
+from src.api.jobs import JobStore, run_dataclean, run_dataclean_job, warm_up_worker
+from src.api.metrics import ProcessingMetrics
+from src.api.model_store import ConfidenceModelStore
+from src.api.reference import ReferenceIndex
+from src.api.startup import StartupTimings
+from src.api.worker_pool import BoundedWorkerPool
+from src.logic.cache import PointCloudCache
+from src.logic.clustering import cluster_agreement, voxel_cluster_labels
+from src.logic.dataclean import CLUSTER_PARAMS, PipelineConfig, dataclean, isolate_objects
+from src.logic.downsample import MAX_PRE_VOXEL, MIN_PRE_VOXEL, adaptive_voxel_downsample
+from src.logic.minbox import min_floor_box
+from src.logic.outliers import radius_outlier_mask
+from src.logic.ply_export import export_params, ply_bytes, read_ply_points, wait_for_writes, write_ply, write_ply_async
+from src.logic.remove_plain import PlaneSegmenter, large_plane_mask
+from src.logic.ply_stream import PlyFormatError, PlyStreamParser, UnsupportedPlyError
+from src.logic.profiling import PIPELINE_STAGES, profile_columns, profile_row
+from src.model import LinearRegressionGD
+from src.model.mlmodel import CLASSIFIERS, ModelCache, select_model
+from src.utils.batch import BatchThroughput, run_batch
+from src.utils.evaluation import confidence_table, dimension_confidence
+
+PICTURES_DIR = Path("src/data/pictures")
+
+
+def assert_same_mask(z, percentiles=(2, 98), bins=256):
+    expected = zband.z_band_mask_reference(z, percentiles, bins)
+    actual = zband.z_band_mask(z, percentiles, bins)
+    assert actual.dtype == bool
+    assert np.array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("path", sorted(PICTURES_DIR.glob("*.ply")), ids=lambda p: p.name)
+def test_z_band_mask_matches_reference_on_sample_scans(path, monkeypatch):
+    points = np.asarray(o3d.io.read_point_cloud(str(path)).points)
+
+    # The sample scans must take the fast path, not the reference fallback
+    fallbacks = []
+    reference = zband.z_band_mask_reference
+    monkeypatch.setattr(zband, "z_band_mask_reference",
+                        lambda *args: fallbacks.append(args) or reference(*args))
+
+    expected = reference(points[:, 2])
+    assert np.array_equal(zband.z_band_mask(points[:, 2]), expected)
+    assert not fallbacks
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_z_band_mask_matches_reference_with_empty_bins(seed):
+    # Quantized depths and a gap leave many empty bins, i.e. flat CDF stretches
+    rng = np.random.default_rng(seed)
+    z = np.concatenate([
+        np.round(rng.normal(0.0, 0.05, 5000), 3),
+        rng.uniform(0.8, 0.81, 3000),
+        np.full(200, 1.0),
+    ])
+    rng.shuffle(z)
+    assert_same_mask(z)
+
+
+def test_z_band_mask_matches_reference_with_top_heavy_cloud():
+    # The high percentile lands in the last bin, which maps to a flat 1.0
+    z = np.concatenate([np.linspace(0.0, 1.0, 1000), np.full(500, 1.0)])
+    assert_same_mask(z)
+
+
+@pytest.mark.parametrize("n", [2, 3, 7, 51, 257, 100_003])
+def test_z_band_mask_matches_reference_for_any_size(n):
+    z = np.random.default_rng(n).normal(size=n)
+    assert_same_mask(z)
+    assert_same_mask(z, percentiles=(10, 90), bins=64)
+
+
+def test_z_band_mask_accepts_strided_views():
+    points = np.random.default_rng(0).uniform(size=(20_000, 3))
+    assert_same_mask(points[:, 2])
+
+
+@pytest.mark.parametrize("scipy_installed", [True, False])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_radius_outlier_mask_matches_open3d(dtype, scipy_installed, monkeypatch):
+    if not scipy_installed:
+        monkeypatch.setitem(sys.modules, "scipy.spatial", None)  # import raises ImportError
+    rng = np.random.default_rng(0)
+    points = np.vstack([rng.normal(scale=0.05, size=(5000, 3)), rng.uniform(-1, 1, size=(500, 3))]).astype(dtype)
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(points.astype(np.float64)))
+    _, expected = pcd.remove_radius_outlier(nb_points=10, radius=0.02)
+
+    mask = radius_outlier_mask(points, nb_points=10, radius=0.02)
+
+    assert np.array_equal(np.flatnonzero(mask), np.asarray(expected))
+
+
+@pytest.mark.parametrize("yaw", [0.0, 0.3, 0.6, 1.2])
+def test_min_floor_box_recovers_rotated_box_on_tilted_floor(yaw):
+    rng = np.random.default_rng(0)
+    points = rng.uniform([-0.2, -0.1, 0.0], [0.2, 0.1, 0.15], size=(5000, 3))
+    cos, sin = np.cos(yaw), np.sin(yaw)
+    spin = np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]])
+    tilt = np.array([[1, 0, 0], [0, np.cos(0.3), -np.sin(0.3)], [0, np.sin(0.3), np.cos(0.3)]])
+
+    extent, _, rotation = min_floor_box(points @ spin.T @ tilt.T, tilt @ [0, 0, 1])
+    assert np.allclose(extent, [0.4, 0.2, 0.15], atol=0.005)
+    assert np.allclose(rotation.T @ rotation, np.eye(3))
+
+
+def test_confidence_table_scores_rows():
+    created = pd.DataFrame({"number": ["1", "2", "2#2"], "Height": [0.10, 0.05, 0.1],
+                            "Width": [0.20, 0.20, 0.1], "Length": [0.40, 0.30, 0.1]})
+    reference = pd.DataFrame({"number": [1, 2], "Height": [10.0, 0.0],
+                              "Width": [25.0, 20.0], "Length": [40.0, 30.0]})
+
+    merged, ratios = confidence_table(created, reference)
+    assert merged["number"].tolist() == [1, 2]
+    assert merged["confidence"].tolist() == [93.33, 66.67]
+    assert merged["is_accurate"].tolist() == [0, 0]
+    assert dimension_confidence(ratios) == pytest.approx({"Height": 1.0, "Width": 0.9, "Length": 1.0})
+
+
+@pytest.mark.parametrize("encoding", ["binary", "ascii"])
+@pytest.mark.parametrize("precision, tolerance", [("float64", 0), ("float32", 1e-7), ("int16", 2e-5)])
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_ply_export_round_trip(tmp_path, encoding, precision, tolerance, compression):
+    points = np.random.default_rng(0).uniform([-0.3, -0.2, 0.5], [0.3, 0.2, 0.9], size=(2000, 3))
+    colors = np.tile([0.0, 1.0, 0.0], (len(points), 1))
+
+    path = write_ply(tmp_path / "cleaned.ply", points, colors, encoding, precision, compression)
+    assert path.name == "cleaned.ply" + {"none": "", "gzip": ".gz"}[compression]
+    assert np.abs(read_ply_points(path) - points).max() <= tolerance
+    if compression == "none":
+        assert len(o3d.io.read_point_cloud(str(path)).points) == len(points)
+
+
+@pytest.mark.parametrize("precision", ["float64", "float32"])
+def test_ply_export_standard_precisions_load_in_open3d(tmp_path, precision):
+    points = np.random.default_rng(0).uniform(-1, 1, size=(500, 3))
+    path = write_ply(tmp_path / "cloud.ply", points, **{**export_params(), "precision": precision})
+
+    loaded = np.asarray(o3d.io.read_point_cloud(str(path)).points)
+    assert np.allclose(loaded, points, atol=0 if precision == "float64" else 1e-7)
+    assert export_params()["precision"] == "float64"  # Open3D's own format stays the default
+
+
+def test_ply_export_async_write_copies_input(tmp_path):
+    points = np.random.default_rng(0).uniform(size=(1000, 3))
+    expected = points.copy()
+
+    future = write_ply_async(tmp_path / "cleaned.ply", points, precision="float64")
+    points[:] = 0  # the caller may reuse its buffer right away
+    wait_for_writes()
+
+    assert future.result() == tmp_path / "cleaned.ply"
+    assert np.array_equal(read_ply_points(future.result()), expected)
+
+
+def test_pipeline_config_overrides_by_section():
+    config = PipelineConfig.from_overrides({"dbscan_eps": 0.03, "z_percentiles": (1, 99)})
+
+    assert config.cluster["dbscan_eps"] == 0.03
+    assert config.fine_tune["z_percentiles"] == (1, 99)
+    assert CLUSTER_PARAMS["dbscan_eps"] == 0.02  # module defaults untouched
+    with pytest.raises(ValueError):
+        PipelineConfig.from_overrides({"dbscan_epsilon": 0.03})
+
+
+def test_confidence_model_store_swaps_in_new_model_files(tmp_path):
+    path = tmp_path / "best_model.joblib"
+    joblib.dump({"proba_model": "regressor", "proba_scaler": "scaler", "proba_name": "ridge", "version": "v1"}, path)
+    store = ConfidenceModelStore(path, check_interval=0)
+    first = store.get()
+    assert first.info() == {"name": "ridge", "version": "v1"}
+
+    def wait_for_reload():
+        # Until the current file was either loaded or rejected
+        signature, deadline = store._file_signature(), time.monotonic() + 5
+        while signature not in (store.get().signature, store._failed_signature) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return store.get()
+
+    path.write_bytes(b"half written")  # a broken file keeps the current model
+    assert wait_for_reload() is first and store.last_error
+
+    joblib.dump({"model": "classifier", "scaler": "scaler", "name": "tree"}, path)
+    second = wait_for_reload()
+    assert second.name == "tree" and len(second.version) == 12  # content hash without a "version" entry
+    assert first.version == "v1"  # snapshots held by requests never change
+
+
+def test_select_model_keeps_winner_fit_and_reuses_cache(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(40, 6))
+    y = (X[:, 1] > 0).astype(int)
+
+    selection = select_model(X, y, CLASSIFIERS, folds=4, n_jobs=1, cache_dir=tmp_path)
+    assert selection.name == selection.leaderboard()[0][0]
+    assert set(selection.scores) == set(CLASSIFIERS)
+    assert (selection.model.predict(selection.scaler.transform(X)) == y).mean() > 0.9
+    # 4 fold scores per candidate, and a single all-rows fit: the winner's
+    assert len(list(tmp_path.glob("*/*.joblib"))) == 4 * len(CLASSIFIERS) + 1
+
+    # Same data again: every fold score and fit comes from the cache
+    monkeypatch.setattr(ModelCache, "put", lambda *args: pytest.fail("model trained again"))
+    again = select_model(X, y, CLASSIFIERS, folds=4, n_jobs=1, cache_dir=tmp_path)
+    assert again.scores == selection.scores and again.name == selection.name
+
+
+def test_model_cache_evicts_least_recently_used_models(tmp_path):
+    cache = ModelCache(tmp_path, max_bytes=40_000)
+    for i in range(8):
+        cache.put(f"{i:02d}key", np.full(1000, i, dtype=np.float64))  # ~8 kB each
+        if i >= 1:
+            assert cache.get("00key") is not None  # keeps the first entry recently used
+            time.sleep(0.01)
+
+    assert cache.size_bytes() <= cache.max_bytes
+    assert cache.get("00key") is not None and cache.get("01key") is None
+
+
+@pytest.mark.parametrize("solver, atol", [("normal", 1e-10), ("gd", 1e-3), ("sgd", 1e-3)])
+def test_linear_regression_solvers_fit_all_targets_at_once(solver, atol):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 4))
+    Y = X @ rng.normal(size=(4, 3)) + [0.5, -1.0, 2.0] + rng.normal(scale=0.01, size=(2000, 3))
+    expected = np.linalg.lstsq(np.hstack([X, np.ones((len(X), 1))]), Y, rcond=None)[0]
+
+    model = LinearRegressionGD(solver=solver).fit(X, Y)
+    assert model.w_.shape == (4, 3) and model.predict(X).shape == (2000, 3)
+    assert np.allclose(model.w_, expected[:-1], atol=atol) and np.allclose(model.b_, expected[-1], atol=atol)
+
+    single = LinearRegressionGD(solver=solver).fit(X, Y[:, 0])
+    assert single.w_.shape == (4,) and isinstance(single.b_, float)
+
+
+def test_worker_pool_recovers_from_a_dead_worker():
+    pool = BoundedWorkerPool(mode="process", max_workers=1)
+
+    async def scenario():
+        with pytest.raises(BrokenProcessPool):
+            await pool.run(os._exit, 1)  # the worker dies mid-job
+        return await pool.run(math.sqrt, 16.0)
+
+    try:
+        assert asyncio.run(scenario()) == 4.0
+        assert pool.stats()["running"] == 0
+    finally:
+        pool.shutdown()
+
+
+def parse_chunks(data, chunk_size, **kwargs):
+    parser = PlyStreamParser(**kwargs)
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+    return parser.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 100_000])
+def test_ply_stream_parser_handles_any_chunk_boundaries(chunk_size):
+    points = np.random.default_rng(0).uniform(size=(300, 3))
+    data = ply_bytes(points, np.zeros((300, 3)), precision="float64")
+
+    assert np.array_equal(parse_chunks(data, chunk_size), points)
+
+
+def test_ply_stream_parser_skips_elements_before_the_vertices():
+    points = np.random.default_rng(0).uniform(size=(50, 3)).astype("<f4")
+    header = (b"ply\nformat binary_little_endian 1.0\nelement camera 2\nproperty float a\nproperty uchar b\n"
+              b"element vertex 50\nproperty float x\nproperty float y\nproperty float z\n"
+              b"element face 1\nproperty list uchar int vertex_indices\nend_header\n")
+    cameras = np.zeros(2, dtype=[("a", "<f4"), ("b", "u1")]).tobytes()
+    faces = bytes([3]) + np.arange(3, dtype="<i4").tobytes()
+
+    parsed = parse_chunks(header + cameras + points.tobytes() + faces, 7)
+    assert np.array_equal(parsed, points.astype(np.float64))
+
+
+def test_ply_stream_parser_rejects_truncated_and_oversized_bodies():
+    data = ply_bytes(np.ones((100, 3)), precision="float32")
+    with pytest.raises(PlyFormatError, match="Truncated"):
+        parse_chunks(data[:-1], 64)
+
+    # The vertex count is untrusted: it must not size an allocation up front
+    header = b"ply\nformat binary_little_endian 1.0\nelement vertex 400000000\nproperty float x\n" \
+             b"property float y\nproperty float z\nend_header\n"
+    with pytest.raises(PlyFormatError, match="limit"):
+        PlyStreamParser().feed(header)
+    with pytest.raises(PlyFormatError, match="body can hold"):
+        PlyStreamParser(max_vertices=10 ** 9, total_bytes=len(header) + 1200).feed(header)
+
+
+def test_ply_stream_parser_leaves_ascii_files_to_the_fallback_reader():
+    data = ply_bytes(np.ones((10, 3)), encoding="ascii")
+    parser = PlyStreamParser()
+    # Raised on the header, before any body bytes are consumed
+    with pytest.raises(UnsupportedPlyError):
+        parser.feed(data[:data.index(b"end_header") + len(b"end_header\n")])
+
+
+def test_isolate_objects_keeps_a_largest_object_below_min_object_points():
+    rng = np.random.default_rng(0)
+    small = rng.uniform(0, 0.05, size=(3000, 3))
+    smaller = rng.uniform(0, 0.05, size=(1500, 3)) + [0.5, 0, 0]
+    points = np.vstack([small, smaller])
+
+    def isolate(min_object_points):
+        return isolate_objects(points, np.arange(len(points)), lambda *args: None, lambda *args: None,
+                               min_object_points=min_object_points)
+
+    # Both objects are under the default min_object_points: the largest is still measured
+    objects = isolate(CLUSTER_PARAMS["min_object_points"])
+    assert [len(o) for o in objects] == [3000]
+    assert [len(o) for o in isolate(1000)] == [3000, 1500]
+
+
+def test_isolate_objects_skips_elongated_clusters():
+    rng = np.random.default_rng(0)
+    box = rng.uniform(0, 0.05, size=(3000, 3))
+    strip = rng.uniform(0, 1, size=(2000, 3)) * [0.4, 0.02, 0.02] + [0.5, 0, 0]
+    points = np.vstack([box, strip])
+
+    objects = isolate_objects(points, np.arange(len(points)), lambda *args: None, lambda *args: None,
+                              min_object_points=1000)
+    assert [len(o) for o in objects] == [3000]
+
+
+@pytest.mark.parametrize("path", sorted(PICTURES_DIR.glob("*.ply")), ids=lambda p: p.name)
+def test_multi_object_finds_one_box_in_single_box_scans(path):
+    result = dataclean(str(path), visualize_flag=False, method=["AABB", "MINBOX"], multi_object=True,
+                       output_policy="none")
+    assert len(result["objects"]) == 1
+    # The largest object's dimensions are reused for the top-level result
+    assert result["objects"][0]["methods"] == result["methods"]
+
+
+def test_point_cloud_cache_keys_chain_across_stages(tmp_path):
+    cache = PointCloudCache(tmp_path)
+    digest = PointCloudCache.array_digest(np.ones((10, 3)))
+    floor = PointCloudCache.stage_key(digest, "floor", {"voxel": 0.01})
+    cluster = PointCloudCache.stage_key(floor, "cluster", {"eps": 0.02})
+
+    assert cluster == PointCloudCache.stage_key(PointCloudCache.stage_key(digest, "floor", {"voxel": 0.01}),
+                                                "cluster", {"eps": 0.02})
+    # An upstream change invalidates every later stage
+    other_floor = PointCloudCache.stage_key(digest, "floor", {"voxel": 0.02})
+    assert PointCloudCache.stage_key(other_floor, "cluster", {"eps": 0.02}) != cluster
+
+    points = np.random.default_rng(0).uniform(size=(100, 3)).astype(np.float32)
+    cache.put_points(cluster, points)
+    cache.put_json(cluster, {"floor_normal": [0, 1, 0]})
+    assert np.array_equal(cache.get_points(cluster), points) and cache.get_points(cluster).dtype == np.float32
+    assert cache.get_json(cluster) == {"floor_normal": [0, 1, 0]}
+    assert cache.get_points(other_floor) is None
+
+
+def test_point_cloud_cache_evicts_least_recently_used_first(tmp_path):
+    cache = PointCloudCache(tmp_path, max_bytes=10 ** 9)
+    keys = [PointCloudCache.stage_key("scan", "floor", {"i": i}) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put_points(key, np.zeros((100, 3)))
+        os.utime(cache._path(key, ".npy"), (1000 + i, 1000 + i))
+    cache.get_points(keys[0])  # a read makes the oldest entry the most recent
+
+    cache.max_bytes = 2 * cache._path(keys[0], ".npy").stat().st_size
+    cache.evict()
+    assert [cache.get_points(key) is not None for key in keys] == [True, False, True]
+
+
+def test_point_cloud_cache_recovers_from_corrupt_entries(tmp_path):
+    cache = PointCloudCache(tmp_path)
+    key = PointCloudCache.stage_key("scan", "floor", {})
+    for suffix in (".npy", ".json"):
+        cache._path(key, suffix).parent.mkdir(parents=True, exist_ok=True)
+        cache._path(key, suffix).write_bytes(b"\x93NUMPY garbage")
+    assert cache.get_points(key) is None and cache.get_json(key) is None
+
+    cache.put_points(key, np.ones((5, 3)))
+    cache.put_json(key, {"ok": True})
+    assert np.array_equal(cache.get_points(key), np.ones((5, 3))) and cache.get_json(key) == {"ok": True}
+
+
+def test_point_cloud_cache_does_not_rescan_on_every_write(tmp_path, monkeypatch):
+    scans = []
+    entries = PointCloudCache._entries
+    monkeypatch.setattr(PointCloudCache, "_entries", lambda self: scans.append(1) or entries(self))
+    cache = PointCloudCache(tmp_path)
+    for i in range(20):
+        cache.put_points(PointCloudCache.stage_key("scan", "floor", {"i": i}), np.ones((10, 3)))
+    assert len(scans) == 1  # the first write of the process
+
+
+def test_plane_segmenter_recovers_two_orthogonal_planes():
+    rng = np.random.default_rng(0)
+    floor = np.column_stack([rng.uniform(0, 1, (6000, 2)), rng.normal(0, 0.001, 6000)])
+    wall = np.column_stack([rng.normal(0, 0.001, 4000), rng.uniform(0, 1, (4000, 2))])
+    noise = rng.uniform(0.05, 1, (500, 3))
+    points = np.vstack([floor, wall, noise])
+    segmenter = PlaneSegmenter(points, distance_threshold=0.005)
+
+    plane, inliers = segmenter.next_plane()
+    assert abs(plane[2]) > 0.999 and np.isin(np.arange(6000), inliers).all()
+    assert len(segmenter._counts) < 1000  # adaptive bound, not max_iterations
+
+    segmenter.remove(inliers)
+    # Pooled hypotheses: none drawn from removed points, counts over the remaining points only
+    remaining = segmenter.remaining_indices()
+    assert segmenter.remaining[segmenter._samples].all()
+    assert np.array_equal(segmenter._counts, segmenter._score(segmenter.points32[:, remaining]))
+
+    plane, inliers = segmenter.next_plane()
+    wall_left = remaining[remaining < 10000]  # the wall points near the floor went with it
+    assert abs(plane[0]) > 0.999 and np.isin(wall_left, inliers).all()
+
+
+def test_large_plane_mask_stops_below_min_inliers():
+    rng = np.random.default_rng(1)
+    floor = np.column_stack([rng.uniform(0, 1, (6000, 2)), np.zeros(6000)])
+    small = np.column_stack([np.zeros(1000), rng.uniform(0.2, 0.4, (1000, 2))])  # a plane, but too small
+    points = np.vstack([floor, small, rng.uniform(0.05, 1, (500, 3))])
+
+    mask = large_plane_mask(PlaneSegmenter(points), max_planes=3, min_inliers=3000)
+    assert not mask[:6000].any()
+    assert mask[6000:7000].all()
+
+
+def test_voxel_cluster_labels_separates_blobs_from_noise():
+    rng = np.random.default_rng(0)
+    big = rng.uniform(0, 0.04, (2000, 3))
+    small = rng.uniform(0, 0.04, (1000, 3)) + [0.5, 0, 0]
+    noise = rng.uniform(-1, 1, (50, 3)) + [0, 0, 3]  # sparse, away from both blobs
+    labels = voxel_cluster_labels(np.vstack([big, small, noise]), eps=0.02, min_points=100)
+
+    assert len(set(labels[:2000])) == 1 and len(set(labels[2000:3000])) == 1
+    assert labels[0] >= 0 and labels[2000] >= 0 and labels[0] != labels[2000]
+    assert (labels[3000:] == -1).all()
+
+
+def test_voxel_cluster_engine_matches_dbscan_on_a_sample_scan():
+    _, clusters = clusters_for_file(PICTURES_DIR / "22.ply")
+    agreement = cluster_agreement(clusters["dbscan"][0], clusters["voxel"][0])
+    assert agreement["iou"] > 0.9
+    assert abs(agreement["points_b"] - agreement["points_a"]) < 0.05 * agreement["points_a"]
+
+
+def test_micro_batcher_flushes_when_max_batch_is_reached():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or [i * 2 for i in items],
+                           max_batch=3, max_wait=60)
+
+    async def scenario():
+        # A full batch goes out without waiting for the (one minute) timer
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3))), timeout=5)
+
+    assert asyncio.run(scenario()) == [0, 2, 4]
+    assert calls == [[0, 1, 2]]
+
+
+def test_micro_batcher_flushes_a_partial_batch_on_the_timer():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or items, max_batch=64, max_wait=0.01)
+
+    async def scenario():
+        first = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        return first, await batcher.submit("c")
+
+    assert asyncio.run(scenario()) == (["a", "b"], "c")
+    assert calls == [["a", "b"], ["c"]]
+    assert batcher.stats()["mean_batch_size"] == 1.5
+
+
+def test_micro_batcher_survives_a_cancelled_caller():
+    batcher = MicroBatcher(lambda items: items, max_batch=64, max_wait=0.01)
+
+    async def scenario():
+        cancelled = asyncio.ensure_future(batcher.submit("gone"))
+        kept = asyncio.ensure_future(batcher.submit("kept"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept, cancelled.cancelled()
+
+    assert asyncio.run(scenario()) == ("kept", True)
+
+
+def test_micro_batcher_fails_every_waiter_of_a_failed_batch():
+    def predict(items):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(predict, max_batch=64, max_wait=0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 3 and all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_micro_batcher_coalesces_submits_within_max_wait_and_predicts_off_the_loop():
+    calls = []
+
+    def predict(items):
+        calls.append((list(items), threading.current_thread() is threading.main_thread()))
+        time.sleep(0.2)  # a slow model
+        return items
+
+    batcher = MicroBatcher(predict, max_batch=64, max_wait=0.05)
+
+    async def submit_later(item, delay):
+        await asyncio.sleep(delay)
+        return await batcher.submit(item)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticking = asyncio.ensure_future(ticker())
+        # Three requests finishing within max_wait of the first share a batch
+        results = await asyncio.gather(*(submit_later(i, i * 0.01) for i in range(3)))
+        ticking.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    assert results == [0, 1, 2]
+    assert calls == [([0, 1, 2], False)] and batcher.stats()["mean_batch_size"] == 3.0
+    assert ticks >= 10  # the event loop kept running during the 0.2 s prediction
+
+
+def test_reference_index_reloads_when_the_csv_changes(tmp_path):
+    path = tmp_path / "reference.csv"
+    path.write_text("number,Height,Width,Length \n1,10,20,30\n1,99,99,99\n2,5,6,7\n")
+    index = ReferenceIndex(path)
+
+    assert index.stale()
+    assert index.get(1) == (10.0, 20.0, 30.0)  # first row wins, header whitespace stripped
+    assert index.get(3) is None  # no reference for this object
+    assert not index.stale() and len(index) == 2
+
+    path.write_text("number,Height,Width,Length\n1,11,21,31\n3,1,2,3\n")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    assert index.stale()
+    assert index.get(1) == (11.0, 21.0, 31.0) and index.get(3) == (1.0, 2.0, 3.0) and index.get(2) is None
+
+    path.unlink()
+    assert index.get(1) is None and not index.refresh()
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """The upload API module with a one-thread pool, storing uploads and outputs under tmp_path."""
+    import src.api.ply_upload as api
+
+    monkeypatch.setattr(api, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(api, "processing_pool", BoundedWorkerPool(mode="thread", max_workers=1))
+    monkeypatch.setattr(api, "job_store", JobStore())
+    return api
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_job_store_reports_progress_of_running_jobs(shared):
+    store = JobStore(use_shared_progress=shared)
+    store.start()
+    job = store.create("1.ply", "AABB")
+    assert store.get(job.id).status == "queued"
+
+    store.progress[job.id] = ("dbscan", 7, 12)
+    assert store.get(job.id).to_dict()["stage"] == "dbscan" and job.status == "running"
+
+    store.mark_done(job, {"width": 1.0})
+    assert store.get(job.id).status == "done" and job.stage_index == job.stage_count
+    assert job.id not in store.progress and store.get("missing") is None
+    store.shutdown()
+
+
+def test_job_endpoints_go_from_queued_to_done(api, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    gate = threading.Event()
+
+    def gated_job(*args, **kwargs):
+        gate.wait(30)
+        return run_dataclean_job(*args, **kwargs)
+    monkeypatch.setattr(api, "run_dataclean_job", gated_job)
+
+    with TestClient(api.app) as client:
+        assert client.get("/api/jobs/unknown").status_code == 404
+        assert client.get("/api/jobs/unknown/result").status_code == 404
+
+        created = client.post("/api/jobs", params={"method": "AABB"},
+                              files={"file": ("22.ply", (PICTURES_DIR / "22.ply").read_bytes())})
+        assert created.status_code == 202
+        job = created.json()
+        assert job["status"] == "queued"
+
+        # Not finished yet: 202 with the job status instead of the result
+        pending = client.get(job["result_url"])
+        assert pending.status_code == 202 and pending.json()["status"] in ("queued", "running")
+
+        gate.set()
+        deadline = time.monotonic() + 60
+        while client.get(job["status_url"]).json()["status"] not in ("done", "failed"):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+        status = client.get(job["status_url"]).json()
+        assert status["status"] == "done" and status["progress"] == 1.0
+        result = client.get(job["result_url"])
+        assert result.status_code == 200 and result.json()["success"]
+
+
+def test_profiled_run_times_every_stage_and_feeds_the_metrics(tmp_path):
+    result = dataclean(str(PICTURES_DIR / "22.ply"), visualize_flag=False, profile=True, output_dir=str(tmp_path))
+    profile = result["profile"]
+
+    assert [r["stage"] for r in profile] == list(PIPELINE_STAGES)
+    for record in profile:
+        assert record["seconds"] >= 0 and record["peak_traced_mb"] >= 0 and record["peak_rss_mb"] > 0
+        assert record["points_in"] >= 0 and record["points_out"] >= 0
+    assert profile[-1]["points_out"] == result["point_count"]
+
+    row = profile_row(profile, PIPELINE_STAGES)
+    assert len(row) == len(profile_columns(PIPELINE_STAGES))
+    assert row[-2] == pytest.approx(sum(r["seconds"] for r in profile))
+
+    metrics = ProcessingMetrics()
+    metrics.record_scan("ok", 1.5, profile)
+    metrics.record_scan("failed")
+    text = metrics.render({"running": 1, "queued": 0, "capacity": 9})
+    assert 'ply_scans_total{outcome="ok"} 1' in text and 'ply_scans_total{outcome="failed"} 1' in text
+    assert "# TYPE ply_stage_seconds_sum counter" in text
+    for stage in PIPELINE_STAGES:
+        assert f'ply_stage_seconds_count{{stage="{stage}"}} 1' in text
+    assert "ply_pool_capacity 9" in text and text.endswith("\n")
+
+
+def dense_plane_cloud(size=0.2, spacing=0.0005):
+    axis = np.arange(0, size, spacing)
+    xx, yy = np.meshgrid(axis, axis)
+    return o3d.geometry.PointCloud(o3d.utility.Vector3dVector(
+        np.column_stack([xx.ravel(), yy.ravel(), np.zeros(xx.size)])
+    ))
+
+
+def test_adaptive_voxel_downsample_meets_a_reachable_budget():
+    pcd = dense_plane_cloud()
+    down, voxel = adaptive_voxel_downsample(pcd, target_points=8000)
+    assert len(down.points) <= 8000
+    assert MIN_PRE_VOXEL <= voxel <= MAX_PRE_VOXEL
+
+
+def test_adaptive_voxel_downsample_never_exceeds_the_voxel_cap():
+    pcd = dense_plane_cloud()
+    # Would need a ~7 mm voxel: best effort at the 2.5 mm cap instead
+    down, voxel = adaptive_voxel_downsample(pcd, target_points=1000)
+    assert voxel == MAX_PRE_VOXEL
+    assert 1000 < len(down.points) < len(pcd.points)
+
+
+@pytest.mark.parametrize("target_points", [None, 160_000, 10 ** 6])
+def test_adaptive_voxel_downsample_passes_clouds_under_budget_through(target_points):
+    pcd = dense_plane_cloud()
+    down, voxel = adaptive_voxel_downsample(pcd, target_points)
+    assert down is pcd and voxel is None
+
+
+def test_run_batch_reports_a_bad_file_without_losing_the_good_one(tmp_path):
+    bad = tmp_path / "bad.ply"
+    bad.write_bytes(b"ply\nformat binary_little_endian 1.0\nend_header\n garbage")
+    good = PICTURES_DIR / "22.ply"
+
+    throughput = BatchThroughput()
+    results = {}
+    for item in run_batch([bad, good], workers=1, output_policy="none"):
+        throughput.add(item)
+        results[item.file] = item
+
+    assert results[good].ok and results[good].result["width"] > 0
+    assert not results[bad].ok and results[bad].error and results[bad].result is None
+    assert (throughput.files, throughput.failed) == (2, 1)
+    assert throughput.points == results[good].result["input_point_count"]
+    assert "2 files" in throughput.summary() and "1 failed" in throughput.summary()
+
+
+def fake_dataclean(path, **kwargs):
+    if path.endswith("crash.ply"):
+        os._exit(1)  # a native crash kills the worker process
+    return {"width": 1.0, "input_point_count": 100}
+
+
+def test_run_batch_isolates_a_file_that_crashes_its_worker(monkeypatch):
+    # Pool workers are forked, so they see the patched dataclean
+    monkeypatch.setattr(batch, "dataclean", fake_dataclean)
+    files = [Path("a.ply"), Path("crash.ply"), Path("b.ply")]
+
+    throughput = BatchThroughput()
+    results = {}
+    for item in run_batch(files, workers=2):
+        throughput.add(item)
+        results[item.file.name] = item
+
+    assert sorted(results) == ["a.ply", "b.ply", "crash.ply"]
+    assert results["a.ply"].ok and results["b.ply"].ok
+    assert "worker crashed" in results["crash.ply"].error
+    assert (throughput.files, throughput.failed, throughput.points) == (3, 1, 200)
+
+
+def test_batch_main_writes_one_csv_per_method_from_one_cleaning_pass(tmp_path, monkeypatch):
+    calls = []
+
+    def counted_dataclean(path, **kwargs):
+        calls.append(kwargs["method"])
+        return dataclean(path, **kwargs)
+    monkeypatch.setattr(batch, "dataclean", counted_dataclean)
+    monkeypatch.setattr(sys, "argv", [
+        "main.py", "--batch", "--workers", "1", "--method", "aabb, MINBOX", "--output-policy", "none",
+        "--data-dir", str(PICTURES_DIR.resolve()), "--files", "22.ply",
+    ])
+    monkeypatch.chdir(tmp_path)  # CSVs go to output/statistics/<METHOD>_measurement_results.csv
+
+    main.batch_main(main.parse_args())
+
+    assert calls == [["AABB", "MINBOX"]]
+    rows = {m: pd.read_csv(tmp_path / f"output/statistics/{m}_measurement_results.csv") for m in ("AABB", "MINBOX")}
+    assert all(len(df) == 1 and df["number"].tolist() == [22] for df in rows.values())
+    assert not rows["AABB"].equals(rows["MINBOX"])
+
+
+@pytest.mark.parametrize("method", ["", " , ", "FOO", "AABB,BAD"])
+@pytest.mark.parametrize("endpoint", ["/api/upload-ply", "/api/jobs"])
+def test_upload_endpoints_reject_empty_or_unknown_methods(api, endpoint, method):
+    from fastapi.testclient import TestClient
+
+    with TestClient(api.app) as client:
+        response = client.post(endpoint, params={"method": method},
+                               files={"file": ("22.ply", (PICTURES_DIR / "22.ply").read_bytes())})
+        assert response.status_code == 400 and "Invalid method" in response.json()["detail"]
+        stream = client.post("/api/upload-ply-stream", params={"filename": "22.ply", "method": method},
+                             content=b"ply\n")
+        assert stream.status_code == 400
+    # Rejected before a worker slot was taken or anything was saved
+    assert api.processing_pool.stats()["running"] == 0 and not any(api.UPLOAD_DIR.iterdir())
+
+
+def test_upload_measures_several_methods_in_one_pipeline_run(api, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    calls = []
+
+    def counted_dataclean(path, **kwargs):
+        calls.append(kwargs["method"])
+        return run_dataclean(path, **kwargs)
+    monkeypatch.setattr(api, "run_dataclean", counted_dataclean)
+
+    with TestClient(api.app) as client:
+        response = client.post("/api/upload-ply", params={"method": "aabb,MINBOX"},
+                               files={"file": ("22.ply", (PICTURES_DIR / "22.ply").read_bytes())})
+    assert response.status_code == 200
+    assert calls == [["AABB", "MINBOX"]] and sorted(response.json()["methods"]) == ["AABB", "MINBOX"]
+
+
+def test_benchmark_report_covers_every_stage_and_method(tmp_path):
+    record = benchmark.benchmark_file(str(PICTURES_DIR / "22.ply"), ["AABB", "MINBOX"], 2, {})
+
+    assert record["file"] == "22.ply" and len(record["seconds_all"]) == 2
+    assert set(record["stages"]) == set(PIPELINE_STAGES)
+    for m in ("AABB", "MINBOX"):
+        assert record["methods"][m]["estimator_seconds"] > 0 and record["methods"][m]["width"] > 0
+
+    reference = tmp_path / "reference.csv"
+    dims = record["methods"]["AABB"]
+    # Reference 1 cm off in every dimension
+    reference.write_text(f"number,Height,Width,Length\n22,{dims['height'] * 100 + 1},"
+                         f"{dims['width'] * 100 + 1},{dims['length'] * 100 + 1}\n")
+    scores = benchmark.accuracy([record], ["AABB", "MINBOX"], reference)
+    assert scores["AABB"]["n"] == 1 and scores["AABB"]["mae_cm"] == pytest.approx(1.0, abs=1e-3)
+
+    summary = benchmark.summarize([record, record], ["AABB", "MINBOX"])
+    assert summary["files"] == 2 and summary["seconds_total"] == pytest.approx(2 * record["seconds"], abs=1e-3)
+
+
+def benchmark_report(seconds_per_file, stage_seconds, mae_cm):
+    return {
+        "environment": {"commit": "abc1234", "timestamp": "2026-01-01T00:00:00+00:00"},
+        "summary": {
+            "seconds_per_file": seconds_per_file,
+            "stages": {stage: stage_seconds for stage in PIPELINE_STAGES},
+            "estimator_seconds": {"AABB": 0.001},
+            "peak_rss_mb": 300.0,
+        },
+        "accuracy": {"AABB": {"mae_cm": mae_cm}},
+    }
+
+
+def test_benchmark_compare_flags_slowdowns_and_accuracy_losses():
+    baseline = benchmark_report(1.0, 0.1, 3.0)
+
+    assert benchmark.compare_reports(benchmark_report(1.05, 0.105, 3.05), baseline) == []
+    regressions = benchmark.compare_reports(benchmark_report(1.2, 0.1, 3.5), baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("seconds_per_file") and regressions[1].startswith("AABB MAE")
+    # Every stage is 5x slower, but too short to be compared
+    assert benchmark.compare_reports(benchmark_report(1.0, 0.01, 3.0), benchmark_report(1.0, 0.002, 3.0)) == []
+
+
+def test_api_import_leaves_the_heavy_libraries_unloaded(tmp_path):
+    # A fresh interpreter (run in tmp_path, where the API creates its output folders)
+    script = ("import json, sys; import src.api.ply_upload as api; "
+              "print(json.dumps([api.startup_stats(), [m for m in HEAVY_MODULES if m in sys.modules]]))")
+    env = {**os.environ, "PYTHONPATH": str(Path.cwd()), "PLY_PRELOAD": "0"}
+    output = subprocess.run([sys.executable, "-c", "from src.api.startup import HEAVY_MODULES; " + script],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, check=True).stdout
+    stats, loaded = json.loads(output.strip().splitlines()[-1])
+
+    assert loaded == [] and stats["loaded_modules"] == []
+    assert stats["mode"] == "lazy" and stats["timings"]["api_import"] > 0
+    assert "pipeline_import" not in stats["timings"]
+
+
+def test_startup_timings_keep_the_first_measurement():
+    timings = StartupTimings()
+    timings.record("model_load", 0.5)
+    timings.record("model_load", 9.0)  # a later reload
+    with pytest.raises(RuntimeError):
+        with timings.measure("pool_warm_up"):
+            raise RuntimeError("worker failed")
+
+    stats = timings.stats()
+    assert stats["timings"]["model_load"] == 0.5 and stats["timings"]["pool_warm_up"] >= 0
+    assert "open3d" in stats["loaded_modules"]  # imported by this test module
+
+
+def test_worker_pool_warm_up_imports_the_pipeline_in_every_worker():
+    pool = BoundedWorkerPool(mode="process", max_workers=2, preload=["src.logic.dataclean"])
+    try:
+        seconds = asyncio.run(pool.warm_up(warm_up_worker))
+        assert len(seconds) == 2 and all(s >= 0 for s in seconds)
+        # The warmed-up workers run the pipeline straight away
+        dims = asyncio.run(pool.run(run_dataclean, str(PICTURES_DIR / "22.ply"), visualize_flag=False,
+                                    output_policy="none"))
+        assert dims["width"] > 0
+    finally:
+        pool.shutdown()
+
+
+def test_cleaned_file_is_ready_when_the_upload_answers(api, tmp_path):
+    from fastapi.testclient import TestClient
+
+    assert api.OUTPUT_POLICY == "write"
+    with TestClient(api.app) as client:
+        response = client.post("/api/upload-ply", files={"file": ("22.ply", (PICTURES_DIR / "22.ply").read_bytes())})
+        cleaned = response.json()["cleaned_filename"]
+        # Written before the answer: no polling, and a complete file
+        assert (tmp_path / cleaned).exists()
+        download = client.get(f"/api/download-cleaned/{cleaned}")
+
+    assert download.status_code == 200
+    path = tmp_path / "download.ply"
+    path.write_bytes(download.content)
+    assert len(o3d.io.read_point_cloud(str(path)).points) == response.json()["quality_metrics"]["point_count"]
+
+
+def receive(api, data, file_path, chunk_size=4096, total_bytes=None):
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    return asyncio.run(api.receive_ply(chunks(), file_path, total_bytes))
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_receive_ply_writes_persisted_uploads_as_they_arrive(api, monkeypatch, tmp_path, persist):
+    monkeypatch.setattr(api, "PERSIST_UPLOADS", persist)
+    points = np.random.default_rng(0).uniform(size=(5000, 3))
+    data = ply_bytes(points, precision="float32")
+
+    received = receive(api, data, tmp_path / "scan.ply", total_bytes=len(data))
+    assert np.array_equal(received, points.astype(np.float32))
+    if persist:
+        assert (tmp_path / "scan.ply").read_bytes() == data
+    else:
+        assert not (tmp_path / "scan.ply").exists()
+
+
+def test_receive_ply_saves_other_formats_for_open3d_and_drops_bad_bodies(api, monkeypatch, tmp_path):
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(api, "PERSIST_UPLOADS", False)
+    data = ply_bytes(np.ones((2000, 3)), encoding="ascii")
+    assert receive(api, data, tmp_path / "ascii.ply", chunk_size=100) is None
+    assert (tmp_path / "ascii.ply").read_bytes() == data
+
+    monkeypatch.setattr(api, "PERSIST_UPLOADS", True)
+    truncated = ply_bytes(np.ones((2000, 3)))[:-10]
+    with pytest.raises(HTTPException) as error:
+        receive(api, truncated, tmp_path / "bad.ply")  # size unknown: found truncated at the end
+    assert error.value.status_code == 400 and not (tmp_path / "bad.ply").exists()